@@ -1,5 +1,6 @@
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, jsonify
 from app.extensions import db, cors
+from app.pagination import PaginationError
 from config import Config
 import os
 
@@ -7,10 +8,21 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # 初始化扩展
+    # 初始化扩展（连接池参数需在 db.init_app 之前确定）
+    from app import db_pool, replicas
+    db_pool.init_app(app)
+    replicas.init_app(app)
     db.init_app(app)
+    db_pool.watch_engine(app)
     cors.init_app(app)
 
+    from app import metrics, profiling, auth, response_cache, jobs
+    metrics.init_app(app)
+    profiling.init_app(app)
+    auth.init_app(app)
+    response_cache.init_app(app)
+    jobs.init_app(app)
+
     # 注册蓝图 (模块化路由)
     from app.api import guidance
     app.register_blueprint(guidance.bp)
@@ -21,29 +33,33 @@ def create_app(config_class=Config):
     from app.api import task
     app.register_blueprint(task.bp)
 
-    # 创建数据库表 (仅用于开发环境快速初始化)
-    with app.app_context():
-        # 检查并修复任务书表结构
-        try:
-            from sqlalchemy import inspect, text
-            inspector = inspect(db.engine)
-            if 'task_documents' in inspector.get_table_names():
-                columns = [col['name'] for col in inspector.get_columns('task_documents')]
-                if 'project_id' not in columns:
-                    # 删除旧表，让Flask重新创建
-                    print("检测到旧的任务书表结构，删除旧表以重新创建...")
-                    db.session.execute(text("DROP TABLE IF EXISTS task_documents"))
-                    db.session.commit()
-                    print("旧表已删除，将重新创建")
-        except Exception as e:
-            print(f"检查表结构时出错: {e}")
-            db.session.rollback()
-        
-        db.create_all()
-        # 初始化测试数据
-        init_test_data()
-
-# --- 新增代码：配置前端静态文件路径 ---
+    from app.api import search
+    app.register_blueprint(search.bp)
+
+    from app.api import stats
+    app.register_blueprint(stats.bp)
+
+    from app.api import admin
+    app.register_blueprint(admin.bp)
+
+    # 分页/投影参数错误统一返回 JSON 格式的 400
+    @app.errorhandler(PaginationError)
+    def handle_pagination_error(e):
+        return jsonify({'error': str(e)}), 400
+
+    # 表结构由版本迁移管理（flask --app run db upgrade），启动时不做任何 DDL
+    from app import cli
+    cli.init_app(app)
+
+    # 开发环境由 Flask 顺带提供前端页面；生产环境 (SERVE_FRONTEND=False) 由 nginx 直接提供，
+    # API 进程只处理 /api 请求
+    if app.config.get('SERVE_FRONTEND', True):
+        register_frontend_routes(app)
+
+    return app
+
+def register_frontend_routes(app):
+    """配置前端静态文件路径"""
     # 逻辑：当前文件(__init__.py) -> app目录 -> backend目录 -> 项目根目录 -> frontend目录
     current_dir = os.path.dirname(os.path.abspath(__file__))
     frontend_dir = os.path.join(current_dir, '..', '..', 'frontend')
@@ -58,9 +74,6 @@ def create_app(config_class=Config):
     def serve_static(filename):
         # 访问 http://127.0.0.1:8080/styles.css 等资源时，从 frontend 目录寻找
         return send_from_directory(frontend_dir, filename)
-    # --- 新增代码结束 ---
-
-    return app
 
 def init_test_data():
     """初始化一些测试数据，避免数据库为空"""
@@ -0,0 +1,151 @@
+import hmac
+from flask import Blueprint, Response, jsonify, request, current_app, send_file
+from app.extensions import db
+from app.auth import get_current_user
+from app import db_pool, replicas, response_cache, jobs, roster, metrics, profiling
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+def require_admin():
+    """仅教科办（admin）可访问运维接口；返回错误响应或 None"""
+    user = get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': '仅管理员可访问'}), 403
+    return None
+
+@bp.route('/pool', methods=['GET'])
+def pool_stats():
+    """当前进程数据库连接池的占用、取连接等待时间、超时与溢出次数"""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify(db_pool.stats(db.engine))
+
+@bp.route('/pool/reset', methods=['POST'])
+def reset_pool_stats():
+    """清零累计统计，便于按压测轮次观察"""
+    error = require_admin()
+    if error:
+        return error
+    pool = db.engine.pool
+    if isinstance(pool, db_pool.InstrumentedQueuePool):
+        pool.stats.reset()
+    return jsonify(db_pool.stats(db.engine))
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_text():
+    """当前进程各接口的耗时、SQL 语句数与响应大小（Prometheus 文本格式）
+
+    Prometheus 抓取时使用 Authorization: Bearer <METRICS_TOKEN>，也可以由管理员直接访问。
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())):
+        error = require_admin()
+        if error:
+            return error
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@bp.route('/metrics/reset', methods=['POST'])
+def reset_metrics():
+    """清零当前进程的接口统计"""
+    error = require_admin()
+    if error:
+        return error
+    metrics.reset()
+    return jsonify({'message': 'Metrics reset'})
+
+@bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """最近的请求剖析记录（由 X-Profile: 1 请求头或 PROFILE_SAMPLE_RATE 抽样产生），最新的在前"""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify(profiling.list_profiles())
+
+@bp.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """剖析记录详情：请求信息、SQL 列表与耗时最多的函数
+
+    参数: sort=cumulative（默认）|tottime|calls, limit 函数个数（默认 50）；
+    format=pstats 时下载 cProfile 原始数据
+    """
+    error = require_admin()
+    if error:
+        return error
+    if request.args.get('format') == 'pstats':
+        path = profiling.profile_path(profile_id, 'prof')
+        if path is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f'{profile_id}.prof')
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in profiling.SORT_KEYS:
+        return jsonify({'error': 'Invalid sort'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    profile = profiling.load_profile(profile_id, sort, limit)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(profile)
+
+@bp.route('/profiles/<profile_id>', methods=['DELETE'])
+def delete_profile(profile_id):
+    error = require_admin()
+    if error:
+        return error
+    if not profiling.delete_profile(profile_id):
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify({'message': 'Deleted successfully'})
+
+@bp.route('/replicas', methods=['GET'])
+def replica_status():
+    """各只读副本的延迟（秒，null 表示不可用）以及读请求的路由计数"""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify(replicas.monitor.status(replicas.replica_engines(db.engines)))
+
+@bp.route('/cache', methods=['GET'])
+def cache_stats():
+    """响应缓存的命中/未命中次数与换代（失效）次数"""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify(response_cache.cache.stats())
+
+@bp.route('/jobs', methods=['GET'])
+def job_stats():
+    """后台任务队列：各状态的任务数、最早到期任务的等待时间与最近的死信任务"""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify(jobs.stats())
+
+@bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """立即重新执行一个死信任务"""
+    error = require_admin()
+    if error:
+        return error
+    if not jobs.retry(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    db.session.commit()
+    return jsonify(jobs.stats())
+
+@bp.route('/roster', methods=['POST'])
+def import_roster():
+    """上传花名册（CSV/XLSX，字段 file）批量导入用户与课题，返回各类计数与出错的行"""
+    error = require_admin()
+    if error:
+        return error
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file provided'}), 400
+    try:
+        report = roster.import_roster(roster.read_rows(file.stream, file.filename))
+    except roster.RosterError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report.to_dict())
@@ -1,43 +1,60 @@
 from flask import Blueprint, request, jsonify
 from app.extensions import db
-from app.models import GuidanceRecord, Project, User
+from app.models import GuidanceRecord, Project
+from app.auth import get_current_user
+from app.replicas import replica_reads
+from app import response_cache, search, export, stats
+from app.db_utils import begin_write
+from app.conditional import conditional_json, list_validators
+from app.pagination import parse_fields, apply_projection, paginate
 
 # 创建蓝图，url_prefix 定义了该模块所有接口的前缀
 bp = Blueprint('guidance', __name__, url_prefix='/api/guidance')
 
-# 模拟当前登录用户 (实际项目中应从 Session/Token 获取)
-# 为了演示方便，我们假设请求头中包含 'X-User-Id'
-def get_current_user():
-    user_id = request.headers.get('X-User-Id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
+def filter_visible(query, user):
+    """按角色过滤指导记录（query 需已 join Project）；如果没有用户，返回所有记录（用于演示）"""
+    if user and user.role == 'student':
+        # 学生只能看自己课题的记录
+        query = query.filter(Project.student_id == user.id)
+    elif user and user.role == 'teacher':
+        # 老师看自己指导的课题
+        query = query.filter(Project.teacher_id == user.id)
+    elif user and user.role == 'admin':
+        # 教科办只能看到已提交的记录（status=1）
+        query = query.filter(GuidanceRecord.status == 1)
+    return query
 
 @bp.route('/records', methods=['GET'])
+@replica_reads
+@response_cache.cached_response('guidance')
 def get_records():
-    """获取指导记录列表"""
+    """获取指导记录列表（支持 limit/cursor 游标分页与 fields 字段投影）"""
     user = get_current_user()
     
-    # 如果没有用户，返回所有记录（用于演示）
-    if not user:
-        records = GuidanceRecord.query.all()
-        return jsonify([r.to_dict() for r in records])
+    # 预加载课题的学生和教师，to_dict() 不再逐行触发懒加载查询
+    eager = Project.eager_participants(GuidanceRecord.project)
+    # 按 (记录日期, id) 做游标分页
+    keys = [GuidanceRecord.record_date, GuidanceRecord.id]
+    fields = parse_fields(GuidanceRecord)
 
-    query = GuidanceRecord.query.join(Project)
+    query = filter_visible(GuidanceRecord.query.join(Project), user)
 
-    # 权限控制逻辑
-    if user.role == 'student':
-        # 学生只能看自己课题的记录
-        query = query.filter(Project.student_id == user.id)
-    elif user.role == 'teacher':
-        # 老师看自己指导的课题
-        query = query.filter(Project.teacher_id == user.id)
-    elif user.role == 'admin':
-        # 教科办只能看到已提交的记录（status=1）
-        query = query.filter(GuidanceRecord.status == 1)
+    # 数据未变化时直接返回 304，不查询明细、不序列化
+    etag, last_modified = list_validators('guidance')
+    query = apply_projection(query, GuidanceRecord, fields, keys, eager)
+    return conditional_json(lambda: paginate(query, keys, fields), etag, last_modified)
 
-    records = query.all()
-    return jsonify([r.to_dict() for r in records])
+# 导出时默认包含的列
+EXPORT_FIELDS = ('id', 'studentName', 'teacherName', 'date', 'content', 'teacherComment', 'status')
+
+@bp.route('/export', methods=['GET'])
+@replica_reads
+def export_records():
+    """导出指导记录（?format=csv|xlsx，流式输出），与列表接口相同的角色过滤"""
+    user = get_current_user()
+    query = filter_visible(GuidanceRecord.query.join(Project), user)
+    return export.export_response(query, GuidanceRecord, [GuidanceRecord.record_date, GuidanceRecord.id],
+                                  EXPORT_FIELDS, 'guidance', Project.eager_participants(GuidanceRecord.project))
 
 @bp.route('/records', methods=['POST'])
 def create_record():
@@ -69,6 +86,8 @@ def create_record():
         status=data.get('status', 0) # 默认为0(草稿)
     )
     db.session.add(new_record)
+    search.index(new_record)
+    response_cache.invalidate('guidance')
     db.session.commit()
     return jsonify(new_record.to_dict()), 201
 
@@ -81,14 +100,19 @@ def delete_records():
     if not ids:
         return jsonify({'message': 'No ids provided'}), 400
         
+    begin_write()
+    stats.removed(GuidanceRecord, ids)
     GuidanceRecord.query.filter(GuidanceRecord.id.in_(ids)).delete(synchronize_session=False)
+    search.remove('guidance', ids)
+    response_cache.invalidate('guidance')
     db.session.commit()
     return jsonify({'message': 'Deleted successfully'}), 200
 
 @bp.route('/records/<int:id>', methods=['PUT'])
 def update_record(id):
     """修改指导记录 (包括老师填写意见)"""
-    record = GuidanceRecord.query.get_or_404(id)
+    begin_write()
+    record = GuidanceRecord.query.with_for_update().get_or_404(id)
     data = request.json
     
     if 'content' in data:
@@ -98,10 +122,13 @@ def update_record(id):
     if 'status' in data:
         record.status = data['status']
         
+    search.index(record)
+    response_cache.invalidate('guidance')
     db.session.commit()
     return jsonify(record.to_dict())
 
 @bp.route('/info', methods=['GET'])
+@replica_reads
 def get_student_info():
     """获取当前用户的课题基本信息 (用于模块顶部显示)"""
     user = get_current_user()
@@ -127,7 +154,7 @@ def get_student_info():
     
     # 如果找不到项目，返回默认值
     if project:
-        return jsonify(project.to_dict())
+        return conditional_json(project.to_dict)
     else:
         # 返回第一个项目或默认值
         default_project = Project.query.first()
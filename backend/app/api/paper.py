@@ -1,27 +1,49 @@
 from flask import Blueprint, request, jsonify
 from app.extensions import db
-from app.models import Paper, User
+from app.models import Paper
+from app.auth import get_current_user
+from app.replicas import replica_reads
+from app import response_cache, search, export, stats
+from app.db_utils import begin_write
+from app.conditional import conditional_json, list_validators
+from app.pagination import parse_fields, apply_projection, paginate
 
 bp = Blueprint('paper', __name__, url_prefix='/api/paper')
 
-def get_current_user():
-    user_id = request.headers.get('X-User-Id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
+def filter_visible(query, user):
+    """权限控制：学生只能看自己的论文，老师可看所有，管理员可看所有"""
+    if user and user.role == 'student':
+        query = query.filter(Paper.student_id == user.id)
+    return query
 
 @bp.route('/list', methods=['GET'])
+@replica_reads
+@response_cache.cached_response('paper')
 def list_papers():
-    """获取论文列表"""
+    """获取论文列表（支持 limit/cursor 游标分页与 fields 字段投影）"""
     user = get_current_user()
     query = Paper.query
+    # upload_time 在上传时未必写入，游标按主键 id 分页
+    keys = [Paper.id]
+    fields = parse_fields(Paper)
 
-    # 权限控制：学生只能看自己的论文，老师可看所有，管理员可看所有
-    if user and user.role == 'student':
-        query = query.filter(Paper.student_id == user.id)
+    query = filter_visible(query, user)
 
-    papers = query.all()
-    return jsonify([p.to_dict() for p in papers])
+    etag, last_modified = list_validators('paper')
+    query = apply_projection(query, Paper, fields, keys)
+    return conditional_json(lambda: paginate(query, keys, fields), etag, last_modified)
+
+# 导出时默认包含的列
+EXPORT_FIELDS = ('id', 'title', 'studentId', 'version', 'uploadTime', 'reviewStatus', 'reviewType',
+                 'reviewComment', 'modifyComment', 'updatedAt')
+
+@bp.route('/export', methods=['GET'])
+@replica_reads
+def export_papers():
+    """导出论文列表（?format=csv|xlsx，流式输出），与列表接口相同的角色过滤"""
+    user = get_current_user()
+    query = filter_visible(Paper.query, user)
+    return export.export_response(query, Paper, [Paper.id], EXPORT_FIELDS, 'papers')
 
 @bp.route('/upload', methods=['POST'])
 def upload_paper():
@@ -43,6 +65,8 @@ def upload_paper():
         review_type=data.get('reviewType'),  # 可选
     )
     db.session.add(new_paper)
+    search.index(new_paper)
+    response_cache.invalidate('paper')
     db.session.commit()
     return jsonify(new_paper.to_dict()), 201
 
@@ -52,13 +76,16 @@ def review_paper(id):
     user = get_current_user()
     if not user or user.role != 'teacher':
         return jsonify({'error': '仅教师可评审'}), 403
-    paper = Paper.query.get_or_404(id)
+    begin_write()
+    paper = Paper.query.with_for_update().get_or_404(id)
     data = request.json
     paper.review_status = data.get('reviewStatus', '已评审')
     paper.review_type = data.get('reviewType', '一审')
     paper.reviewer_id = user.id
     paper.review_comment = data.get('reviewComment')
     paper.modify_comment = data.get('modifyComment')
+    search.index(paper)
+    response_cache.invalidate('paper')
     db.session.commit()
     return jsonify(paper.to_dict())
 
@@ -69,14 +96,19 @@ def delete_papers():
     ids = data.get('ids', [])
     if not ids:
         return jsonify({'message': 'No ids provided'}), 400
+    begin_write()
+    stats.removed(Paper, ids)
     Paper.query.filter(Paper.id.in_(ids)).delete(synchronize_session=False)
+    search.remove('paper', ids)
+    response_cache.invalidate('paper')
     db.session.commit()
     return jsonify({'message': 'Deleted successfully'}), 200
 
 @bp.route('/<int:id>', methods=['PUT'])
 def update_paper(id):
     """修改论文信息"""
-    paper = Paper.query.get_or_404(id)
+    begin_write()
+    paper = Paper.query.with_for_update().get_or_404(id)
     data = request.json
 
     if 'title' in data:
@@ -86,5 +118,7 @@ def update_paper(id):
     if 'filePath' in data:
         paper.file_path = data['filePath']
 
+    search.index(paper)
+    response_cache.invalidate('paper')
     db.session.commit()
     return jsonify(paper.to_dict())
\ No newline at end of file
@@ -0,0 +1,94 @@
+from flask import Blueprint, request, jsonify
+from app.extensions import db
+from app.models import GuidanceRecord, Paper, Project, SearchPosting
+from app.auth import get_current_user
+from app.replicas import replica_reads
+from app import search
+from app.api import guidance, paper
+from app.pagination import encode_cursor, decode_cursor, PaginationError
+
+bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+def visible_scopes(user, doc_types):
+    """各文档类型的可见范围，沿用列表接口（get_records / list_papers）的权限规则"""
+    # 学生、教师能看到的文档很少，先枚举可见文档再检索
+    narrow = bool(user) and user.role in ('student', 'teacher')
+    scopes = {}
+    if 'guidance' in doc_types:
+        query = guidance.filter_visible(GuidanceRecord.query.join(Project), user)
+        scopes['guidance'] = (query.with_entities(GuidanceRecord.id), narrow)
+    if 'paper' in doc_types:
+        query = paper.filter_visible(Paper.query, user)
+        # 只有学生的论文可见范围受限
+        scopes['paper'] = (query.with_entities(Paper.id), narrow and user.role == 'student')
+    return scopes
+
+@bp.route('', methods=['GET'])
+@replica_reads
+def search_documents():
+    """全文检索指导记录与论文
+
+    参数: q 关键词（空格分隔的多个词须同时出现）, type=guidance|paper（默认两者）, limit, cursor
+    返回: {items: [{type, score, snippet, ...记录字段}], nextCursor, truncated}
+    """
+    user = get_current_user()
+    text = (request.args.get('q') or '').strip()
+    if not text:
+        return jsonify({'error': 'Missing q'}), 400
+
+    doc_type = request.args.get('type')
+    if doc_type and doc_type not in search.DOC_TYPES:
+        return jsonify({'error': 'Invalid type'}), 400
+    doc_types = [doc_type] if doc_type else list(search.DOC_TYPES)
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = max(1, min(limit, MAX_LIMIT))
+    cursor = request.args.get('cursor')
+    # 游标为排序结果中的位置
+    offset = decode_cursor(cursor, [SearchPosting.doc_id])[0] if cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise PaginationError('Invalid cursor')
+
+    hits, next_offset, truncated = search.search(text, visible_scopes(user, doc_types), offset, limit)
+
+    # 一次查询取出本页的记录（指导记录连同课题的学生、教师）
+    ids = {}
+    for hit_type, hit_id, _ in hits:
+        ids.setdefault(hit_type, []).append(hit_id)
+    rows = {}
+    if ids.get('guidance'):
+        eager = Project.eager_participants(GuidanceRecord.project)
+        for record in GuidanceRecord.query.options(eager).filter(GuidanceRecord.id.in_(ids['guidance'])):
+            rows[('guidance', record.id)] = record
+    if ids.get('paper'):
+        for item in Paper.query.filter(Paper.id.in_(ids['paper'])):
+            rows[('paper', item.id)] = item
+
+    terms = search.query_terms(text)
+    items = []
+    for hit_type, hit_id, score in hits:
+        row = rows.get((hit_type, hit_id))
+        if row is None:
+            continue
+        fields = search.DOC_TYPES[hit_type][1]
+        text_value = next((getattr(row, field) for field, _ in fields
+                           if any(term in search.normalize(getattr(row, field)) for term in terms)), None)
+        item = row.to_dict()
+        item.update({
+            'type': hit_type,
+            'score': round(score, 4),
+            'snippet': search.snippet(text_value or getattr(row, fields[0][0]), terms),
+        })
+        items.append(item)
+
+    return jsonify({
+        'items': items,
+        'nextCursor': encode_cursor([next_offset]) if next_offset is not None else None,
+        'truncated': truncated
+    })
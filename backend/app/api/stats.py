@@ -0,0 +1,23 @@
+from flask import Blueprint, jsonify
+from app.auth import get_current_user
+from app.replicas import replica_reads
+from app import stats
+
+bp = Blueprint('stats', __name__, url_prefix='/api/stats')
+
+@bp.route('', methods=['GET'])
+@replica_reads
+def get_stats():
+    """任务书、指导记录、论文的数量统计：管理员看全部（按教师、按院系），教师只看自己指导的
+
+    返回: {totals, teachers: [{teacherId, teacherName, department, counts}], departments: [{department, counts}]}，
+    counts 形如 {task: {review: {approved, pending, ...}, ...}, guidance: {status: {...}}, paper: {reviewStatus: {...}}}
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if user.role == 'admin':
+        return jsonify(stats.summary())
+    if user.role == 'teacher':
+        return jsonify(stats.summary(teacher_id=user.id))
+    return jsonify({'error': '仅教师和管理员可访问'}), 403
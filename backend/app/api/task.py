@@ -1,31 +1,90 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from app.extensions import db
-from app.models import TaskDocument, Project, User
+from app.models import TaskDocument, Project
 import os
-import uuid
+import re
+import time
 from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload
+from app.auth import get_current_user, query_user_allowed
+from app.replicas import replica_reads
+from app import storage, response_cache, events, jobs, previews, export
+from app.db_utils import begin_write
+from app.upload_sessions import UploadSession, OffsetMismatch, UploadTooLarge, UploadBusy
+from app.pagination import parse_fields, apply_projection, paginate
+from app.conditional import conditional_json, list_validators, row_validators
 
 # 创建蓝图
 bp = Blueprint('task', __name__, url_prefix='/api/task')
 
-# 模拟当前登录用户
-def get_current_user():
-    user_id = request.headers.get('X-User-Id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
-
-# 文件上传配置
-UPLOAD_FOLDER = 'uploads/task'
+# 文件上传配置（文件本身由 app.storage 按内容去重保存）
+UPLOAD_FOLDER = storage.BLOB_ROOT
+# 分片上传会话（未完成的文件）存放目录
+UPLOAD_SESSION_FOLDER = storage.SESSION_FOLDER
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
+FILE_TYPES = ('student_draft', 'teacher_revision')
+# 建议客户端使用的分片大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def ensure_upload_folder():
-    """确保上传文件夹存在"""
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+def parse_project_id(value):
+    """处理 projectId：None、空字符串、字符串"null"或非数字都视为未指定"""
+    if value is None or str(value).strip() in ('', 'null'):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_task_id(value):
+    """批量接口中的 taskId：整数或数字字符串，其他（列表、小数、布尔值等）返回 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+def find_project(user, project_id):
+    """按 projectId 查找课题，未指定时根据用户角色查找；返回 (课题, 错误响应)"""
+    if project_id:
+        project = Project.query.get(project_id)
+    elif user.role == 'student':
+        project = Project.query.filter_by(student_id=user.id).first()
+    elif user.role == 'teacher':
+        project = Project.query.filter_by(teacher_id=user.id).first()
+    else:
+        return None, (jsonify({'error': 'Invalid user role'}), 400)
+
+    if not project:
+        return None, (jsonify({'error': 'Project not found'}), 404)
+    return project, None
+
+def attach_task_file(project, file_type, file_path):
+    """把已存入存储的文件登记到课题的任务书记录上，并释放被替换的旧文件"""
+    task_doc = TaskDocument.query.filter_by(project_id=project.id).first()
+    if not task_doc:
+        # 创建新记录
+        task_doc = TaskDocument(project_id=project.id)
+        db.session.add(task_doc)
+
+    if file_type == 'student_draft':
+        storage.release(task_doc.student_draft_path)
+        task_doc.student_draft_path = file_path
+    else:
+        storage.release(task_doc.teacher_revision_path)
+        task_doc.teacher_revision_path = file_path
+
+    # 旧文件在提交成功后由后台任务删除（且仅当没有其他记录引用同一内容时）；
+    # 新文件的预览同样由后台任务生成
+    previews.request_preview(file_path)
+    response_cache.invalidate('task')
+    events.task_changed(task_doc)
+    db.session.commit()
+    return task_doc
 
 @bp.route('/upload', methods=['POST'])
 def upload_file():
@@ -36,16 +95,7 @@ def upload_file():
             return jsonify({'error': 'Unauthorized'}), 401
         
         file_type = request.form.get('fileType')  # 'student_draft' 或 'teacher_revision'
-        project_id = request.form.get('projectId')
-        
-        # 处理project_id，如果是字符串"null"或空字符串，设为None
-        if project_id and project_id.strip() and project_id != 'null':
-            try:
-                project_id = int(project_id)
-            except:
-                project_id = None
-        else:
-            project_id = None
+        project_id = parse_project_id(request.form.get('projectId'))
         
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -56,97 +106,173 @@ def upload_file():
         
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed'}), 400
-        
-        ensure_upload_folder()
-        
-        # 生成唯一文件名
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        
-        # 确保目录存在（UPLOAD_FOLDER已经通过ensure_upload_folder()创建）
-        file.save(file_path)
-        
-        # 获取或创建任务书记录
-        project = None
-        if project_id:
-            project = Project.query.get(project_id)
-            if not project:
-                # 如果文件已保存，删除它
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                return jsonify({'error': 'Project not found'}), 404
-            task_doc = TaskDocument.query.filter_by(project_id=project_id).first()
-        else:
-            # 如果没有project_id，尝试根据用户查找
-            if user.role == 'student':
-                project = Project.query.filter_by(student_id=user.id).first()
-            elif user.role == 'teacher':
-                project = Project.query.filter_by(teacher_id=user.id).first()
-            else:
-                # 如果文件已保存，删除它
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                return jsonify({'error': 'Invalid user role'}), 400
-            
-            if not project:
-                # 如果文件已保存，删除它
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                return jsonify({'error': 'Project not found'}), 404
-            
-            task_doc = TaskDocument.query.filter_by(project_id=project.id).first()
-        
-        if not task_doc:
-            # 创建新记录
-            task_doc = TaskDocument(project_id=project.id)
-            db.session.add(task_doc)
-        
-        # 更新文件路径
-        if file_type == 'student_draft':
-            # 删除旧文件（如果存在）
-            if task_doc.student_draft_path and os.path.exists(task_doc.student_draft_path):
-                try:
-                    os.remove(task_doc.student_draft_path)
-                except:
-                    pass
-            task_doc.student_draft_path = file_path
-        elif file_type == 'teacher_revision':
-            # 删除旧文件（如果存在）
-            if task_doc.teacher_revision_path and os.path.exists(task_doc.teacher_revision_path):
-                try:
-                    os.remove(task_doc.teacher_revision_path)
-                except:
-                    pass
-            task_doc.teacher_revision_path = file_path
-        else:
-            # 如果文件已保存，删除它
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
+
+        if file_type not in FILE_TYPES:
             return jsonify({'error': 'Invalid file type'}), 400
+
+        # 先确认课题存在再保存文件，避免留下无人引用的文件
+        project, error = find_project(user, project_id)
+        if error:
+            return error
         
-        db.session.commit()
+        # 按内容摘要保存，相同内容的文件只存一份
+        file_path = storage.put_stream(file.stream, secure_filename(file.filename))
+        
+        task_doc = attach_task_file(project, file_type, file_path)
         return jsonify(task_doc.to_dict()), 200
     except Exception as e:
-        # 记录错误并返回JSON错误响应
-        import traceback
-        print(f"Upload error: {str(e)}")
-        print(traceback.format_exc())
+        # 记录错误（含堆栈）并返回JSON错误响应
+        current_app.logger.exception('Upload failed')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+def load_upload_session(user, upload_id):
+    """读取属于当前用户的分片上传会话；返回 (会话, 错误响应)"""
+    session = UploadSession.load(storage.abspath(UPLOAD_SESSION_FOLDER), upload_id)
+    if not session:
+        return None, (jsonify({'error': 'Upload session not found'}), 404)
+    if session.meta['userId'] != user.id:
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return session, None
+
+@bp.route('/upload/init', methods=['POST'])
+def init_chunked_upload():
+    """创建分片上传会话（大文件分片上传第一步）
+
+    请求体: {fileName, fileSize, fileType, projectId}
+    返回: {uploadId, offset, chunkSize, ...}，之后按 offset 逐片 PUT 数据，最后调用 finalize。
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.json or {}
+    file_name = data.get('fileName') or ''
+    file_type = data.get('fileType')
+    file_size = data.get('fileSize')
+
+    if not allowed_file(file_name):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if file_type not in FILE_TYPES:
+        return jsonify({'error': 'Invalid file type'}), 400
+    if not isinstance(file_size, int) or file_size <= 0:
+        return jsonify({'error': 'Invalid file size'}), 400
+    if file_size > current_app.config.get('TASK_UPLOAD_MAX_SIZE', file_size):
+        return jsonify({'error': 'File too large'}), 413
+
+    project, error = find_project(user, parse_project_id(data.get('projectId')))
+    if error:
+        return error
+
+    session = UploadSession.create(
+        storage.abspath(UPLOAD_SESSION_FOLDER),
+        userId=user.id,
+        projectId=project.id,
+        fileType=file_type,
+        fileName=secure_filename(file_name),
+        fileSize=file_size
+    )
+    # 客户端放弃上传且不调用 DELETE 时，由后台任务清理未完成的数据
+    jobs.enqueue('task.expire_upload', {'upload_id': session.upload_id},
+                 delay=current_app.config.get('TASK_UPLOAD_SESSION_TTL', 86400))
+    db.session.commit()
+    result = session.to_dict()
+    result['chunkSize'] = UPLOAD_CHUNK_SIZE
+    return jsonify(result), 201
+
+@bp.route('/upload/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """查询分片上传进度，断线后客户端从返回的 offset 继续上传"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    session, error = load_upload_session(user, upload_id)
+    if error:
+        return error
+    return jsonify(session.to_dict())
+
+@bp.route('/upload/<upload_id>', methods=['PUT'])
+def append_upload_chunk(upload_id):
+    """追加一个分片：请求体为原始二进制数据，查询参数 offset 为该分片的起始位置"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    session, error = load_upload_session(user, upload_id)
+    if error:
+        return error
+
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Invalid offset'}), 400
+
+    try:
+        # 直接从请求流边读边写，不经过 Werkzeug 的表单缓冲
+        new_offset = session.append(request.stream, offset)
+    except OffsetMismatch as e:
+        return jsonify({'error': 'Offset mismatch', 'offset': e.offset}), 409
+    except UploadBusy:
+        return jsonify({'error': 'Another chunk is being written', 'offset': session.offset}), 409
+    except UploadTooLarge:
+        return jsonify({'error': 'Chunk exceeds declared file size', 'offset': session.offset}), 413
+
+    return jsonify({'uploadId': session.upload_id, 'offset': new_offset})
+
+@bp.route('/upload/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """完成分片上传：文件移入存储，并在此时才更新任务书记录"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    session, error = load_upload_session(user, upload_id)
+    if error:
+        return error
+    if not session.complete:
+        return jsonify({'error': 'Upload incomplete', 'offset': session.offset}), 409
+
+    project = Project.query.get(session.meta['projectId'])
+    if not project:
+        session.discard()
+        return jsonify({'error': 'Project not found'}), 404
+
+    # 同一文件系统内重命名（内容已存在时直接丢弃），无需再复制一遍数据
+    file_path = storage.put_file(session.part_path, session.meta['fileName'])
+    session.discard()
+
+    task_doc = attach_task_file(project, session.meta['fileType'], file_path)
+    return jsonify(task_doc.to_dict()), 200
+
+@bp.route('/upload/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """放弃分片上传，删除已接收的数据"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    session, error = load_upload_session(user, upload_id)
+    if error:
+        return error
+    session.discard()
+    return jsonify({'message': 'Upload aborted'}), 200
+
+@jobs.job('task.expire_upload')
+def expire_upload(upload_id):
+    """删除超过 TASK_UPLOAD_SESSION_TTL 秒没有新数据的分片上传会话；仍在上传的顺延检查"""
+    session = UploadSession.load(storage.abspath(UPLOAD_SESSION_FOLDER), upload_id)
+    if not session:
+        return
+    ttl = current_app.config.get('TASK_UPLOAD_SESSION_TTL', 86400)
+    idle = time.time() - session.last_activity
+    if idle < ttl:
+        jobs.enqueue('task.expire_upload', {'upload_id': upload_id}, delay=ttl - idle)
+        db.session.commit()
+        return
+    session.discard()
+
 @bp.route('/info', methods=['GET'])
+@replica_reads
 def get_task_info():
     """获取任务书信息"""
     user = get_current_user()
@@ -185,7 +311,8 @@ def get_task_info():
             'adminStatus': None
         })
     
-    return jsonify(task_doc.to_dict())
+    etag, last_modified = row_validators('task', task_doc)
+    return conditional_json(task_doc.to_dict, etag, last_modified)
 
 @bp.route('/submit', methods=['POST'])
 def submit_task():
@@ -198,6 +325,9 @@ def submit_task():
     submit_type = data.get('submitType')  # 'student' 或 'teacher'
     project_id = data.get('projectId')
     
+    # 本事务要修改任务书：先开始写事务，下面加锁读取的是最新的已提交状态
+    begin_write()
+    
     # 查找项目
     if project_id:
         project = Project.query.get(project_id)
@@ -212,7 +342,7 @@ def submit_task():
     if not project:
         return jsonify({'error': 'Project not found'}), 404
     
-    task_doc = TaskDocument.query.filter_by(project_id=project.id).first()
+    task_doc = TaskDocument.query.filter_by(project_id=project.id).with_for_update().first()
     
     if not task_doc:
         return jsonify({'error': 'Task document not found'}), 404
@@ -249,40 +379,56 @@ def submit_task():
     else:
         return jsonify({'error': 'Invalid submit type'}), 400
     
+    response_cache.invalidate('task')
+    events.task_changed(task_doc)
     db.session.commit()
     return jsonify(task_doc.to_dict()), 200
 
 @bp.route('/list', methods=['GET'])
+@replica_reads
+@response_cache.cached_response('task')
 def get_task_list():
-    """获取任务书列表（教务处用）"""
+    """获取任务书列表（教务处用，支持 limit/cursor 游标分页与 fields 字段投影）"""
     user = get_current_user()
     
     if not user or user.role != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
     
+    keys = [TaskDocument.id]
+    fields = parse_fields(TaskDocument)
+
     # 返回所有记录（包括通过、退回和待审核的），只有主动删除的记录才不显示
     # 条件：曾经提交过（teacher_submitted曾经为1）或者当前状态不为None
-    task_docs = TaskDocument.query.filter(
-        (TaskDocument.teacher_submitted == 1) | 
-        (TaskDocument.admin_status != None)
-    ).all()
-    return jsonify([td.to_dict() for td in task_docs])
+    query = TaskDocument.query.filter(TaskDocument.in_review_list())
+    etag, last_modified = list_validators('task')
+    query = apply_projection(query, TaskDocument, fields, keys,
+                             Project.eager_participants(TaskDocument.project))
+    return conditional_json(lambda: paginate(query, keys, fields), etag, last_modified)
 
-@bp.route('/review', methods=['POST'])
-def review_task():
-    """教务处审核任务书（通过或退回）"""
+# 导出时默认包含的列（文件路径是内部引用，需要时用 fields= 指定）
+EXPORT_FIELDS = ('id', 'projectId', 'studentName', 'teacherName', 'studentSubmitted',
+                 'teacherSubmitted', 'adminStatus', 'updatedAt')
+
+@bp.route('/export', methods=['GET'])
+@replica_reads
+def export_task_list():
+    """导出任务书审核状态（教务处用，?format=csv|xlsx，流式输出）"""
     user = get_current_user()
+
     if not user or user.role != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
-    
-    data = request.json
-    task_id = data.get('taskId')
-    action = data.get('action')  # 'approve' 或 'return'
-    
-    task_doc = TaskDocument.query.get_or_404(task_id)
-    
+
+    query = TaskDocument.query.filter(TaskDocument.in_review_list())
+    return export.export_response(query, TaskDocument, [TaskDocument.id], EXPORT_FIELDS, 'tasks',
+                                  Project.eager_participants(TaskDocument.project))
+
+# 批量审核一次最多处理的条数
+REVIEW_BATCH_LIMIT = 1000
+
+def apply_review(task_doc, action):
+    """对单条任务书执行审核动作，返回错误信息；成功时返回 None（不提交事务）"""
     if task_doc.teacher_submitted != 1:
-        return jsonify({'error': 'Task not submitted by teacher yet'}), 400
+        return 'Task not submitted by teacher yet'
     
     if action == 'approve':
         task_doc.admin_status = 'approved'
@@ -294,11 +440,105 @@ def review_task():
         # 注意：不删除文件路径，保留已上传的文件，但允许重新上传覆盖
         # 标记曾经被退回过（通过保留admin_status='returned'来标记）
     else:
-        return jsonify({'error': 'Invalid action'}), 400
+        return 'Invalid action'
+    return None
+
+@bp.route('/review', methods=['POST'])
+def review_task():
+    """教务处审核任务书（通过或退回）"""
+    user = get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json
+    task_id = data.get('taskId')
+    action = data.get('action')  # 'approve' 或 'return'
+    
+    # 加行锁：同时审核同一任务书时后一个请求读到的是前一个提交后的状态
+    begin_write()
+    task_doc = TaskDocument.query.with_for_update().get_or_404(task_id)
+    
+    error = apply_review(task_doc, action)
+    if error:
+        return jsonify({'error': error}), 400
     
+    response_cache.invalidate('task')
+    events.task_changed(task_doc)
     db.session.commit()
     return jsonify(task_doc.to_dict()), 200
 
+@bp.route('/review/batch', methods=['POST'])
+def review_tasks_batch():
+    """教务处批量审核任务书
+
+    请求体: {"items": [{"taskId": 1, "action": "approve"}, {"taskId": 2, "action": "return"}, ...]}
+    taskId 为整数或数字字符串，无效或重复的条目单独返回错误；
+    一次查询取出全部任务书，逐条校验后在同一个事务中提交；
+    返回每一条的结果: {"results": [{"taskId", "ok", "error" | "task"}], "succeeded", "failed"}
+    """
+    user = get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    items = (request.json or {}).get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'No items provided'}), 400
+    if len(items) > REVIEW_BATCH_LIMIT:
+        return jsonify({'error': f'At most {REVIEW_BATCH_LIMIT} items per batch'}), 400
+    
+    # 先逐条校验 taskId：无法转换为整数或重复出现的条目单独报错，不参与查询
+    parsed = []
+    seen = set()
+    for item in items:
+        raw_id = item.get('taskId') if isinstance(item, dict) else None
+        task_id = parse_task_id(raw_id)
+        if task_id is None:
+            parsed.append((raw_id, None, 'Invalid taskId'))
+        elif task_id in seen:
+            parsed.append((task_id, None, 'Duplicate taskId'))
+        else:
+            seen.add(task_id)
+            parsed.append((task_id, item.get('action'), None))
+
+    # 只锁任务书（不锁预加载的课题与用户），按 id 顺序加锁，并发的批量审核不会互相死锁
+    begin_write()
+    task_docs = {
+        td.id: td for td in TaskDocument.query.options(
+            Project.eager_participants(TaskDocument.project)
+        ).filter(TaskDocument.id.in_(seen)).order_by(TaskDocument.id).with_for_update(of=TaskDocument)
+    } if seen else {}
+    
+    results = []
+    for task_id, action, error in parsed:
+        if error:
+            results.append({'taskId': task_id, 'ok': False, 'error': error})
+            continue
+        task_doc = task_docs.get(task_id)
+        if task_doc is None:
+            results.append({'taskId': task_id, 'ok': False, 'error': 'Task not found'})
+            continue
+        error = apply_review(task_doc, action)
+        if error:
+            results.append({'taskId': task_id, 'ok': False, 'error': error})
+        else:
+            results.append({'taskId': task_id, 'ok': True, 'task': task_doc})
+    
+    response_cache.invalidate('task')
+    for result in results:
+        if result['ok']:
+            events.task_changed(result['task'])
+    db.session.commit()
+    
+    for result in results:
+        if result['ok']:
+            result['task'] = result['task'].to_dict()
+    succeeded = sum(1 for r in results if r['ok'])
+    return jsonify({
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    }), 200
+
 @bp.route('/delete-file', methods=['POST'])
 def delete_file():
     """删除文件（学生或教师删除已上传的文件）"""
@@ -310,6 +550,9 @@ def delete_file():
     file_type = data.get('fileType')  # 'student_draft' 或 'teacher_revision'
     project_id = data.get('projectId')
     
+    # 本事务要修改任务书：先开始写事务，下面加锁读取的是最新的已提交状态
+    begin_write()
+    
     # 查找项目
     if project_id:
         project = Project.query.get(project_id)
@@ -324,7 +567,7 @@ def delete_file():
     if not project:
         return jsonify({'error': 'Project not found'}), 404
     
-    task_doc = TaskDocument.query.filter_by(project_id=project.id).first()
+    task_doc = TaskDocument.query.filter_by(project_id=project.id).with_for_update().first()
     
     if not task_doc:
         return jsonify({'error': 'Task document not found'}), 404
@@ -350,12 +593,11 @@ def delete_file():
         file_path = task_doc.teacher_revision_path
         task_doc.teacher_revision_path = None
     
-    if file_path and os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-        except:
-            pass
+    # 提交后才删除文件，且仅当没有其他记录引用同一内容时
+    storage.release(file_path)
     
+    response_cache.invalidate('task')
+    events.task_changed(task_doc)
     db.session.commit()
     return jsonify(task_doc.to_dict()), 200
 
@@ -369,20 +611,12 @@ def delete_task():
     data = request.json
     task_id = data.get('taskId')
     
-    task_doc = TaskDocument.query.get_or_404(task_id)
+    begin_write()
+    task_doc = TaskDocument.query.with_for_update().get_or_404(task_id)
     
-    # 删除文件
-    if task_doc.student_draft_path and os.path.exists(task_doc.student_draft_path):
-        try:
-            os.remove(task_doc.student_draft_path)
-        except:
-            pass
-    
-    if task_doc.teacher_revision_path and os.path.exists(task_doc.teacher_revision_path):
-        try:
-            os.remove(task_doc.teacher_revision_path)
-        except:
-            pass
+    # 释放文件引用，提交后删除不再被任何记录引用的文件
+    storage.release(task_doc.student_draft_path)
+    storage.release(task_doc.teacher_revision_path)
     
     # 重置所有状态，而不是删除记录，让业务重新开始
     task_doc.student_draft_path = None
@@ -391,19 +625,34 @@ def delete_task():
     task_doc.teacher_submitted = 0
     task_doc.admin_status = None
     
+    response_cache.invalidate('task')
+    events.task_changed(task_doc)
     db.session.commit()
     
     return jsonify(task_doc.to_dict()), 200
 
-@bp.route('/download/<int:task_id>', methods=['GET'])
-def download_file(task_id):
-    """下载文件"""
+@bp.route('/events', methods=['GET'])
+@query_user_allowed
+def task_events():
+    """任务书状态变化事件流（Server-Sent Events）
+
+    浏览器的 EventSource 不能设置请求头，用户通过查询参数 userId 传递；
+    每个事件的 data 为任务书的状态字段（id、projectId、文件路径、提交与审核状态）。
+    """
     user = get_current_user()
     if not user:
         return jsonify({'error': 'Unauthorized'}), 401
-    
-    task_doc = TaskDocument.query.get_or_404(task_id)
-    file_type = request.args.get('type')  # 'student_draft' 或 'teacher_revision'
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    return events.stream(user, last_event_id)
+
+def load_task_file(user, task_id, file_type):
+    """读取任务书中 file_type 对应的文件路径并检查下载权限；返回 (路径, 错误响应)"""
+    # 连同课题一起取出，权限检查时无需再查一次 projects 表
+    task_doc = TaskDocument.query.options(joinedload(TaskDocument.project)).get_or_404(task_id)
     
     file_path = None
     if file_type == 'student_draft':
@@ -412,37 +661,150 @@ def download_file(task_id):
         file_path = task_doc.teacher_revision_path
     
     if not file_path:
-        return jsonify({'error': 'File not found'}), 404
+        return None, (jsonify({'error': 'File not found'}), 404)
     
-    # 转换为绝对路径
-    if not os.path.isabs(file_path):
-        file_path = os.path.join(os.getcwd(), file_path)
-    
-    if not os.path.exists(file_path):
-        return jsonify({'error': 'File not found on server'}), 404
+    if not storage.exists(file_path):
+        return None, (jsonify({'error': 'File not found on server'}), 404)
     
     # 权限检查
-    project = Project.query.get(task_doc.project_id)
+    project = task_doc.project
     if not project:
-        return jsonify({'error': 'Project not found'}), 404
+        return None, (jsonify({'error': 'Project not found'}), 404)
     
     if user.role == 'student':
         # 学生可以下载自己的初稿和教师的修改稿
         if project.student_id != user.id:
-            return jsonify({'error': 'Unauthorized'}), 403
+            return None, (jsonify({'error': 'Unauthorized'}), 403)
         # 学生可以下载两种类型的文件
     elif user.role == 'teacher':
         # 教师可以下载学生的初稿和自己的修改稿
         if project.teacher_id != user.id:
-            return jsonify({'error': 'Unauthorized'}), 403
+            return None, (jsonify({'error': 'Unauthorized'}), 403)
         # 教师可以下载两种类型的文件
     # admin可以下载所有文件
+    return file_path, None
+
+@bp.route('/download/<int:task_id>', methods=['GET'])
+@query_user_allowed
+def download_file(task_id):
+    """下载文件"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
     
-    # 获取原始文件名
-    original_filename = os.path.basename(file_path)
-    # 移除UUID前缀
-    if '_' in original_filename:
-        original_filename = '_'.join(original_filename.split('_')[1:])
+    file_path, error = load_task_file(user, task_id, request.args.get('type'))  # 'student_draft' 或 'teacher_revision'
+    if error:
+        return error
     
-    return send_file(file_path, as_attachment=True, download_name=original_filename)
+    # inline=1 时在浏览器中直接打开（PDF 阅读器可按 Range 分段加载）
+    return storage.send_file(file_path, as_attachment=request.args.get('inline') != '1')
+
+# 打包下载时每次查询的任务书数量（查询之间读取文件，不长时间占用数据库连接）
+ARCHIVE_BATCH_SIZE = 200
+# 打包下载的文件类型 -> 压缩包内的文件名前缀（同时打包两种文件时使用）
+ARCHIVE_FILE_LABELS = {'teacher_revision': '任务书', 'student_draft': '学生初稿'}
+_UNSAFE_NAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+def archive_folder(task_doc):
+    """压缩包内的目录名：学生姓名-课题名称（去掉文件系统不允许的字符）"""
+    project = task_doc.project
+    student = project.student.name if project and project.student else '未知'
+    title = project.title if project else ''
+    name = _UNSAFE_NAME_RE.sub('_', f'{student}-{title}' if title else student).strip(' .')
+    return name[:80] or f'task-{task_doc.id}'
+
+def iter_archive_entries(task_ids, file_types):
+    """按 id 分批查询任务书，依次产生 (压缩包内路径, 文件绝对路径)"""
+    used = set()
+    last_id = 0
+    while True:
+        query = TaskDocument.query.options(Project.eager_participants(TaskDocument.project)) \
+            .filter(TaskDocument.id > last_id)
+        if task_ids is None:
+            query = query.filter(TaskDocument.admin_status == 'approved')
+        else:
+            query = query.filter(TaskDocument.id.in_(task_ids))
+        batch = query.order_by(TaskDocument.id).limit(ARCHIVE_BATCH_SIZE).all()
+        if not batch:
+            return
+        last_id = batch[-1].id
+        entries = []
+        for task_doc in batch:
+            folder = archive_folder(task_doc)
+            # 同名（同一学生的多个课题、重名学生）时加上任务书 id
+            if folder in used:
+                folder = f'{folder}_{task_doc.id}'
+            used.add(folder)
+            for file_type in file_types:
+                ref = getattr(task_doc, f'{file_type}_path')
+                if not ref:
+                    continue
+                name = storage.original_name(ref)
+                if len(file_types) > 1:
+                    name = f'{ARCHIVE_FILE_LABELS[file_type]}-{name}'
+                entries.append((f'{folder}/{name}', storage.resolve(ref)))
+        # 读取文件之前结束本批查询的事务
+        db.session.rollback()
+        yield from entries
+
+@bp.route('/archive', methods=['GET'])
+@query_user_allowed
+@replica_reads
+def download_archive():
+    """打包下载任务书文件（教务处用，流式输出 ZIP，不生成临时文件）
+
+    参数：ids=1,2,3 指定任务书（默认为全部已通过的任务书）；
+    type=teacher_revision（默认）/ student_draft / all。
+    压缩包内每个课题一个目录：学生姓名-课题名称/原文件名。
+    """
+    user = get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    file_type = request.args.get('type', 'teacher_revision')
+    if file_type == 'all':
+        file_types = FILE_TYPES
+    elif file_type in FILE_TYPES:
+        file_types = (file_type,)
+    else:
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    task_ids = None
+    if request.args.get('ids'):
+        try:
+            task_ids = sorted({int(value) for value in request.args['ids'].split(',') if value.strip()})
+        except ValueError:
+            return jsonify({'error': 'Invalid ids'}), 400
+        if len(task_ids) > REVIEW_BATCH_LIMIT:
+            return jsonify({'error': f'At most {REVIEW_BATCH_LIMIT} tasks per archive'}), 400
 
+    body = export.zip_chunks(iter_archive_entries(task_ids, file_types), missing_note='缺少的文件.txt')
+    response = Response(stream_with_context(body), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{export.attachment_name("tasks", "zip")}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/preview/<int:task_id>/<kind>', methods=['GET'])
+@query_user_allowed
+def preview_file(task_id, kind):
+    """文件预览：kind 为 image（首页图片）或 html（文本摘要），只传输几十 KB 而不是整个文件
+
+    预览由上传后的后台任务生成；尚未生成时返回 404 且 pending 为 true，无法生成（如缺少转换工具）时 pending 为 false。
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if kind not in previews.FORMATS:
+        return jsonify({'error': 'Invalid preview kind'}), 400
+    
+    file_path, error = load_task_file(user, task_id, request.args.get('type'))
+    if error:
+        return error
+    
+    response = previews.send_preview(file_path, kind)
+    if response is None:
+        digest = storage.parse_ref(file_path)
+        pending = bool(digest) and previews.manifest(digest) is None
+        return jsonify({'error': 'Preview not available', 'pending': pending}), 404
+    return response
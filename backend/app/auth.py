@@ -0,0 +1,126 @@
+"""当前登录用户解析
+
+模拟登录：请求头 X-User-Id 携带用户 id（实际项目中应从 Session/Token 获取）。
+查询参数 userId 只在用 query_user_allowed 标记的 GET 接口（文件下载、预览、事件流等浏览器直接打开的链接）中有效，
+其他接口——尤其是写接口与管理接口——只认请求头，不能通过链接、<img> 或表单冒用身份。
+- 每个请求只解析一次，结果存入 flask.g；
+- 跨请求使用有界的 TTL + LRU 缓存保存用户快照，省去每次请求的 users 表查询；
+- 用户被修改或删除（例如角色变化）时，flush 时记下 id，事务提交后才使对应缓存失效：
+  提交之前其他线程读到的仍是旧行，过早失效会让旧行被重新缓存；
+  提交前已开始的查询在失效之后才写入缓存的情况，由失效计数检测，这样的结果不写入缓存。
+"""
+import threading
+from flask import request, g, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.extensions import db
+from app.models import User
+from app.ttl_cache import TTLCache
+
+
+class CurrentUser:
+    """用户行的只读快照，不绑定数据库会话，可以安全地跨请求复用"""
+
+    def __init__(self, user):
+        for column in User.__table__.columns:
+            setattr(self, column.key, getattr(user, column.key))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'name': self.name,
+            'role': self.role,
+            'department': self.department
+        }
+
+
+user_cache = TTLCache()
+# 每次使缓存失效时加一；加载期间发生过失效的查询结果可能已过时，不写入缓存
+_evictions = 0
+_evictions_lock = threading.Lock()
+
+
+def init_app(app):
+    """按配置调整缓存容量与过期时间"""
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', user_cache.maxsize)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', user_cache.ttl)
+    user_cache.clear()
+
+
+def load_user(user_id):
+    """按 id 取用户快照：先查缓存，未命中再查数据库"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    evictions = _evictions
+    row = db.session.get(User, user_id)
+    if row is None:
+        return None
+    user = CurrentUser(row)
+    with _evictions_lock:
+        if evictions == _evictions:
+            user_cache.put(user_id, user)
+    return user
+
+
+def query_user_allowed(view):
+    """标记视图：浏览器无法为其设置请求头（新窗口、<img>、EventSource），GET 请求可用查询参数 userId
+
+    放在 @bp.route 的下一行（最外层），标记在注册的视图函数上。
+    """
+    view.query_user_allowed = True
+    return view
+
+
+def _query_user_id():
+    if request.method != 'GET':
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, 'query_user_allowed', False):
+        return None
+    return request.args.get('userId')
+
+
+def get_current_user():
+    """返回当前请求的用户；未登录或 id 无效时返回 None。同一请求内只解析一次"""
+    if 'current_user' in g:
+        return g.current_user
+
+    user = None
+    # 浏览器直接打开的链接（文件预览等）无法携带自定义请求头，这些接口可从查询参数 userId 读取
+    user_id = request.headers.get('X-User-Id') or _query_user_id()
+    if user_id:
+        try:
+            user = load_user(int(user_id))
+        except ValueError:
+            current_app.logger.debug('Invalid X-User-Id header: %r', user_id)
+    g.current_user = user
+    return user
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _collect_changed_user(mapper, connection, target):
+    # 此时还没有提交，只记下 id
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    global _evictions
+    user_ids = session.info.pop('changed_user_ids', None)
+    if not user_ids:
+        return
+    # 角色、姓名等发生变化后，下一次请求重新从数据库加载
+    with _evictions_lock:
+        _evictions += 1
+        for user_id in user_ids:
+            user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('changed_user_ids', None)
@@ -0,0 +1,204 @@
+"""命令行工具：flask --app run <命令>"""
+import json
+import time
+import click
+from flask.cli import AppGroup
+from flask import current_app
+from sqlalchemy import select
+from app import migrations, jobs, reconcile, previews, storage, search, roster, stats
+from app.extensions import db
+from app.models import BackgroundJob
+
+db_cli = AppGroup('db', help='数据库版本迁移')
+jobs_cli = AppGroup('jobs', help='后台任务队列')
+storage_cli = AppGroup('storage', help='上传文件存储')
+search_cli = AppGroup('search', help='全文检索索引')
+users_cli = AppGroup('users', help='用户与课题')
+stats_cli = AppGroup('stats', help='统计计数')
+
+
+@db_cli.command('upgrade')
+@click.option('--target', default=None, help='升级到指定版本（默认最新）')
+def upgrade_command(target):
+    """执行未执行的迁移（部署时运行一次）"""
+    done = migrations.upgrade(target)
+    click.echo(f"已升级: {', '.join(done)}" if done else '数据库已是最新版本')
+
+
+@db_cli.command('downgrade')
+@click.argument('target')
+def downgrade_command(target):
+    """回滚到指定版本；TARGET 为 base 时回滚全部迁移"""
+    done = migrations.downgrade(None if target == 'base' else target)
+    click.echo(f"已回滚: {', '.join(done)}" if done else '没有需要回滚的版本')
+
+
+@db_cli.command('current')
+def current_command():
+    """显示当前数据库版本"""
+    click.echo(migrations.current_revision() or 'base')
+
+
+@db_cli.command('history')
+def history_command():
+    """列出所有迁移及其执行状态"""
+    applied = migrations.applied_revisions(migrations.db.engine)
+    for module in migrations.load_migrations():
+        mark = '*' if module.revision in applied else ' '
+        click.echo(f'{mark} {module.revision}  {module.description}')
+
+
+@db_cli.command('seed')
+def seed_command():
+    """写入演示用的测试数据（数据库为空时）"""
+    from app import init_test_data
+    init_test_data()
+    click.echo('测试数据已初始化')
+
+
+@jobs_cli.command('worker')
+@click.option('--threads', default=1, show_default=True, help='worker 线程数')
+def worker_command(threads):
+    """持续执行后台任务（生产环境单独运行，Ctrl+C 退出）"""
+    app = current_app._get_current_object()
+    worker = jobs.Worker(app, threads)
+    worker.start()
+    click.echo(f'后台任务 worker 已启动（{threads} 个线程）')
+    try:
+        while worker.is_alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        worker.stop(timeout=30)
+
+
+@jobs_cli.command('run')
+@click.option('--limit', default=None, type=int, help='最多执行的任务数')
+def run_command(limit):
+    """执行当前所有到期的任务后退出（可用于 cron）"""
+    succeeded, failed = jobs.run_pending(current_app._get_current_object(), limit)
+    click.echo(f'成功 {succeeded} 个，失败 {failed} 个')
+
+
+@jobs_cli.command('list')
+@click.option('--status', type=click.Choice(['pending', 'running', 'dead']), default=None)
+@click.option('--limit', default=50, show_default=True)
+def list_command(status, limit):
+    """列出队列中的任务"""
+    query = select(BackgroundJob).order_by(BackgroundJob.id).limit(limit)
+    if status:
+        query = query.where(BackgroundJob.status == status)
+    for item in db.session.scalars(query):
+        click.echo(f'{item.id}  {item.status:<7}  {item.kind}  {item.payload}  '
+                   f'attempts={item.attempts}/{item.max_attempts}  runAt={item.run_at:%Y-%m-%d %H:%M:%S}')
+        if item.last_error:
+            click.echo(f'    {item.last_error}')
+
+
+@jobs_cli.command('retry')
+@click.argument('job_id', type=int)
+def retry_command(job_id):
+    """立即重新执行一个死信任务"""
+    if not jobs.retry(job_id):
+        raise click.ClickException(f'任务 {job_id} 不存在或正在执行')
+    db.session.commit()
+    click.echo(f'任务 {job_id} 已重新加入队列')
+
+
+@storage_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help='删除孤立文件、修正引用计数（默认只报告）')
+@click.option('--fix-dangling', is_flag=True, help='清空指向不存在文件的任务书路径')
+@click.option('--min-age', default=None, type=int, help='不处理修改时间在该秒数之内的文件（默认 STORAGE_RECONCILE_MIN_AGE）')
+@click.option('--batch-size', default=1000, show_default=True, help='每批读取的记录/文件数')
+@click.option('--schedule', is_flag=True, help='不立即执行，改为加入定期对账的后台任务')
+@click.option('--json', 'as_json', is_flag=True, help='以 JSON 输出完整报告')
+def reconcile_command(fix, fix_dangling, min_age, batch_size, schedule, as_json):
+    """对比 uploads/task 与任务书中的文件路径，报告（并可修复）孤立文件与悬空引用"""
+    if schedule:
+        reconcile.schedule()
+        db.session.commit()
+        click.echo('已加入定期对账任务')
+        return
+    if min_age is None:
+        min_age = current_app.config.get('STORAGE_RECONCILE_MIN_AGE', 3600)
+    report = reconcile.reconcile(fix=fix, fix_dangling=fix_dangling, min_age=min_age, batch_size=batch_size)
+    result = report.to_dict()
+    if as_json:
+        click.echo(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    click.echo(f"扫描文件 {result['scannedFiles']} 个，引用 {result['scannedRefs']} 个，"
+               f"用时 {result['seconds']} 秒")
+    for category, count in result['counts'].items():
+        click.echo(f'  {category:<22} {count}')
+        for item in result['samples'][category][:10]:
+            click.echo(f'      {item}')
+    click.echo(f"孤立文件共 {result['orphanBytes']} 字节")
+    click.echo(f"已修复 {result['repaired']} 项" if fix or fix_dangling else '仅报告，加 --fix 执行修复')
+
+
+@storage_cli.command('previews')
+@click.option('--batch-size', default=1000, show_default=True)
+def previews_command(batch_size):
+    """为还没有预览的任务书文件（如本功能上线前上传的）安排生成预览"""
+    queued = 0
+    for name in reconcile.REF_COLUMNS:
+        for batch in reconcile._batches(reconcile.iter_refs(name, batch_size), batch_size):
+            for ref, _, _ in batch:
+                digest = storage.parse_ref(ref)
+                if digest and previews.manifest(digest) is None:
+                    previews.request_preview(ref)
+                    queued += 1
+            db.session.commit()
+    click.echo(f'已安排生成 {queued} 个文件的预览')
+
+
+@search_cli.command('reindex')
+@click.option('--batch-size', default=500, show_default=True)
+def reindex_command(batch_size):
+    """重建指导记录与论文的全文检索索引（迁移 0008 之后运行一次）"""
+    total = search.rebuild(batch_size)
+    click.echo(f'已为 {total} 条记录建立索引')
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=None, type=int, help='每个事务处理的行数（默认 ROSTER_BATCH_SIZE）')
+@click.option('--json', 'as_json', is_flag=True, help='以 JSON 输出完整报告')
+def import_command(path, batch_size, as_json):
+    """从花名册（CSV/XLSX）批量导入用户与课题"""
+    def progress(report):
+        if not as_json:
+            click.echo(f'已处理 {report.rows} 行（{report.rows / max(report.seconds, 1e-6):.0f} 行/秒）', err=True)
+
+    with open(path, 'rb') as f:
+        try:
+            report = roster.import_roster(roster.read_rows(f, path), batch_size, progress)
+        except roster.RosterError as e:
+            raise click.ClickException(str(e))
+    result = report.to_dict()
+    if as_json:
+        click.echo(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    click.echo(f"共 {result['rows']} 行，用时 {result['seconds']} 秒（{result['rowsPerSecond']} 行/秒）")
+    click.echo(f"用户: 新建 {result['usersCreated']}，已存在 {result['usersExisting']}")
+    click.echo(f"课题: 新建 {result['projectsCreated']}，已有课题 {result['projectsExisting']}")
+    if result['errorCount']:
+        click.echo(f"错误 {result['errorCount']} 行:")
+        for item in result['errors']:
+            click.echo(f"  第 {item['row']} 行: {item['error']}")
+
+
+@stats_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_stats_command(batch_size):
+    """按明细重新计算统计计数（迁移 0010 之后运行一次）"""
+    total = stats.rebuild(batch_size)
+    click.echo(f'已统计 {total} 条记录')
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(stats_cli)
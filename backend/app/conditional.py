@@ -0,0 +1,71 @@
+"""JSON 接口的条件请求（ETag / Last-Modified）
+
+校验值在序列化之前计算，客户端带 If-None-Match / If-Modified-Since 且数据未变时直接返回 304，
+省去整表查询、to_dict() 与响应体传输：
+- 单条记录：行的 updated_at，混入命名空间的代次（弥补 updated_at 只精确到秒的问题）；
+- 列表：只用命名空间的代次（app/response_cache.py 中写接口提交后换代的表级版本号），
+  不对结果集做 COUNT/MAX 聚合，分页列表的首页仍然只读取一页；
+- 读副本的列表请求在换代后 DB_REPLICA_MAX_LAG 秒内可能读到旧数据，这段时间内按响应体计算 ETag。
+响应带 Cache-Control: private, no-cache，浏览器每次使用前都需校验。
+"""
+import hashlib
+from datetime import datetime, timedelta
+from flask import g, jsonify, request, current_app
+from werkzeug.http import is_resource_modified
+from app import response_cache
+from app.auth import get_current_user
+from app.extensions import db
+from app.replicas import replica_engines
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def latest(*times):
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+
+def row_validators(namespace, row):
+    """单条记录的 (etag, last_modified)"""
+    token = response_cache.generation(namespace)
+    etag = make_etag(response_cache.request_signature(get_current_user()), token,
+                     type(row).__name__, row.id, row.updated_at)
+    return etag, latest(row.updated_at, response_cache.token_time(token))
+
+
+def list_validators(namespace):
+    """列表的 (etag, last_modified)，不查询数据库；副本可能还没有最新数据时返回 (None, None)"""
+    token = response_cache.generation(namespace)
+    changed = response_cache.token_time(token)
+    if changed is not None and g.get('replica_reads') and replica_engines(db.engines):
+        lag = timedelta(seconds=current_app.config.get('DB_REPLICA_MAX_LAG', 5))
+        if datetime.utcnow() - changed <= lag:
+            return None, None
+    etag = make_etag(response_cache.request_signature(get_current_user()), token)
+    return etag, changed
+
+
+def _finish(response, etag, last_modified):
+    response.set_etag(etag)
+    if isinstance(last_modified, datetime):
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('X-User-Id')
+    return response
+
+
+def conditional_json(build, etag=None, last_modified=None):
+    """未修改时返回 304，否则调用 build() 生成 JSON 响应体。
+
+    不提供 etag 时按响应体计算（只能省去传输，不能省去查询和序列化）。
+    """
+    if etag is not None and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return _finish(jsonify(), etag, last_modified).make_conditional(request.environ)
+
+    response = jsonify(build())
+    if etag is None:
+        etag = make_etag(response.get_data())
+    return _finish(response, etag, last_modified).make_conditional(request.environ)
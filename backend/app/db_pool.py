@@ -0,0 +1,183 @@
+"""数据库连接池配置与监控
+
+- engine_options(config)：按 Config 中的 DB_* 配置生成 SQLALCHEMY_ENGINE_OPTIONS；
+- InstrumentedQueuePool：在 QueuePool 基础上统计取连接等待时间、超时、溢出连接与失效连接；
+- stats(engine)：当前进程连接池的占用快照，供 GET /api/admin/pool 使用。
+"""
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from app.extensions import db
+
+
+class PoolStats:
+    """连接池累计统计（线程安全）；最近的等待时间样本用于计算分位数"""
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.timeouts = 0
+            self.connects = 0
+            self.overflow_connects = 0
+            self.invalidations = 0
+            self.peak_checked_out = 0
+            self.recent_waits = deque(maxlen=self._samples)
+            self.since = time.time()
+
+    def record_checkout(self, wait, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.recent_waits.append(wait)
+
+    def record_timeout(self, wait):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max = max(self.wait_max, wait)
+
+    def record_connect(self, overflow):
+        with self._lock:
+            self.connects += 1
+            if overflow:
+                self.overflow_connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def to_dict(self):
+        with self._lock:
+            waits = sorted(self.recent_waits)
+
+            def percentile(fraction):
+                if not waits:
+                    return 0.0
+                return round(waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000, 3)
+
+            return {
+                'since': self.since,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'waitMsAvg': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'waitMsP50': percentile(0.50),
+                'waitMsP99': percentile(0.99),
+                'waitMsMax': round(self.wait_max * 1000, 3),
+                'connects': self.connects,
+                'overflowConnects': self.overflow_connects,
+                'invalidations': self.invalidations,
+                'peakCheckedOut': self.peak_checked_out,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录每次取连接的耗时（含排队等待与 pre-ping），以及超时和溢出连接的次数"""
+
+    def __init__(self, creator, stats=None, **kw):
+        super().__init__(creator, **kw)
+        self.stats = stats if stats is not None else PoolStats()
+
+    def recreate(self):
+        # 数据库断开后 SQLAlchemy 会整体重建连接池，统计沿用
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+    def _create_connection(self):
+        record = super()._create_connection()
+        # overflow() > 0 表示已超出 pool_size，正在使用 max_overflow 的名额
+        self.stats.record_connect(overflow=self.overflow() > 0)
+        return record
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory')
+
+
+def engine_options(config):
+    """由 DB_* 配置生成 create_engine 参数；内存 SQLite 只能使用单连接池，保持 Flask-SQLAlchemy 的默认值"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_memory_sqlite(uri):
+        return {}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', -1),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    if make_url(uri).get_backend_name() == 'mysql':
+        connect_args = {
+            'connect_timeout': config.get('DB_CONNECT_TIMEOUT', 10),
+            'read_timeout': config.get('DB_READ_TIMEOUT', 60),
+            'write_timeout': config.get('DB_WRITE_TIMEOUT', 60),
+        }
+        statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+        if statement_timeout:
+            connect_args['init_command'] = f'SET SESSION max_execution_time = {int(statement_timeout)}'
+        options['connect_args'] = connect_args
+    return options
+
+
+def init_app(app):
+    """未显式配置 SQLALCHEMY_ENGINE_OPTIONS 时使用 engine_options()；需在 db.init_app 之前调用"""
+    if not app.config.get('SQLALCHEMY_ENGINE_OPTIONS'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def watch_engine(app):
+    """统计连接失效（pre-ping 失败、连接被服务器断开等）；需在 db.init_app 之后调用"""
+    with app.app_context():
+        engine = db.engine
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        event.listen(engine, 'invalidate',
+                     lambda dbapi_connection, connection_record, exception:
+                     engine.pool.stats.record_invalidation())
+
+
+def stats(engine):
+    """当前进程连接池的实时占用与累计统计"""
+    pool = engine.pool
+    result = {
+        'pid': os.getpid(),
+        'pool': type(pool).__name__,
+        'status': pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        result.update({
+            'size': pool.size(),
+            'maxOverflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+            'checkedOut': pool.checkedout(),
+            'checkedIn': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        result.update(pool.stats.to_dict())
+    return result
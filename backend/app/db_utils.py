@@ -0,0 +1,16 @@
+"""数据库事务辅助
+
+先读取再按读到的旧值修改的接口（审核、提交任务书等），在读取之前调用 begin_write()，
+再用 query.with_for_update() 加行锁读取要修改的记录：
+- MySQL：begin_write() 什么也不做，SELECT ... FOR UPDATE 加行锁，并发修改同一行的事务依次执行；
+- SQLite：没有行锁（FOR UPDATE 被忽略），begin_write() 立即开始写事务（BEGIN IMMEDIATE），
+  其他写事务在这里等待本事务提交，之后读到的是最新的已提交状态。
+"""
+from app.extensions import db
+
+
+def begin_write():
+    """在工作单元开始、本事务还没有任何写入时调用，声明本事务将修改数据"""
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
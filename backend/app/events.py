@@ -0,0 +1,308 @@
+"""任务书状态变化的实时推送（Server-Sent Events）
+
+- 写接口调用 task_changed(task_doc)，提交事务前为其写入一条 task_events 记录，
+  事件与业务修改同时提交或同时回滚；
+- 每个进程一个后台线程轮询 task_events（EVENTS_POLL_INTERVAL 秒一次，本进程提交后立即唤醒），
+  新事件放入内存环形缓冲区并唤醒该进程中所有 SSE 连接，多进程部署无需额外的消息队列；
+- GET /api/task/events 按接收者过滤后推送：课题的学生、教师，以及教务处（接收全部）；
+- 断线后浏览器自动重连并带上 Last-Event-ID，缓冲区中没有的事件从数据库补发；
+- 事件 id 的提交顺序与大小顺序不一致时，晚提交的事件照样推送（见 EventBroker）。
+
+生产环境中事件流由单独的 gevent 进程提供（gunicorn.events.conf.py），每个连接一个协程；
+连接在 EVENTS_STREAM_TIMEOUT 秒后由服务端结束，浏览器随即重连。每个进程同时打开的事件流
+不超过 EVENTS_MAX_STREAMS 个，超过时返回 503 与 Retry-After；在 gthread 进程中每个连接占用一个线程，
+该值须小于线程数，至少留下一部分线程处理普通接口。
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from flask import Response, current_app
+from sqlalchemy import event, func, select, delete, insert, or_
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Project, TaskEvent
+
+# 推送给客户端的任务书字段（不含需要额外查询的姓名、更新时间）
+EVENT_FIELDS = ('id', 'projectId', 'studentDraftPath', 'studentSubmitted',
+                'teacherRevisionPath', 'teacherSubmitted', 'adminStatus')
+# 断线重连时一次最多补发的事件数（也是每次轮询最多读取的事件数）
+REPLAY_LIMIT = 500
+# 启动时从最大 id 之前多少个开始读取，以及最多同时等待的空缺 id 数
+START_WINDOW = 100
+MAX_GAPS = 1000
+# 事件流已满时，建议客户端等待的秒数
+BUSY_RETRY_SECONDS = 30
+
+
+def task_changed(task_doc):
+    """登记任务书的状态变化；事件在提交事务前写入"""
+    db.session.info.setdefault('task_events', {})[id(task_doc)] = task_doc
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_events(session):
+    pending = session.info.pop('task_events', None)
+    if not pending:
+        return
+    # 新建的任务书需要先 flush 才有 id
+    session.flush()
+    docs = list(pending.values())
+    participants = {
+        row.id: row for row in session.execute(
+            select(Project.id, Project.student_id, Project.teacher_id)
+            .where(Project.id.in_({doc.project_id for doc in docs}))
+        )
+    }
+    rows = []
+    for doc in docs:
+        project = participants.get(doc.project_id)
+        rows.append({
+            'task_id': doc.id,
+            'project_id': doc.project_id,
+            'student_id': project.student_id if project else None,
+            'teacher_id': project.teacher_id if project else None,
+            'payload': json.dumps(doc.to_dict(fields=EVENT_FIELDS), ensure_ascii=False),
+        })
+    # 批量审核时一次 executemany 写入全部事件
+    session.execute(insert(TaskEvent), rows)
+    session.info['task_events_written'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('task_events_written', False):
+        broker.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('task_events', None)
+    session.info.pop('task_events_written', None)
+
+
+class EventBroker:
+    """进程内的事件分发：一个轮询线程 + 环形缓冲区，SSE 连接在条件变量上等待新事件
+
+    自增 id 在插入时分配，提交顺序可能与 id 顺序不同（MySQL 中 id 较小的事务可能在较大的 id
+    被读到之后才提交），因此不能只读取 id > last_id：last_id 以下尚未出现的 id 记为空缺，
+    之后每次轮询一并重新查询，直到出现或超过 EVENTS_GAP_TIMEOUT 秒（回滚的事务、跳过的自增值）。
+    缓冲区按到达顺序编号，连接按序号等待，晚到的较小 id 同样推送；
+    watermark 以下的 id 都已到达或放弃等待，作为推送给客户端的事件 id，断线重连时从这里补发。
+    """
+
+    def __init__(self, buffer_size=1000):
+        self._cond = threading.Condition()
+        # (到达序号, 事件)
+        self._events = deque(maxlen=buffer_size)
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._app = None
+        # 已放入缓冲区的事件数
+        self.sequence = 0
+        # 读到的最大 id
+        self.last_id = 0
+        # 空缺的 id -> 放弃等待的时间（time.monotonic()）
+        self.gaps = {}
+        # 不在缓冲区中的最大 id：大于它的已到达事件都在缓冲区里
+        self.evicted_id = 0
+
+    def start(self, app):
+        """首次订阅时启动轮询线程（gunicorn fork 之后，每个进程各自一个），等待第一次轮询完成"""
+        with self._cond:
+            if self._app is not app or self._thread is None or not self._thread.is_alive():
+                # 换了应用实例（例如测试中重新 create_app）时，旧线程在下一轮退出
+                self._app = app
+                self._events.clear()
+                self.gaps.clear()
+                last_id = db.session.execute(select(func.max(TaskEvent.id))).scalar() or 0
+                # 最近的 START_WINDOW 个 id 中可能还有未提交的事务，从这里开始读取
+                self.last_id = self.evicted_id = max(last_id - START_WINDOW, 0)
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._run, args=(app,), name='task-events', daemon=True)
+                self._thread.start()
+        self._ready.wait(10)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self, app):
+        interval = app.config.get('EVENTS_POLL_INTERVAL', 1.0)
+        gap_timeout = app.config.get('EVENTS_GAP_TIMEOUT', 60)
+        retention = timedelta(hours=app.config.get('EVENTS_RETENTION_HOURS', 24))
+        next_prune = 0
+        while self._app is app:
+            with app.app_context():
+                try:
+                    self._poll(gap_timeout)
+                    if time.monotonic() >= next_prune:
+                        db.session.execute(delete(TaskEvent).where(TaskEvent.created_at < datetime.utcnow() - retention))
+                        db.session.commit()
+                        next_prune = time.monotonic() + 3600
+                except Exception:
+                    app.logger.exception('Polling task events failed')
+                finally:
+                    db.session.remove()
+            self._ready.set()
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def _poll(self, gap_timeout):
+        with self._cond:
+            condition = TaskEvent.id > self.last_id
+            if self.gaps:
+                condition = or_(condition, TaskEvent.id.in_(list(self.gaps)))
+        rows = db.session.scalars(
+            select(TaskEvent).where(condition).order_by(TaskEvent.id).limit(REPLAY_LIMIT)
+        ).all()
+        db.session.expunge_all()
+        now = time.monotonic()
+        with self._cond:
+            for row in rows:
+                self.gaps.pop(row.id, None)
+                if row.id > self.last_id:
+                    # 按 id 顺序读取，两个新 id 之间缺少的是尚未提交（或已回滚）的事务
+                    for missing in range(max(self.last_id + 1, row.id - MAX_GAPS), row.id):
+                        self.gaps[missing] = now + gap_timeout
+                    self.last_id = row.id
+                if len(self._events) == self._events.maxlen:
+                    self.evicted_id = max(self.evicted_id, self._events[0][1].id)
+                self.sequence += 1
+                self._events.append((self.sequence, row))
+            for missing in [i for i, expires in self.gaps.items() if expires <= now]:
+                del self.gaps[missing]
+            for missing in sorted(self.gaps)[:max(len(self.gaps) - MAX_GAPS, 0)]:
+                del self.gaps[missing]
+            if rows:
+                self._cond.notify_all()
+
+    def _watermark(self):
+        return min(self.gaps) - 1 if self.gaps else self.last_id
+
+    def position(self):
+        """当前的到达序号与 watermark；新连接从这里开始等待"""
+        with self._cond:
+            return self.sequence, self._watermark()
+
+    def wait(self, position, timeout):
+        """等待序号大于 position 的事件；返回 (事件, 新的序号, watermark)，超时时事件为空"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.sequence > position, timeout)
+            events = [e for sequence, e in self._events if sequence > position]
+            return events, self.sequence, self._watermark()
+
+    def since(self, after_id):
+        """缓冲区中 id 大于 after_id 的事件（按 id 排序）、当前序号与 watermark；
+        缓冲区已滚动过去、可能缺少其中的事件时返回 None"""
+        with self._cond:
+            if after_id < self.evicted_id:
+                return None
+            events = sorted((e for _, e in self._events if e.id > after_id), key=lambda e: e.id)
+            return events, self.sequence, self._watermark()
+
+
+broker = EventBroker()
+
+
+class StreamSlots:
+    """本进程中打开的事件流计数，限制同时占用的线程数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def acquire(self, limit):
+        """占用一个名额；已满时返回 None，否则返回释放名额的函数（重复调用无副作用）"""
+        with self._lock:
+            if self.count >= limit:
+                return None
+            self.count += 1
+        released = False
+
+        def release():
+            nonlocal released
+            with self._lock:
+                if not released:
+                    released = True
+                    self.count -= 1
+        return release
+
+
+slots = StreamSlots()
+
+
+def format_event(task_event, cursor):
+    # 事件 id 为 cursor（不超过它的事件客户端都已收到），断线重连时浏览器带上它作为 Last-Event-ID
+    return f'id: {cursor}\nevent: task\ndata: {task_event.payload}\n\n'
+
+
+def stream(user, last_event_id=None):
+    """为 user 打开事件流；last_event_id 为断线前收到的最后一个事件 id"""
+    app = current_app._get_current_object()
+    release = slots.acquire(app.config.get('EVENTS_MAX_STREAMS', 2))
+    if release is None:
+        # 浏览器的 EventSource 遇到非 200 响应不会自动重连，由页面按 Retry-After 重新订阅
+        return Response(f'retry: {BUSY_RETRY_SECONDS * 1000}\n\n', status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(BUSY_RETRY_SECONDS), 'Cache-Control': 'no-cache'})
+    try:
+        return _open_stream(app, user, last_event_id, release)
+    except Exception:
+        release()
+        raise
+
+
+def _open_stream(app, user, last_event_id, release):
+    broker.start(app)
+    heartbeat = app.config.get('EVENTS_HEARTBEAT', 15)
+    deadline = time.monotonic() + app.config.get('EVENTS_STREAM_TIMEOUT', 300)
+
+    replay = []
+    replayed_ids = set()
+    if last_event_id is None:
+        position, watermark = broker.position()
+        cursor = watermark
+    else:
+        buffered = broker.since(last_event_id)
+        if buffered is not None:
+            replay, position, watermark = buffered
+        else:
+            # 缓冲区已经滚动过去，从数据库补发（在返回响应之前查询，生成器中不再访问数据库）；
+            # 查询期间到达的事件也会在缓冲区中再推送一次，按 id 去重
+            position, watermark = broker.position()
+            replay = db.session.scalars(
+                select(TaskEvent).where(TaskEvent.id > last_event_id).order_by(TaskEvent.id).limit(REPLAY_LIMIT)
+            ).all()
+            replayed_ids = {e.id for e in replay}
+        cursor = last_event_id
+    chunks = []
+    for task_event in replay:
+        # 补发按 id 顺序进行，更大的 id 之前可能还有未到达的事件，cursor 不超过 watermark
+        cursor = max(cursor, min(task_event.id, watermark))
+        if task_event.visible_to(user):
+            chunks.append(format_event(task_event, cursor))
+    cursor = max(cursor, watermark)
+
+    def generate(position, cursor):
+        yield 'retry: 3000\n\n'
+        yield from chunks
+        while time.monotonic() < deadline:
+            events, position, watermark = broker.wait(position, heartbeat)
+            if not events:
+                # 注释行作为心跳，防止代理因空闲断开连接
+                yield ': keepalive\n\n'
+                continue
+            cursor = max(cursor, watermark)
+            for task_event in events:
+                if task_event.id not in replayed_ids and task_event.visible_to(user):
+                    yield format_event(task_event, cursor)
+
+    response = Response(generate(position, cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 让 nginx 不缓冲事件流
+        'X-Accel-Buffering': 'no',
+    })
+    # 连接结束（含客户端断开）时服务器关闭响应，归还名额
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,289 @@
+"""列表数据导出（CSV / XLSX），边查询边发送
+
+- 查询用 yield_per 分批取行（MySQL 上为服务端游标），全部结果不会同时载入内存；
+- 响应体是生成器：取到第一批数据就开始发送，内存占用与导出的行数无关；
+- XLSX 直接写出最小的 Office Open XML（工作表使用内联字符串），经流式 ZIP 输出，不依赖 openpyxl；
+- 文件打包（zip_chunks）同样边读边发，每次只读取一块文件内容，不使用临时文件。
+导出与列表接口使用相同的角色过滤与 fields= 字段投影。
+MySQL 上的流式查询直到最后一行取完才结束，总时长取决于客户端的下载速度：导出查询以优化器提示
+MAX_EXECUTION_TIME 使用 EXPORT_STATEMENT_TIMEOUT_MS，不受接口查询的 DB_STATEMENT_TIMEOUT_MS 限制。
+响应头发出后无法再改状态码，查询中途失败时在文件末尾写入一行 EXPORT_ABORTED，文件不会看起来是完整的。
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+from flask import Response, request, current_app, stream_with_context
+from app.extensions import db
+from app.pagination import PaginationError, parse_fields, apply_projection
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# 接口字段 -> 表头
+FIELD_LABELS = {
+    'id': 'ID',
+    'projectId': '课题ID',
+    'studentId': '学生ID',
+    'studentName': '学生',
+    'teacherName': '指导教师',
+    'date': '日期',
+    'content': '指导内容',
+    'teacherComment': '审查意见',
+    'status': '状态',
+    'title': '题目',
+    'abstract': '摘要',
+    'uploadTime': '上传时间',
+    'filePath': '文件',
+    'version': '版本',
+    'reviewStatus': '评审状态',
+    'reviewType': '评审类型',
+    'reviewerId': '评审人ID',
+    'reviewComment': '评审意见',
+    'modifyComment': '修改意见',
+    'studentDraftPath': '学生初稿',
+    'studentSubmitted': '学生已提交',
+    'teacherRevisionPath': '教师修改稿',
+    'teacherSubmitted': '教师已提交',
+    'adminStatus': '审核状态',
+    'updatedAt': '最后修改时间',
+}
+# 积累到该字节数后交给 WSGI 服务器发送
+CHUNK_SIZE = 64 * 1024
+# Excel 单元格的最大字符数
+XLSX_CELL_LIMIT = 32767
+# CSV 被 Excel 打开时，以这些字符开头的单元格会被当作公式
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# XML 1.0 不允许的控制字符
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# 查询中途失败时写在最后一行第一列
+EXPORT_ABORTED = '导出中断：读取数据时出错，本文件不完整，请重新导出'
+
+
+class ZipStream:
+    """写入不可 seek 输出的 ZIP（每个文件的大小与 CRC 写在数据之后），写出的字节由 drain() 取走"""
+
+    class _Pipe:
+        def __init__(self):
+            self.chunks = []
+            self.size = 0
+
+        def write(self, data):
+            self.chunks.append(bytes(data))
+            self.size += len(data)
+            return len(data)
+
+        def flush(self):
+            pass
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self._pipe = self._Pipe()
+        self.zip = zipfile.ZipFile(self._pipe, 'w', compression)
+
+    @property
+    def buffered(self):
+        """尚未取走的字节数"""
+        return self._pipe.size
+
+    def drain(self):
+        data = b''.join(self._pipe.chunks)
+        self._pipe.chunks.clear()
+        self._pipe.size = 0
+        return data
+
+    def close(self):
+        """写出中央目录，返回剩余的字节"""
+        self.zip.close()
+        return self.drain()
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def csv_chunks(header, rows):
+    """CSV（UTF-8 带 BOM，Excel 可直接打开中文）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for row in rows:
+        cells = []
+        for value in row:
+            text = _text(value)
+            if isinstance(value, str) and text.startswith(_FORMULA_PREFIXES):
+                text = "'" + text
+            cells.append(text)
+        writer.writerow(cells)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _xlsx_row(number, values, columns):
+    cells = []
+    for column, value in zip(columns, values):
+        ref = f'{column}{number}'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value is not None:
+            text = escape(_INVALID_XML.sub('', _text(value))[:XLSX_CELL_LIMIT])
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def xlsx_chunks(header, rows, sheet='Sheet1'):
+    """单个工作表的 XLSX：表头为第一行，数字保留为数值单元格"""
+    archive = ZipStream()
+    for name, content in _XLSX_PARTS.items():
+        archive.zip.writestr(name, content.replace('{sheet}', escape(sheet, {'"': '&quot;'})))
+    columns = [_column_letter(i) for i in range(len(header))]
+    with archive.zip.open('xl/worksheets/sheet1.xml', 'w') as worksheet:
+        worksheet.write(_SHEET_HEAD.encode())
+        worksheet.write(_xlsx_row(1, header, columns).encode('utf-8'))
+        for number, row in enumerate(rows, start=2):
+            worksheet.write(_xlsx_row(number, row, columns).encode('utf-8'))
+            if archive.buffered >= CHUNK_SIZE:
+                yield archive.drain()
+        worksheet.write(_SHEET_TAIL.encode())
+    yield archive.close()
+
+
+def zip_chunks(entries, missing_note=None):
+    """把 (压缩包内路径, 磁盘文件绝对路径) 依次写入 ZIP 并逐块输出
+
+    文件原样存储（PDF/DOCX 本身已压缩，再压缩只消耗 CPU）。磁盘上不存在的文件跳过，
+    有跳过的文件时在压缩包末尾写入 missing_note 文件列出它们。
+    """
+    archive = ZipStream(zipfile.ZIP_STORED)
+    missing = []
+    for name, path in entries:
+        try:
+            info = zipfile.ZipInfo.from_file(path, name)
+            source = open(path, 'rb')
+        except OSError:
+            missing.append(name)
+            continue
+        info.compress_type = zipfile.ZIP_STORED
+        # 预先知道大小：超过 4GB 的文件自动使用 ZIP64
+        with source, archive.zip.open(info, 'w') as target:
+            while True:
+                data = source.read(CHUNK_SIZE)
+                if not data:
+                    break
+                target.write(data)
+                yield archive.drain()
+    if missing and missing_note:
+        archive.zip.writestr(missing_note, '\n'.join(missing) + '\n')
+    yield archive.close()
+
+
+def attachment_name(name, ext):
+    return f"{name}-{datetime.now().strftime('%Y%m%d%H%M%S')}.{ext}"
+
+
+def export_query(query, model, fields, keys, eager=None):
+    """按 keys 排序、分批取行的导出查询；MySQL 上使用 EXPORT_STATEMENT_TIMEOUT_MS 作为语句超时"""
+    config = current_app.config
+    query = apply_projection(query, model, set(fields), keys, eager).order_by(*keys)
+    timeout = config.get('EXPORT_STATEMENT_TIMEOUT_MS', 0)
+    if timeout:
+        # 提示只对本条 SELECT 生效，覆盖连接上的 max_execution_time
+        query = query.prefix_with(f'/*+ MAX_EXECUTION_TIME({int(timeout)}) */', dialect='mysql')
+    return query.yield_per(config.get('EXPORT_BATCH_SIZE', 1000))
+
+
+def export_response(query, model, keys, default_fields, name, eager=None):
+    """导出 query 的结果（?format=csv|xlsx，?fields= 选择列，默认 default_fields）
+
+    query 为已按角色过滤的查询；按 keys 排序，列顺序与 default_fields / FIELD_COLUMNS 一致。
+    """
+    file_format = request.args.get('format', 'csv')
+    if file_format not in FORMATS:
+        raise PaginationError('Invalid format')
+    selected = parse_fields(model)
+    fields = [field for field in model.FIELD_COLUMNS if field in selected] if selected else list(default_fields)
+    query = export_query(query, model, fields, keys, eager)
+
+    def rows():
+        try:
+            for obj in query:
+                item = obj.to_dict(fields)
+                yield [item[field] for field in fields]
+        except Exception:
+            # 已发送的部分无法撤回：记录日志，并在文件末尾写明导出不完整
+            current_app.logger.exception('Export of %s aborted', name)
+            db.session.rollback()
+            yield [EXPORT_ABORTED] + [None] * (len(fields) - 1)
+
+    header = [FIELD_LABELS.get(field, field) for field in fields]
+    if file_format == 'csv':
+        body = csv_chunks(header, rows())
+    else:
+        body = xlsx_chunks(header, rows(), sheet=name)
+    filename = attachment_name(name, file_format)
+    # 生成器在视图返回后才执行，保留请求上下文（数据库会话、当前用户、副本路由）直到发送完毕
+    response = Response(stream_with_context(body), mimetype=FORMATS[file_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # 让 nginx 边收边发，不缓冲整个文件
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from app.replicas import RoutingSession
 
-# 初始化数据库实例
-db = SQLAlchemy()
+# 初始化数据库实例（只读接口的查询可路由到副本，见 app/replicas.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # 初始化跨域支持（允许前端访问后端）
 cors = CORS()
@@ -0,0 +1,300 @@
+"""后台任务队列
+
+耗时或可能失败的操作（删除文件等）不在请求中执行，而是写入 background_jobs 表，
+由 worker 在请求之外完成：
+- enqueue(kind, payload) 把任务加入当前事务，与业务修改同时提交或同时回滚；
+- 处理函数用 @job(kind) 注册，以 payload 中的字段作为关键字参数调用，在独立的应用上下文中执行；
+- 多个 worker（线程或进程）通过条件 UPDATE 抢占任务，每个任务同一时间只由一个 worker 执行；
+  执行中的任务带租约（JOBS_LEASE_SECONDS），处理函数运行期间每隔租约的 1/3 续租一次，
+  运行时间超过租约的任务不会被其他 worker 重复执行；worker 异常退出（被杀、内存不足）后不再续租，
+  租约过期，任务被重新执行；
+- 执行成功后删除记录；抛出异常时按指数退避（带随机抖动）重试；
+  失败或租约过期累计达到 max_attempts 次后标记为 dead，保留在表中供 flask jobs list/retry 处理。
+处理函数可能被执行多次（worker 中途退出后重新执行），必须是幂等的。
+
+运行方式：
+- 开发环境：JOBS_WORKER_THREADS > 0 时，每个进程在收到第一个请求后启动 worker 线程，
+  本进程提交的任务立即被唤醒执行；
+- 生产环境：ProductionConfig 中为 0，单独运行 flask --app wsgi jobs worker。
+"""
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, select, update, delete, func, and_, or_
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import BackgroundJob
+
+# 一次抢占时读取的候选任务数（其余 worker 抢走的跳过）
+CLAIM_BATCH = 10
+# 记录的错误信息最大长度
+MAX_ERROR_LENGTH = 2000
+# 租约过期且次数已用完的任务记录的错误
+LEASE_EXPIRED = 'Lease expired: the worker stopped while running this job'
+
+_handlers = {}
+# 本进程提交了新任务时唤醒 worker 线程
+_wake = threading.Event()
+
+
+def job(kind):
+    """注册任务处理函数"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, delay=0, max_attempts=None):
+    """在当前事务中加入一个任务；delay 秒之后才会执行"""
+    new_job = BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload or {}, ensure_ascii=False),
+        status='pending',
+        attempts=0,
+        max_attempts=max_attempts or current_app.config.get('JOBS_MAX_ATTEMPTS', 5),
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(new_job)
+    db.session.info['jobs_enqueued'] = True
+    return new_job
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('jobs_enqueued', False):
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+def _expired(now):
+    return and_(BackgroundJob.status == 'running', BackgroundJob.locked_until < now)
+
+
+def _due(now):
+    """可执行的任务：到期的 pending，或租约已过期、仍有重试次数的 running"""
+    return or_(
+        and_(BackgroundJob.status == 'pending', BackgroundJob.run_at <= now),
+        and_(_expired(now), BackgroundJob.attempts < BackgroundJob.max_attempts),
+    )
+
+
+def claim(app):
+    """抢占一个可执行的任务，返回 (id, kind, payload, attempts, max_attempts)；没有任务时返回 None"""
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=app.config.get('JOBS_LEASE_SECONDS', 300))
+    with db.engine.begin() as conn:
+        # 次数已用完的任务租约过期后不再执行，转为死信
+        conn.execute(
+            update(BackgroundJob)
+            .where(_expired(now), BackgroundJob.attempts >= BackgroundJob.max_attempts)
+            .values(status='dead', locked_until=None, last_error=LEASE_EXPIRED)
+        )
+        candidates = conn.execute(
+            select(BackgroundJob.id).where(_due(now))
+            .order_by(BackgroundJob.run_at, BackgroundJob.id).limit(CLAIM_BATCH)
+        ).scalars().all()
+        for job_id in candidates:
+            # 条件与查询时相同：其他 worker 已抢走时影响行数为 0
+            claimed = conn.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id, _due(now))
+                .values(status='running', locked_until=lease, attempts=BackgroundJob.attempts + 1)
+            ).rowcount
+            if claimed:
+                return conn.execute(
+                    select(BackgroundJob.id, BackgroundJob.kind, BackgroundJob.payload,
+                           BackgroundJob.attempts, BackgroundJob.max_attempts)
+                    .where(BackgroundJob.id == job_id)
+                ).one()
+    return None
+
+
+def backoff(app, attempts):
+    """第 attempts 次失败后的重试等待秒数：指数增长，上限 JOBS_BACKOFF_CAP，随机缩短至 50%~100%"""
+    base = app.config.get('JOBS_BACKOFF_BASE', 10)
+    cap = app.config.get('JOBS_BACKOFF_CAP', 3600)
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def _owned(claimed):
+    """本次抢占的任务仍归当前 worker（租约过期后被重新抢占时 attempts 会增加）"""
+    return and_(BackgroundJob.id == claimed.id, BackgroundJob.status == 'running',
+                BackgroundJob.attempts == claimed.attempts)
+
+
+class LeaseRenewal:
+    """处理函数运行期间定期延长租约的线程"""
+
+    def __init__(self, app, claimed):
+        self.app = app
+        self.claimed = claimed
+        self.seconds = app.config.get('JOBS_LEASE_SECONDS', 300)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'jobs-lease-{claimed.id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.seconds / 3):
+            try:
+                with self.app.app_context(), db.engine.begin() as conn:
+                    conn.execute(
+                        update(BackgroundJob).where(_owned(self.claimed))
+                        .values(locked_until=datetime.utcnow() + timedelta(seconds=self.seconds))
+                    )
+            except Exception:
+                # 数据库暂时不可用：下一轮再试，租约过期前恢复即可
+                self.app.logger.exception('Renewing the lease of background job %s failed', self.claimed.id)
+
+
+def execute(app, claimed):
+    """执行已抢占的任务并记录结果；成功返回 True"""
+    try:
+        handler = _handlers.get(claimed.kind)
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {claimed.kind!r}')
+        with app.app_context(), LeaseRenewal(app, claimed):
+            try:
+                handler(**json.loads(claimed.payload))
+            finally:
+                db.session.remove()
+    except Exception as e:
+        app.logger.exception('Background job %s (%s) failed', claimed.id, claimed.kind)
+        error = f'{type(e).__name__}: {e}'[:MAX_ERROR_LENGTH]
+        if claimed.attempts >= claimed.max_attempts:
+            values = {'status': 'dead', 'locked_until': None, 'last_error': error}
+        else:
+            run_at = datetime.utcnow() + timedelta(seconds=backoff(app, claimed.attempts))
+            values = {'status': 'pending', 'locked_until': None, 'run_at': run_at, 'last_error': error}
+        with app.app_context(), db.engine.begin() as conn:
+            conn.execute(update(BackgroundJob).where(_owned(claimed)).values(**values))
+        return False
+
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(delete(BackgroundJob).where(_owned(claimed)))
+    return True
+
+
+def run_one(app):
+    """抢占并执行一个任务；没有可执行的任务时返回 None"""
+    with app.app_context():
+        claimed = claim(app)
+    if claimed is None:
+        return None
+    return execute(app, claimed)
+
+
+def run_pending(app, limit=None):
+    """在当前线程中依次执行所有到期任务，返回 (成功数, 失败数)"""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        result = run_one(app)
+        if result is None:
+            break
+        if result:
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+class Worker:
+    """worker 线程：没有任务时等待 JOBS_POLL_INTERVAL 秒或被本进程的提交唤醒"""
+
+    def __init__(self, app, threads=1):
+        self.app = app
+        self.threads = threads
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f'jobs-worker-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        _wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _run(self):
+        interval = self.app.config.get('JOBS_POLL_INTERVAL', 2.0)
+        while not self._stop.is_set():
+            try:
+                if run_one(self.app) is not None:
+                    continue
+            except Exception:
+                # 数据库暂时不可用等情况：稍后重试，线程不退出
+                self.app.logger.exception('Background job worker error')
+            _wake.wait(interval)
+            _wake.clear()
+
+
+_worker_lock = threading.Lock()
+
+
+def init_app(app):
+    """JOBS_WORKER_THREADS > 0 时在本进程收到第一个请求后启动 worker 线程（gunicorn fork 之后）"""
+    threads = app.config.get('JOBS_WORKER_THREADS', 0)
+    # 测试中由 run_pending() 显式执行任务
+    if not threads or app.testing:
+        return
+
+    @app.before_request
+    def _start_worker():
+        if app.extensions.get('jobs_worker') is None:
+            with _worker_lock:
+                if app.extensions.get('jobs_worker') is None:
+                    worker = Worker(app, threads)
+                    worker.start()
+                    app.extensions['jobs_worker'] = worker
+
+
+def stats():
+    """各状态的任务数、最早到期的等待任务，以及最近的死信任务"""
+    counts = dict(db.session.execute(
+        select(BackgroundJob.status, func.count(BackgroundJob.id)).group_by(BackgroundJob.status)
+    ).all())
+    oldest_due = db.session.execute(
+        select(func.min(BackgroundJob.run_at))
+        .where(BackgroundJob.status == 'pending', BackgroundJob.run_at <= datetime.utcnow())
+    ).scalar()
+    dead = db.session.scalars(
+        select(BackgroundJob).where(BackgroundJob.status == 'dead')
+        .order_by(BackgroundJob.id.desc()).limit(20)
+    ).all()
+    return {
+        'pending': counts.get('pending', 0),
+        'running': counts.get('running', 0),
+        'dead': counts.get('dead', 0),
+        # 最早到期任务已等待的秒数，持续增长说明 worker 没有运行或处理不过来
+        'oldestDueSeconds': round((datetime.utcnow() - oldest_due).total_seconds(), 1) if oldest_due else 0,
+        'recentDead': [j.to_dict() for j in dead],
+    }
+
+
+def retry(job_id):
+    """把死信（或等待中的）任务改为立即执行，重新计算重试次数；返回是否找到任务"""
+    return db.session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id, BackgroundJob.status.in_(('dead', 'pending')))
+        .values(status='pending', attempts=0, run_at=datetime.utcnow(), locked_until=None)
+    ).rowcount > 0
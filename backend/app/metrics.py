@@ -0,0 +1,221 @@
+"""接口耗时、SQL 语句数与响应大小的统计（Prometheus 文本格式）
+
+- 每个请求按接口（Flask endpoint，如 task.upload_file）与方法记录：总耗时、SQL 语句数、
+  SQL 总耗时、响应字节数（直方图），以及按状态码的请求数；
+- SQL 由引擎的 before/after_cursor_execute 事件计时，主库与只读副本都会统计，后台任务线程不计入；
+- 在响应发送完毕时（WSGI close）记录，流式导出、打包下载等在生成器中执行的查询与发送时间也计算在内；
+- 耗时超过 METRICS_SLOW_REQUEST_MS 的请求写一条 WARNING 日志，附最慢的 METRICS_SLOW_SQL_LIMIT 条 SQL
+  （只记语句，不记参数）；
+- GET /api/admin/metrics 输出文本格式。与 /api/admin/pool 相同，统计只属于当前进程：
+  gunicorn 多进程时每个进程各自计数，进程轮换（max_requests）后从零开始。
+"""
+import heapq
+import itertools
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 直方图的桶上界
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# 没有匹配到路由的请求（404 等）
+UNMATCHED = '<unmatched>'
+# 慢请求日志中每条 SQL 的最大长度
+SQL_TEXT_LIMIT = 500
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{_labels(self.labels, key)} {_number(value)}' for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # 标签 -> [各桶计数（非累计）..., +Inf 桶计数, 总和]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, list(entry)) for key, entry in self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, entry in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), entry[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(entry[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+ROUTE = ('endpoint', 'method')
+
+requests_total = Counter('http_requests_total', '按接口与状态码的请求数', (*ROUTE, 'status'))
+request_duration = Histogram('http_request_duration_seconds', '请求总耗时（含流式响应的发送）',
+                             ROUTE, DURATION_BUCKETS)
+db_statements = Histogram('http_request_db_statements', '每个请求执行的 SQL 语句数', ROUTE, STATEMENT_BUCKETS)
+db_duration = Histogram('http_request_db_seconds', '每个请求的 SQL 总耗时', ROUTE, DURATION_BUCKETS)
+response_size = Histogram('http_response_size_bytes', '响应体字节数', ROUTE, SIZE_BUCKETS)
+slow_requests = Counter('http_slow_requests_total', '超过 METRICS_SLOW_REQUEST_MS 的请求数', ROUTE)
+
+METRICS = (requests_total, request_duration, db_statements, db_duration, response_size, slow_requests)
+
+
+def reset():
+    for metric in METRICS:
+        with metric._lock:
+            metric._values.clear()
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    """一个请求的计时与 SQL 统计（保存在 flask.g 中，响应发送完毕时记录）"""
+
+    def __init__(self, slow_sql_limit):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.bytes = 0
+        self.slow_sql_limit = slow_sql_limit
+        # 最慢的几条 SQL：(耗时, 序号, 语句) 的小顶堆
+        self.slowest = []
+        self._sequence = itertools.count()
+
+    def record_statement(self, statement, seconds):
+        self.statements += 1
+        self.db_seconds += seconds
+        if self.slow_sql_limit:
+            item = (seconds, next(self._sequence), statement)
+            if len(self.slowest) < self.slow_sql_limit:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'request_stats' in g:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if started and has_request_context() and 'request_stats' in g:
+        g.request_stats.record_statement(statement, time.perf_counter() - started.pop())
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # 出错的语句没有 after_cursor_execute，丢弃它的开始时间
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('metrics_started'):
+        connection.info['metrics_started'].pop()
+
+
+def _counted(body, stats):
+    try:
+        for chunk in body:
+            stats.bytes += len(chunk)
+            yield chunk
+    finally:
+        # 连接中断时也要关闭原来的生成器（stream_with_context 在关闭时释放请求上下文）
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def init_app(app):
+    """注册请求钩子；应在其他模块之前调用，after_request 按注册的逆序执行，这样记录的是最终的响应"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    slow_ms = app.config.get('METRICS_SLOW_REQUEST_MS', 1000)
+    slow_sql_limit = app.config.get('METRICS_SLOW_SQL_LIMIT', 10) if slow_ms else 0
+
+    @app.before_request
+    def start_request():
+        g.request_stats = RequestStats(slow_sql_limit)
+
+    @app.after_request
+    def finish_request(response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        route = (request.endpoint or UNMATCHED, request.method)
+        status = response.status_code
+        path = request.path
+        if response.is_streamed and not response.direct_passthrough:
+            # 生成器响应的长度在发送完才知道
+            response.response = _counted(response.response, stats)
+        elif request.method != 'HEAD':
+            stats.bytes = response.content_length or 0
+
+        def record():
+            seconds = time.perf_counter() - stats.started
+            requests_total.inc((*route, str(status)))
+            request_duration.observe(route, seconds)
+            db_statements.observe(route, stats.statements)
+            db_duration.observe(route, stats.db_seconds)
+            response_size.observe(route, stats.bytes)
+            if slow_ms and seconds * 1000 >= slow_ms:
+                slow_requests.inc(route)
+                slowest = sorted(stats.slowest, reverse=True)
+                app.logger.warning(
+                    'Slow request %s %s -> %s: %.0f ms, %d SQL statements in %.0f ms%s',
+                    route[1], path, status, seconds * 1000, stats.statements, stats.db_seconds * 1000,
+                    ''.join(f'\n  {duration * 1000:.1f} ms: {statement[:SQL_TEXT_LIMIT]}'
+                            for duration, _, statement in slowest)
+                )
+
+        response.call_on_close(record)
+        return response
@@ -0,0 +1,177 @@
+"""数据库版本迁移
+
+迁移脚本放在 app/migrations/versions/ 下，文件名形如 v0001_initial.py，每个脚本定义：
+    revision = '0001'            # 版本号，按字符串排序决定执行顺序
+    description = '...'
+    def upgrade(engine): ...     # 自行管理事务，大批量数据迁移可分批提交
+    def downgrade(engine): ...   # 可选；不可回滚的迁移不定义、设为 None 或抛出 IrreversibleMigration
+
+已执行的版本记录在 schema_revisions 表中。迁移作为部署步骤执行一次：
+    flask --app run db upgrade
+应用启动时不再做任何表结构检查或 DDL。
+"""
+import importlib
+import pkgutil
+from contextlib import contextmanager
+from datetime import datetime
+import click
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from app.extensions import db
+
+REVISION_TABLE = 'schema_revisions'
+# 多个部署进程同时执行迁移时，只有一个能拿到锁
+LOCK_NAME = 'graduation_project_schema_migration'
+LOCK_TIMEOUT = 60
+
+_metadata = MetaData()
+revisions_table = Table(
+    REVISION_TABLE, _metadata,
+    Column('revision', String(32), primary_key=True),
+    Column('description', String(255)),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class MigrationError(Exception):
+    pass
+
+
+class IrreversibleMigration(MigrationError):
+    """迁移不能回滚；回滚中止，该版本仍记为已执行"""
+
+
+def load_migrations():
+    """按版本号顺序加载 versions 包下的所有迁移脚本"""
+    from app.migrations import versions
+    modules = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f'{versions.__name__}.{info.name}')
+        modules.append(module)
+    modules.sort(key=lambda m: m.revision)
+
+    seen = set()
+    for module in modules:
+        if module.revision in seen:
+            raise MigrationError(f'Duplicate revision {module.revision}')
+        seen.add(module.revision)
+    return modules
+
+
+def applied_revisions(engine):
+    """已执行的版本号集合（首次调用时创建版本表）"""
+    _metadata.create_all(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(select(revisions_table.c.revision)).scalars())
+
+
+def current_revision(engine=None):
+    applied = applied_revisions(engine or db.engine)
+    return max(applied) if applied else None
+
+
+def pending_migrations(engine=None):
+    applied = applied_revisions(engine or db.engine)
+    return [m for m in load_migrations() if m.revision not in applied]
+
+
+@contextmanager
+def migration_lock(engine):
+    """MySQL 使用 GET_LOCK 命名锁；SQLite 为单文件数据库，部署时本就只有一个迁移进程"""
+    if engine.dialect.name != 'mysql':
+        yield
+        return
+    with engine.connect() as conn:
+        acquired = conn.execute(text('SELECT GET_LOCK(:name, :timeout)'),
+                                {'name': LOCK_NAME, 'timeout': LOCK_TIMEOUT}).scalar()
+        if not acquired:
+            raise MigrationError('Another process is running migrations')
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': LOCK_NAME})
+
+
+def upgrade(target=None, engine=None):
+    """执行所有未执行的迁移（或直到 target 版本为止），返回执行的版本号列表"""
+    engine = engine or db.engine
+    done = []
+    with migration_lock(engine):
+        for module in pending_migrations(engine):
+            if target is not None and module.revision > target:
+                break
+            click.echo(f'升级 {module.revision}: {module.description}')
+            module.upgrade(engine)
+            with engine.begin() as conn:
+                conn.execute(revisions_table.insert().values(
+                    revision=module.revision,
+                    description=module.description,
+                    applied_at=datetime.utcnow()
+                ))
+            done.append(module.revision)
+    return done
+
+
+def downgrade(target, engine=None):
+    """回滚所有高于 target 的已执行迁移（target 为 None 表示全部回滚），返回回滚的版本号列表"""
+    engine = engine or db.engine
+    done = []
+    with migration_lock(engine):
+        applied = applied_revisions(engine)
+        for module in reversed(load_migrations()):
+            if module.revision not in applied or (target is not None and module.revision <= target):
+                continue
+            if not getattr(module, 'downgrade', None):
+                raise IrreversibleMigration(f'Revision {module.revision} cannot be downgraded')
+            click.echo(f'回滚 {module.revision}: {module.description}')
+            module.downgrade(engine)
+            with engine.begin() as conn:
+                conn.execute(revisions_table.delete().where(revisions_table.c.revision == module.revision))
+            done.append(module.revision)
+    return done
+
+
+# ---- 供迁移脚本使用的辅助函数 ----
+
+def has_table(engine, table):
+    return inspect(engine).has_table(table)
+
+
+def column_names(engine, table):
+    return {col['name'] for col in inspect(engine).get_columns(table)}
+
+
+def index_names(engine, table):
+    inspector = inspect(engine)
+    names = {ix['name'] for ix in inspector.get_indexes(table)}
+    names.update(uc['name'] for uc in inspector.get_unique_constraints(table) if uc.get('name'))
+    return names
+
+
+def create_index_if_missing(engine, index):
+    """index 为绑定到迁移脚本中 Table 定义的 sqlalchemy.Index"""
+    if index.name not in index_names(engine, index.table.name):
+        index.create(engine)
+
+
+def drop_index_if_exists(engine, index):
+    if index.name in index_names(engine, index.table.name):
+        index.drop(engine)
+
+
+def batched(engine, select_ids, apply_batch, batch_size=1000):
+    """在线分批处理数据：每批在独立事务中提交，避免长事务锁表
+
+    select_ids(conn, after_id, limit) 返回 id 大于 after_id 的下一批 id（升序）；
+    apply_batch(conn, ids) 处理这一批。返回处理的总行数。
+    """
+    after_id = 0
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            ids = list(select_ids(conn, after_id, batch_size))
+            if not ids:
+                return total
+            apply_batch(conn, ids)
+        after_id = ids[-1]
+        total += len(ids)
+        click.echo(f'  已处理 {total} 行')
@@ -0,0 +1,79 @@
+"""初始表结构（与此前 db.create_all() 创建的结构一致；已存在的表保持不变）"""
+from sqlalchemy import (BigInteger, Column, DateTime, ForeignKey, Integer, MetaData, String,
+                        Table, Text)
+
+revision = '0001'
+description = 'initial schema'
+
+metadata = MetaData()
+
+users = Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(64), unique=True, nullable=False),
+    Column('name', String(64), nullable=False),
+    Column('role', String(20), nullable=False),
+)
+
+projects = Table(
+    'projects', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('title', String(200), nullable=False),
+    Column('student_id', Integer, ForeignKey('users.id')),
+    Column('teacher_id', Integer, ForeignKey('users.id')),
+)
+
+guidance_records = Table(
+    'guidance_records', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('project_id', Integer, ForeignKey('projects.id'), nullable=False),
+    Column('record_date', DateTime),
+    Column('content', Text),
+    Column('teacher_comment', Text),
+    Column('status', Integer),
+)
+
+papers = Table(
+    'papers', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('title', String(128), nullable=False),
+    Column('abstract', Text),
+    Column('upload_time', DateTime),
+    Column('file_path', String(256)),
+    Column('student_id', Integer, ForeignKey('users.id')),
+    Column('version', String(32)),
+    Column('review_status', String(32)),
+    Column('review_type', String(32)),
+    Column('reviewer_id', Integer, ForeignKey('users.id')),
+    Column('review_comment', Text),
+    Column('modify_comment', Text),
+)
+
+task_documents = Table(
+    'task_documents', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('project_id', Integer, ForeignKey('projects.id'), nullable=False),
+    Column('student_draft_path', String(255)),
+    Column('student_submitted', Integer),
+    Column('teacher_revision_path', String(255)),
+    Column('teacher_submitted', Integer),
+    Column('admin_status', String(20)),
+    Column('updated_at', DateTime),
+)
+
+stored_files = Table(
+    'stored_files', metadata,
+    Column('digest', String(64), primary_key=True),
+    Column('size', BigInteger, nullable=False),
+    Column('ref_count', Integer, nullable=False),
+    Column('created_at', DateTime),
+)
+
+
+def upgrade(engine):
+    # 旧版本的 task_documents（student_id/teacher_id 结构）由 0002 迁移，这里不会覆盖
+    metadata.create_all(engine, checkfirst=True)
+
+
+def downgrade(engine):
+    metadata.drop_all(engine, checkfirst=True)
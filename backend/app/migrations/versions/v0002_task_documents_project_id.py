@@ -0,0 +1,145 @@
+"""task_documents 由 (student_id, teacher_id) 结构迁移到 project_id 结构
+
+取代原来的 migrate_task_table.py 以及启动时 DROP TABLE 的做法：
+新增列后按 id 分批回填 project_id，不锁整表、不丢数据。
+有记录找不到对应的课题时迁移失败（不记为已执行），人工处理这些记录后重新执行即可，
+已回填的记录不会重复处理。
+旧列 student_id/teacher_id 保留数据但不再由程序写入，改为允许为空；SQLite 不能修改列约束，
+按新约束重建表后复制数据。
+旧结构迁移后不能回滚（downgrade 抛出 IrreversibleMigration）。
+"""
+import click
+from sqlalchemy import Column, ForeignKey, Index, MetaData, Table, inspect, select, text
+from app.migrations import IrreversibleMigration, MigrationError, batched, column_names, has_table
+
+revision = '0002'
+description = 'move task_documents to project_id'
+# 错误信息中最多列出的记录 id
+MAX_LISTED_IDS = 50
+# 旧结构的列
+LEGACY_COLUMNS = ('student_id', 'teacher_id')
+
+NEW_COLUMNS = [
+    ('project_id', 'INT'),
+    ('student_draft_path', 'VARCHAR(255)'),
+    ('student_submitted', 'INT DEFAULT 0'),
+    ('teacher_revision_path', 'VARCHAR(255)'),
+    ('teacher_submitted', 'INT DEFAULT 0'),
+    ('admin_status', 'VARCHAR(20)'),
+]
+
+
+def upgrade(engine):
+    if not has_table(engine, 'task_documents'):
+        return
+    columns = column_names(engine, 'task_documents')
+    if 'project_id' in columns and not _unresolved(engine) and not _needs_rebuild(engine):
+        return
+
+    click.echo('检测到旧的任务书表结构，开始迁移...')
+    with engine.begin() as conn:
+        for name, ddl in NEW_COLUMNS:
+            if name not in columns:
+                conn.execute(text(f'ALTER TABLE task_documents ADD COLUMN {name} {ddl}'))
+
+    if 'student_id' in columns and 'teacher_id' in columns:
+        # 根据 student_id 和 teacher_id 找到对应的课题，分批回填
+        def select_ids(conn, after_id, limit):
+            return conn.execute(text(
+                'SELECT id FROM task_documents WHERE id > :after AND project_id IS NULL '
+                'ORDER BY id LIMIT :limit'
+            ), {'after': after_id, 'limit': limit}).scalars()
+
+        def apply_batch(conn, ids):
+            params = {f'id{i}': task_id for i, task_id in enumerate(ids)}
+            placeholders = ', '.join(f':{key}' for key in params)
+            conn.execute(text(
+                'UPDATE task_documents SET project_id = ('
+                '  SELECT MIN(p.id) FROM projects p'
+                '  WHERE p.student_id = task_documents.student_id'
+                '    AND p.teacher_id = task_documents.teacher_id'
+                f') WHERE id IN ({placeholders})'
+            ), params)
+
+        batched(engine, select_ids, apply_batch)
+
+    unresolved = _unresolved(engine)
+    if unresolved:
+        listed = ', '.join(str(task_id) for task_id in unresolved[:MAX_LISTED_IDS])
+        more = f' (and {len(unresolved) - MAX_LISTED_IDS} more)' if len(unresolved) > MAX_LISTED_IDS else ''
+        raise MigrationError(
+            f'task_documents rows {listed}{more} have no matching project; '
+            'create the projects or delete these rows, then run the migration again'
+        )
+
+    if engine.dialect.name == 'mysql':
+        has_fk = any(fk['referred_table'] == 'projects'
+                     for fk in inspect(engine).get_foreign_keys('task_documents'))
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE task_documents MODIFY COLUMN project_id INT NOT NULL'))
+            if not has_fk:
+                conn.execute(text(
+                    'ALTER TABLE task_documents ADD CONSTRAINT fk_task_project '
+                    'FOREIGN KEY (project_id) REFERENCES projects(id)'
+                ))
+            # 旧列保留数据但不再由程序写入，去掉 NOT NULL 以免新增记录失败
+            for name in LEGACY_COLUMNS:
+                if name in columns:
+                    conn.execute(text(f'ALTER TABLE task_documents MODIFY COLUMN {name} INT NULL'))
+    elif _needs_rebuild(engine):
+        _rebuild_sqlite(engine)
+    click.echo('任务书表迁移完成')
+
+
+def _needs_rebuild(engine):
+    """SQLite 中 project_id 允许为空，或旧列仍为 NOT NULL"""
+    if engine.dialect.name != 'sqlite':
+        return False
+    nullable = {col['name']: col['nullable'] for col in inspect(engine).get_columns('task_documents')}
+    return nullable.get('project_id') is True or any(nullable.get(name) is False for name in LEGACY_COLUMNS)
+
+
+def _rebuild_sqlite(engine):
+    """按新约束建表（project_id NOT NULL 并引用 projects，旧列允许为空），复制数据后替换原表"""
+    metadata = MetaData()
+    old = Table('task_documents', metadata, autoload_with=engine)
+    Table('projects', metadata, autoload_with=engine)
+    columns = []
+    for column in old.columns:
+        if column.name == 'project_id':
+            nullable = False
+            foreign_keys = [ForeignKey('projects.id')]
+        else:
+            nullable = True if column.name in LEGACY_COLUMNS else column.nullable
+            foreign_keys = [ForeignKey(fk.target_fullname) for fk in column.foreign_keys]
+        columns.append(Column(
+            column.name, column.type, *foreign_keys, primary_key=column.primary_key, nullable=nullable,
+            server_default=column.server_default.arg if column.server_default is not None else None,
+        ))
+    new = Table('task_documents_rebuild', metadata, *columns)
+    names = [column.name for column in old.columns]
+    with engine.begin() as conn:
+        new.create(conn)
+        conn.execute(new.insert().from_select(names, select(*old.columns)))
+        old.drop(conn)
+        # 索引随表改名，在改名前建在新表上
+        for index in old.indexes:
+            Index(index.name, *[new.c[column.name] for column in index.columns], unique=index.unique).create(conn)
+        conn.execute(text('ALTER TABLE task_documents_rebuild RENAME TO task_documents'))
+
+
+def _unresolved(engine):
+    """project_id 仍为空的记录 id（上次迁移失败后留下的）"""
+    with engine.connect() as conn:
+        return conn.execute(text(
+            'SELECT id FROM task_documents WHERE project_id IS NULL ORDER BY id'
+        )).scalars().all()
+
+
+def downgrade(engine):
+    if has_table(engine, 'task_documents') and set(LEGACY_COLUMNS) & column_names(engine, 'task_documents'):
+        raise IrreversibleMigration(
+            'Revision 0002 moved task_documents to project_id; the student_id/teacher_id structure '
+            'cannot be restored'
+        )
+    # 表本来就是新结构时升级没有做任何修改，回滚也无需修改
@@ -0,0 +1,49 @@
+"""高频查询使用的索引（projects、task_documents、guidance_records、papers）"""
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, DateTime, text
+from app.migrations import MigrationError, create_index_if_missing, drop_index_if_exists
+
+revision = '0003'
+description = 'lookup indexes'
+
+metadata = MetaData()
+projects = Table('projects', metadata, Column('student_id', Integer), Column('teacher_id', Integer))
+task_documents = Table(
+    'task_documents', metadata,
+    Column('project_id', Integer), Column('teacher_submitted', Integer), Column('admin_status', String(20)),
+)
+guidance_records = Table(
+    'guidance_records', metadata,
+    Column('id', Integer), Column('project_id', Integer), Column('status', Integer), Column('record_date', DateTime),
+)
+papers = Table('papers', metadata, Column('student_id', Integer))
+
+INDEXES = [
+    Index('ix_projects_student_id', projects.c.student_id),
+    Index('ix_projects_teacher_id', projects.c.teacher_id),
+    Index('uq_task_documents_project_id', task_documents.c.project_id, unique=True),
+    Index('ix_task_documents_submitted_status', task_documents.c.teacher_submitted, task_documents.c.admin_status),
+    Index('ix_task_documents_admin_status', task_documents.c.admin_status),
+    Index('ix_guidance_records_project_status', guidance_records.c.project_id, guidance_records.c.status),
+    Index('ix_guidance_records_status_date', guidance_records.c.status, guidance_records.c.record_date,
+          guidance_records.c.id),
+    Index('ix_papers_student_id', papers.c.student_id),
+]
+
+
+def upgrade(engine):
+    with engine.connect() as conn:
+        duplicates = conn.execute(text(
+            'SELECT project_id FROM task_documents GROUP BY project_id HAVING COUNT(*) > 1'
+        )).scalars().all()
+    if duplicates:
+        raise MigrationError(
+            f'task_documents has several rows for projects {duplicates}; '
+            'merge them before adding the unique index'
+        )
+    for index in INDEXES:
+        create_index_if_missing(engine, index)
+
+
+def downgrade(engine):
+    for index in reversed(INDEXES):
+        drop_index_if_exists(engine, index)
@@ -0,0 +1,46 @@
+"""guidance_records、papers 增加 updated_at 列，供接口计算 ETag/Last-Modified
+
+已有记录分批回填：指导记录取 record_date，论文取 upload_time，都为空时取迁移时间。
+"""
+from datetime import datetime
+from sqlalchemy import text
+from app.migrations import batched, column_names, has_table
+
+revision = '0004'
+description = 'updated_at on guidance_records and papers'
+
+# 表名 -> 回填时优先使用的已有时间列
+TABLES = {
+    'guidance_records': 'record_date',
+    'papers': 'upload_time',
+}
+
+
+def upgrade(engine):
+    now = datetime.utcnow()
+    for table, source in TABLES.items():
+        if not has_table(engine, table) or 'updated_at' in column_names(engine, table):
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at DATETIME NULL'))
+
+        def select_ids(conn, after_id, limit, table=table):
+            return conn.execute(text(
+                f'SELECT id FROM {table} WHERE id > :after AND updated_at IS NULL ORDER BY id LIMIT :limit'
+            ), {'after': after_id, 'limit': limit}).scalars()
+
+        def apply_batch(conn, ids, table=table, source=source):
+            params = {f'id{i}': row_id for i, row_id in enumerate(ids)}
+            placeholders = ', '.join(f':{key}' for key in params)
+            conn.execute(text(
+                f'UPDATE {table} SET updated_at = COALESCE({source}, :now) WHERE id IN ({placeholders})'
+            ), {'now': now, **params})
+
+        batched(engine, select_ids, apply_batch)
+
+
+def downgrade(engine):
+    for table in TABLES:
+        if has_table(engine, table) and 'updated_at' in column_names(engine, table):
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table} DROP COLUMN updated_at'))
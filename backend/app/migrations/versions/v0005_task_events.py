@@ -0,0 +1,29 @@
+"""task_events 表：任务书状态变化事件，供 /api/task/events 推送"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table, Text
+from app.migrations import has_table
+
+revision = '0005'
+description = 'task_events'
+
+metadata = MetaData()
+task_events = Table(
+    'task_events', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('task_id', Integer, nullable=False),
+    Column('project_id', Integer, nullable=False),
+    Column('student_id', Integer),
+    Column('teacher_id', Integer),
+    Column('payload', Text, nullable=False),
+    Column('created_at', DateTime),
+    Index('ix_task_events_created_at', 'created_at'),
+)
+
+
+def upgrade(engine):
+    if not has_table(engine, 'task_events'):
+        task_events.create(engine)
+
+
+def downgrade(engine):
+    if has_table(engine, 'task_events'):
+        task_events.drop(engine)
@@ -0,0 +1,32 @@
+"""background_jobs 表：后台任务队列（文件清理等耗时操作移出请求）"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+from app.migrations import has_table
+
+revision = '0006'
+description = 'background_jobs'
+
+metadata = MetaData()
+background_jobs = Table(
+    'background_jobs', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('kind', String(64), nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('status', String(16), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('max_attempts', Integer, nullable=False),
+    Column('run_at', DateTime, nullable=False),
+    Column('locked_until', DateTime),
+    Column('last_error', Text),
+    Column('created_at', DateTime),
+    Index('ix_background_jobs_status_run_at', 'status', 'run_at'),
+)
+
+
+def upgrade(engine):
+    if not has_table(engine, 'background_jobs'):
+        background_jobs.create(engine)
+
+
+def downgrade(engine):
+    if has_table(engine, 'background_jobs'):
+        background_jobs.drop(engine)
@@ -0,0 +1,27 @@
+"""task_documents 文件路径列的索引：存储对账（flask storage reconcile）按路径顺序分批读取引用"""
+from sqlalchemy import Column, Index, MetaData, String, Table
+from app.migrations import create_index_if_missing, drop_index_if_exists
+
+revision = '0007'
+description = 'task document path indexes'
+
+metadata = MetaData()
+task_documents = Table(
+    'task_documents', metadata,
+    Column('student_draft_path', String(255)), Column('teacher_revision_path', String(255)),
+)
+
+INDEXES = [
+    Index('ix_task_documents_student_draft_path', task_documents.c.student_draft_path),
+    Index('ix_task_documents_teacher_revision_path', task_documents.c.teacher_revision_path),
+]
+
+
+def upgrade(engine):
+    for index in INDEXES:
+        create_index_if_missing(engine, index)
+
+
+def downgrade(engine):
+    for index in reversed(INDEXES):
+        drop_index_if_exists(engine, index)
@@ -0,0 +1,30 @@
+"""search_postings 表：指导记录与论文的全文检索倒排索引
+
+建表后运行 flask search reindex 为已有数据建立索引（之后由写接口增量维护）。
+"""
+from sqlalchemy import Column, Index, Integer, MetaData, PrimaryKeyConstraint, String, Table
+from app.migrations import has_table
+
+revision = '0008'
+description = 'search_postings'
+
+metadata = MetaData()
+search_postings = Table(
+    'search_postings', metadata,
+    Column('doc_type', String(16), nullable=False),
+    Column('term', String(32), nullable=False),
+    Column('doc_id', Integer, nullable=False),
+    Column('tf', Integer, nullable=False),
+    PrimaryKeyConstraint('doc_type', 'term', 'doc_id'),
+    Index('ix_search_postings_doc', 'doc_type', 'doc_id'),
+)
+
+
+def upgrade(engine):
+    if not has_table(engine, 'search_postings'):
+        search_postings.create(engine)
+
+
+def downgrade(engine):
+    if has_table(engine, 'search_postings'):
+        search_postings.drop(engine)
@@ -0,0 +1,18 @@
+"""users 增加 department 列（院系），供统计接口按院系汇总；由花名册导入填写，已有用户为空"""
+from sqlalchemy import text
+from app.migrations import column_names, has_table
+
+revision = '0009'
+description = 'department on users'
+
+
+def upgrade(engine):
+    if has_table(engine, 'users') and 'department' not in column_names(engine, 'users'):
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE users ADD COLUMN department VARCHAR(64) NULL'))
+
+
+def downgrade(engine):
+    if has_table(engine, 'users') and 'department' in column_names(engine, 'users'):
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE users DROP COLUMN department'))
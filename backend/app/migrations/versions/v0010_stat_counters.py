@@ -0,0 +1,29 @@
+"""stat_counters 表：按指导教师汇总的统计计数（app/stats.py）
+
+建表后运行 flask stats rebuild 按已有数据计算一次（之后由写接口增量维护）。
+"""
+from sqlalchemy import Column, Integer, MetaData, PrimaryKeyConstraint, String, Table
+from app.migrations import has_table
+
+revision = '0010'
+description = 'stat_counters'
+
+metadata = MetaData()
+stat_counters = Table(
+    'stat_counters', metadata,
+    Column('metric', String(32), nullable=False),
+    Column('teacher_id', Integer, nullable=False),
+    Column('bucket', String(32), nullable=False),
+    Column('value', Integer, nullable=False),
+    PrimaryKeyConstraint('metric', 'teacher_id', 'bucket'),
+)
+
+
+def upgrade(engine):
+    if not has_table(engine, 'stat_counters'):
+        stat_counters.create(engine)
+
+
+def downgrade(engine):
+    if has_table(engine, 'stat_counters'):
+        stat_counters.drop(engine)
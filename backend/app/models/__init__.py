@@ -2,3 +2,8 @@ from .user import User, Project
 from .guidance import GuidanceRecord
 from .paper import Paper
 from .task import TaskDocument
+from .file import StoredFile
+from .event import TaskEvent
+from .job import BackgroundJob
+from .search import SearchPosting
+from .stats import StatCounter
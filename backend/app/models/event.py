@@ -0,0 +1,18 @@
+from app.extensions import db
+from datetime import datetime
+
+class TaskEvent(db.Model):
+    """任务书状态变化事件，与业务修改在同一事务中写入，由各进程轮询后推送给订阅者（app/events.py）"""
+    __tablename__ = 'task_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    project_id = db.Column(db.Integer, nullable=False)
+    # 接收者：课题的学生与教师；教务处接收全部事件
+    student_id = db.Column(db.Integer)
+    teacher_id = db.Column(db.Integer)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def visible_to(self, user):
+        return user.role == 'admin' or user.id in (self.student_id, self.teacher_id)
@@ -0,0 +1,11 @@
+from app.extensions import db
+from datetime import datetime
+
+class StoredFile(db.Model):
+    """内容寻址存储中的文件（按 SHA-256 摘要去重），记录被多少条业务记录引用"""
+    __tablename__ = 'stored_files'
+
+    digest = db.Column(db.String(64), primary_key=True)  # 文件内容的 SHA-256 十六进制摘要
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -3,6 +3,12 @@ from datetime import datetime
 
 class GuidanceRecord(db.Model):
     __tablename__ = 'guidance_records'
+    __table_args__ = (
+        # 学生/教师按课题查看记录
+        db.Index('ix_guidance_records_project_status', 'project_id', 'status'),
+        # 教科办只看已提交的记录，按日期翻页
+        db.Index('ix_guidance_records_status_date', 'status', 'record_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -13,17 +19,36 @@ class GuidanceRecord(db.Model):
     
     # 状态：0-草稿, 1-已提交给教科办
     status = db.Column(db.Integer, default=0) 
+    # 最后修改时间，用于接口的 ETag/Last-Modified
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     project = db.relationship('app.models.user.Project', backref='guidance_records')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'projectId': self.project_id,
-            'studentName': self.project.student.name if self.project and self.project.student else '未知',
-            'teacherName': self.project.teacher.name if self.project and self.project.teacher else '未知',
-            'date': self.record_date.strftime('%Y-%m-%d'),
-            'content': self.content,
-            'teacherComment': self.teacher_comment,
-            'status': self.status
+    # 接口字段 -> 依赖的数据库列，供 fields= 投影时只查询需要的列
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'projectId': ['project_id'],
+        'studentName': ['project_id'],
+        'teacherName': ['project_id'],
+        'date': ['record_date'],
+        'content': ['content'],
+        'teacherComment': ['teacher_comment'],
+        'status': ['status'],
+        'updatedAt': ['updated_at']
+    }
+    # 需要预加载课题学生/教师的字段
+    PARTICIPANT_FIELDS = {'studentName', 'teacherName'}
+
+    def to_dict(self, fields=None):
+        getters = {
+            'id': lambda: self.id,
+            'projectId': lambda: self.project_id,
+            'studentName': lambda: self.project.student.name if self.project and self.project.student else '未知',
+            'teacherName': lambda: self.project.teacher.name if self.project and self.project.teacher else '未知',
+            'date': lambda: self.record_date.strftime('%Y-%m-%d') if self.record_date else None,
+            'content': lambda: self.content,
+            'teacherComment': lambda: self.teacher_comment,
+            'status': lambda: self.status,
+            'updatedAt': lambda: self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
         }
+        return {key: get() for key, get in getters.items() if fields is None or key in fields}
@@ -0,0 +1,35 @@
+from app.extensions import db
+from datetime import datetime
+
+class BackgroundJob(db.Model):
+    """后台任务队列（app/jobs.py）：与业务修改在同一事务中入队，提交后由 worker 执行"""
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        # worker 按 (状态, 执行时间) 取任务
+        db.Index('ix_background_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)  # 任务类型，对应 @jobs.job(kind) 注册的处理函数
+    payload = db.Column(db.Text, nullable=False)  # JSON 参数
+    # 状态：pending-等待执行, running-执行中, dead-重试耗尽（死信，需人工处理）；成功的任务直接删除
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 最早执行时间（重试退避）
+    locked_until = db.Column(db.DateTime)  # 执行租约，worker 异常退出后过期重新执行
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'maxAttempts': self.max_attempts,
+            'runAt': self.run_at.strftime('%Y-%m-%d %H:%M:%S') if self.run_at else None,
+            'lastError': self.last_error,
+            'createdAt': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
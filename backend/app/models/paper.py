@@ -9,26 +9,46 @@ class Paper(db.Model):
     abstract = db.Column(db.Text)
     upload_time = db.Column(db.DateTime)
     file_path = db.Column(db.String(256))
-    student_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     version = db.Column(db.String(32))  # 论文版本，如“初稿”“修改稿”
     review_status = db.Column(db.String(32))  # 评审状态，如“待评审”“已评审”
     review_type = db.Column(db.String(32))  # 评审类型，如“一审”“二审”
     reviewer_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # 评审人
     review_comment = db.Column(db.Text)  # 评审意见
     modify_comment = db.Column(db.Text)  # 修改意见
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # 最后修改时间
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'abstract': self.abstract,
-            'uploadTime': self.upload_time.strftime('%Y-%m-%d %H:%M:%S') if self.upload_time else None,
-            'filePath': self.file_path,
-            'studentId': self.student_id,
-            'version': self.version,
-            'reviewStatus': self.review_status,
-            'reviewType': self.review_type,
-            'reviewerId': self.reviewer_id,
-            'reviewComment': self.review_comment,
-            'modifyComment': self.modify_comment
-        }
\ No newline at end of file
+    # 接口字段 -> 依赖的数据库列，供 fields= 投影时只查询需要的列
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'title': ['title'],
+        'abstract': ['abstract'],
+        'uploadTime': ['upload_time'],
+        'filePath': ['file_path'],
+        'studentId': ['student_id'],
+        'version': ['version'],
+        'reviewStatus': ['review_status'],
+        'reviewType': ['review_type'],
+        'reviewerId': ['reviewer_id'],
+        'reviewComment': ['review_comment'],
+        'modifyComment': ['modify_comment'],
+        'updatedAt': ['updated_at']
+    }
+
+    def to_dict(self, fields=None):
+        getters = {
+            'id': lambda: self.id,
+            'title': lambda: self.title,
+            'abstract': lambda: self.abstract,
+            'uploadTime': lambda: self.upload_time.strftime('%Y-%m-%d %H:%M:%S') if self.upload_time else None,
+            'filePath': lambda: self.file_path,
+            'studentId': lambda: self.student_id,
+            'version': lambda: self.version,
+            'reviewStatus': lambda: self.review_status,
+            'reviewType': lambda: self.review_type,
+            'reviewerId': lambda: self.reviewer_id,
+            'reviewComment': lambda: self.review_comment,
+            'modifyComment': lambda: self.modify_comment,
+            'updatedAt': lambda: self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+        }
+        return {key: get() for key, get in getters.items() if fields is None or key in fields}
\ No newline at end of file
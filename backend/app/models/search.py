@@ -0,0 +1,16 @@
+from app.extensions import db
+
+class SearchPosting(db.Model):
+    """全文检索的倒排索引（app/search.py）：词项 -> 文档及词频，由写接口在同一事务中维护"""
+    __tablename__ = 'search_postings'
+    __table_args__ = (
+        # 主键为 (类型, 词, id)：按类型查询某个词或某个前缀的倒排表都是一次范围扫描
+        db.PrimaryKeyConstraint('doc_type', 'term', 'doc_id'),
+        # 重建单个文档的索引时按文档删除
+        db.Index('ix_search_postings_doc', 'doc_type', 'doc_id'),
+    )
+
+    doc_type = db.Column(db.String(16), nullable=False)  # guidance / paper
+    term = db.Column(db.String(32), nullable=False)  # 英文/数字词，或中文相邻两字
+    doc_id = db.Column(db.Integer, nullable=False)
+    tf = db.Column(db.Integer, nullable=False)  # 加权词频（标题等字段的权重更高）
@@ -0,0 +1,10 @@
+from app.extensions import db
+
+class StatCounter(db.Model):
+    """统计计数（app/stats.py）：每个指导教师、每个指标取值一行，由写接口在同一事务中增减"""
+    __tablename__ = 'stat_counters'
+
+    metric = db.Column(db.String(32), primary_key=True)  # 如 task.adminStatus、guidance.status
+    teacher_id = db.Column(db.Integer, primary_key=True)  # 课题的指导教师，0 表示未分配
+    bucket = db.Column(db.String(32), primary_key=True)  # 指标的取值，空值记为 none
+    value = db.Column(db.Integer, nullable=False, default=0)
@@ -3,6 +3,16 @@ from datetime import datetime
 
 class TaskDocument(db.Model):
     __tablename__ = 'task_documents'
+    __table_args__ = (
+        # 每个课题只有一份任务书
+        db.Index('uq_task_documents_project_id', 'project_id', unique=True),
+        # 教务处审核列表：teacher_submitted = 1 或 admin_status 不为空
+        db.Index('ix_task_documents_submitted_status', 'teacher_submitted', 'admin_status'),
+        db.Index('ix_task_documents_admin_status', 'admin_status'),
+        # 存储对账按路径顺序分批读取引用
+        db.Index('ix_task_documents_student_draft_path', 'student_draft_path'),
+        db.Index('ix_task_documents_teacher_revision_path', 'teacher_revision_path'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -19,23 +29,49 @@ class TaskDocument(db.Model):
     
     # 教务处审核状态: None-未审核, 'approved'-通过, 'returned'-退回
     admin_status = db.Column(db.String(20), nullable=True)
+    ADMIN_STATUSES = ('approved', 'returned')
     
     # 更新时间
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     project = db.relationship('app.models.user.Project', backref='task_documents')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'projectId': self.project_id,
-            'studentName': self.project.student.name if self.project and self.project.student else '未知',
-            'teacherName': self.project.teacher.name if self.project and self.project.teacher else '未知',
-            'studentDraftPath': self.student_draft_path,
-            'studentSubmitted': self.student_submitted,
-            'teacherRevisionPath': self.teacher_revision_path,
-            'teacherSubmitted': self.teacher_submitted,
-            'adminStatus': self.admin_status,
-            'updatedAt': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+    # 接口字段 -> 依赖的数据库列，供 fields= 投影时只查询需要的列
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'projectId': ['project_id'],
+        'studentName': ['project_id'],
+        'teacherName': ['project_id'],
+        'studentDraftPath': ['student_draft_path'],
+        'studentSubmitted': ['student_submitted'],
+        'teacherRevisionPath': ['teacher_revision_path'],
+        'teacherSubmitted': ['teacher_submitted'],
+        'adminStatus': ['admin_status'],
+        'updatedAt': ['updated_at']
+    }
+    # 需要预加载课题学生/教师的字段
+    PARTICIPANT_FIELDS = {'studentName', 'teacherName'}
+
+    @classmethod
+    def in_review_list(cls):
+        """教务处审核列表的条件：曾经提交过（teacher_submitted 为 1）或者已有审核结果
+
+        审核结果写成 IN 列表而不是 IS NOT NULL，两侧条件都能走索引（MULTI-INDEX OR / index_merge）。
+        """
+        return (cls.teacher_submitted == 1) | cls.admin_status.in_(cls.ADMIN_STATUSES)
+
+    def to_dict(self, fields=None):
+        getters = {
+            'id': lambda: self.id,
+            'projectId': lambda: self.project_id,
+            'studentName': lambda: self.project.student.name if self.project and self.project.student else '未知',
+            'teacherName': lambda: self.project.teacher.name if self.project and self.project.teacher else '未知',
+            'studentDraftPath': lambda: self.student_draft_path,
+            'studentSubmitted': lambda: self.student_submitted,
+            'teacherRevisionPath': lambda: self.teacher_revision_path,
+            'teacherSubmitted': lambda: self.teacher_submitted,
+            'adminStatus': lambda: self.admin_status,
+            'updatedAt': lambda: self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
         }
+        return {key: get() for key, get in getters.items() if fields is None or key in fields}
 
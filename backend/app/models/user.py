@@ -1,5 +1,6 @@
 from app.extensions import db
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -8,6 +9,7 @@ class User(db.Model):
     username = db.Column(db.String(64), unique=True, nullable=False) # 学号/工号
     name = db.Column(db.String(64), nullable=False)
     role = db.Column(db.String(20), nullable=False) # student, teacher, admin
+    department = db.Column(db.String(64)) # 院系，统计时按院系汇总
     
     # 关系：一个学生有一个课题，一个老师指导多个课题
     # 这里简化处理，具体关系在 Project 表体现
@@ -17,7 +19,8 @@ class User(db.Model):
             'id': self.id,
             'username': self.username,
             'name': self.name,
-            'role': self.role
+            'role': self.role,
+            'department': self.department
         }
 
 class Project(db.Model):
@@ -26,12 +29,21 @@ class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     
-    student_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    # 几乎所有接口都按学生/教师查找课题
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     
     student = db.relationship('User', foreign_keys=[student_id], backref='student_project')
     teacher = db.relationship('User', foreign_keys=[teacher_id], backref='teacher_projects')
 
+    @staticmethod
+    def eager_participants(project_attr):
+        """返回预加载选项：同时取出课题及其学生、教师，避免列表序列化时逐行懒加载 (N+1 查询)"""
+        return joinedload(project_attr).options(
+            joinedload(Project.student),
+            joinedload(Project.teacher)
+        )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,128 @@
+"""列表接口的游标分页 (keyset) 与字段投影
+
+约定：
+- 未传 limit / cursor 时保持旧行为，直接返回完整的 JSON 数组；
+- 传入 limit 或 cursor 时返回 {'items': [...], 'nextCursor': '...'}，
+  nextCursor 为 None 表示已到最后一页；
+- fields=id,date,content 只查询并返回指定字段。
+"""
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class PaginationError(ValueError):
+    """分页或投影参数不合法，由应用统一转换为 400 响应"""
+
+
+def encode_cursor(values):
+    """把最后一行的排序键编码为不透明的游标字符串"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """解析游标，并按排序列的类型还原取值"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        result = []
+        for key, value in zip(keys, values):
+            if value is not None and key.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            result.append(value)
+        return result
+    except (ValueError, TypeError, UnicodeError):
+        raise PaginationError('Invalid cursor')
+
+
+def parse_fields(model):
+    """解析 fields 参数，返回字段集合；未指定时返回 None 表示全部字段"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = {f.strip() for f in raw.split(',') if f.strip()}
+    unknown = fields - set(model.FIELD_COLUMNS)
+    if unknown:
+        raise PaginationError(f"Unknown field: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def apply_projection(query, model, fields, keys, eager=None):
+    """只加载所请求字段依赖的列；需要学生/教师姓名时才预加载课题参与者
+
+    keys 为分页排序列，始终需要加载以便生成下一页游标。
+    """
+    if fields is None:
+        return query.options(eager) if eager is not None else query
+
+    columns = {key.key for key in keys}
+    for field in fields:
+        columns.update(model.FIELD_COLUMNS[field])
+    query = query.options(load_only(*[getattr(model, c) for c in sorted(columns)]))
+    if eager is not None and fields & getattr(model, 'PARTICIPANT_FIELDS', set()):
+        query = query.options(eager)
+    return query
+
+
+def paginate(query, keys, fields=None):
+    """按 keys（升序）做游标分页并序列化
+
+    keys 的最后一列必须唯一（通常是主键 id），保证翻页既不重复也不遗漏。
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    query = query.order_by(*keys)
+
+    if limit is None and cursor is None:
+        return [row.to_dict(fields) for row in query.all()]
+
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_LIMIT
+    except ValueError:
+        raise PaginationError('Invalid limit')
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, keys)))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, key.key) for key in keys])
+
+    return {
+        'items': [row.to_dict(fields) for row in rows],
+        'nextCursor': next_cursor
+    }
+
+
+def _after(keys, values):
+    """构造 (k1, k2, ...) > (v1, v2, ...) 的条件，兼容不支持行值比较的数据库"""
+    clauses = []
+    for i, key in enumerate(keys):
+        # key == None 生成 IS NULL
+        equal = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, _greater(key, values[i])))
+    return or_(*clauses)
+
+
+def _greater(key, value):
+    """key 排在 value 之后的条件
+
+    SQLite 与 MySQL 升序时 NULL 排在最前：NULL 之后是所有非 NULL 的值，
+    非 NULL 的值之后不会再有 NULL（key > NULL 永远不成立，不能直接比较）。
+    """
+    if value is None:
+        return key.isnot(None)
+    return key > value
@@ -0,0 +1,193 @@
+"""任务书文件的预览（首页图片 + 文本摘要）
+
+上传后由后台任务（app/jobs.py）生成，按内容摘要保存在 uploads/task/.previews/ab/cd/ 下：
+- <digest>.png：首页图片，PDF 用 pdftoppm（poppler-utils）渲染；.doc/.docx 先用
+  LibreOffice（soffice --headless）转换为 PDF，未安装时不生成图片；
+- <digest>.html：前几页的文本，按段落转义为 <p>，最多 PREVIEW_TEXT_LIMIT 个字符；
+  PDF 用 pdftotext，.docx 直接读取 word/document.xml（不依赖外部工具），.doc 经 LibreOffice 转换；
+- <digest>.json：生成结果（有无图片/文本、是否截断），存在即表示已处理过。
+只使用本机工具，不调用外部服务；缺少工具或文件无法解析时跳过对应的预览，前端回退为打开原文件。
+相同内容的文件共用一份预览，文件被回收（storage.collect_garbage）时一并删除。
+"""
+import html
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+import zipfile
+from xml.etree import ElementTree
+from flask import current_app, request
+from werkzeug.utils import send_file as _send_file
+from app import storage, jobs
+
+FORMATS = {'image': ('png', 'image/png'), 'html': ('html', 'text/html; charset=utf-8')}
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def manifest(digest):
+    """生成结果；尚未生成时返回 None"""
+    try:
+        with open(storage.abspath(storage.preview_path(digest, 'json')), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def request_preview(ref):
+    """在当前事务中安排生成预览（相同内容已有预览时不重复生成）"""
+    digest = storage.parse_ref(ref)
+    if digest and manifest(digest) is None:
+        jobs.enqueue('preview.generate', {'ref': ref})
+
+
+def _write(digest, ext, data):
+    path = storage.abspath(storage.preview_path(digest, ext))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _run(args, timeout):
+    """执行外部工具，返回标准输出；工具未安装或执行失败时返回 None（超时抛出异常，由任务重试）"""
+    if shutil.which(args[0]) is None:
+        return None
+    try:
+        return subprocess.run(args, capture_output=True, check=True, timeout=timeout).stdout
+    except subprocess.CalledProcessError as e:
+        current_app.logger.warning('%s failed: %s', args[0], e.stderr.decode(errors='replace')[:500])
+        return None
+
+
+def _paragraphs_html(paragraphs, limit):
+    """段落 -> 转义后的 HTML 片段；返回 (html, 是否截断)"""
+    parts = []
+    used = 0
+    for text in paragraphs:
+        text = text.strip()
+        if not text:
+            continue
+        if used + len(text) > limit:
+            parts.append(f'<p>{html.escape(text[:limit - used])}</p>')
+            return '\n'.join(parts), True
+        parts.append(f'<p>{html.escape(text)}</p>')
+        used += len(text)
+    return '\n'.join(parts), False
+
+
+def docx_paragraphs(path):
+    """逐段读取 .docx 正文（流式解析 word/document.xml）"""
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as document:
+        texts = []
+        for event, element in ElementTree.iterparse(document, events=('end',)):
+            if element.tag == f'{_W_NS}t':
+                texts.append(element.text or '')
+            elif element.tag == f'{_W_NS}tab':
+                texts.append('\t')
+            elif element.tag == f'{_W_NS}p':
+                yield ''.join(texts)
+                texts = []
+                element.clear()
+
+
+def _render_pdf(pdf_path, workdir, config):
+    """PDF 首页图片与前几页文本"""
+    timeout = config.get('PREVIEW_TIMEOUT', 60)
+    image = None
+    prefix = os.path.join(workdir, 'page')
+    if _run(['pdftoppm', '-png', '-f', '1', '-l', '1', '-singlefile',
+             '-scale-to', str(config.get('PREVIEW_IMAGE_SIZE', 800)), pdf_path, prefix], timeout) is not None:
+        with open(f'{prefix}.png', 'rb') as f:
+            image = f.read()
+    text = _run(['pdftotext', '-f', '1', '-l', str(config.get('PREVIEW_PAGES', 3)),
+                 '-enc', 'UTF-8', pdf_path, '-'], timeout)
+    paragraphs = text.decode('utf-8', errors='replace').split('\n\n') if text is not None else None
+    return image, paragraphs
+
+
+def _convert_to_pdf(source, workdir, timeout):
+    """用 LibreOffice 把 .doc/.docx 转换为 PDF；未安装或失败时返回 None"""
+    profile = 'file://' + os.path.join(workdir, 'profile')
+    # 每次转换使用独立的用户配置目录，多个 worker 可同时运行 soffice
+    if _run(['soffice', f'-env:UserInstallation={profile}', '--headless', '--convert-to', 'pdf',
+             '--outdir', workdir, source], timeout) is None:
+        return None
+    pdf_path = os.path.splitext(source)[0] + '.pdf'
+    return pdf_path if os.path.exists(pdf_path) else None
+
+
+def _docx_rendition(path, limit):
+    try:
+        return _paragraphs_html(docx_paragraphs(path), limit)
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        current_app.logger.warning('Cannot read %s as docx: %s', path, e)
+        return None
+
+
+def generate(digest, filename):
+    """为摘要对应的文件生成预览并写入 manifest"""
+    config = current_app.config
+    limit = config.get('PREVIEW_TEXT_LIMIT', 20000)
+    source = storage.abspath(storage.blob_path(digest))
+    if not os.path.exists(source):
+        return
+    ext = os.path.splitext(filename)[1].lower()
+    image = rendition = None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if ext == '.pdf':
+            image, paragraphs = _render_pdf(source, workdir, config)
+            if paragraphs is not None:
+                rendition = _paragraphs_html(paragraphs, limit)
+        elif ext in ('.doc', '.docx'):
+            # LibreOffice 按扩展名识别格式，摘要文件名没有扩展名
+            named = os.path.join(workdir, 'source' + ext)
+            os.symlink(source, named)
+            if ext == '.docx':
+                rendition = _docx_rendition(named, limit)
+            pdf_path = _convert_to_pdf(named, workdir, config.get('PREVIEW_TIMEOUT', 60))
+            if pdf_path:
+                image, paragraphs = _render_pdf(pdf_path, workdir, config)
+                if rendition is None and paragraphs is not None:
+                    rendition = _paragraphs_html(paragraphs, limit)
+
+    if image is not None:
+        _write(digest, 'png', image)
+    if rendition is not None:
+        _write(digest, 'html', rendition[0].encode('utf-8'))
+    result = {'image': image is not None, 'html': rendition is not None,
+              'truncated': bool(rendition and rendition[1])}
+    _write(digest, 'json', json.dumps(result).encode())
+
+
+@jobs.job('preview.generate')
+def generate_job(ref):
+    digest = storage.parse_ref(ref)
+    if digest:
+        generate(digest, storage.original_name(ref))
+
+
+def send_preview(ref, kind):
+    """发送预览文件；尚未生成或无法生成时返回 None。ETag 为摘要，浏览器重复查看只需一次 304"""
+    digest = storage.parse_ref(ref)
+    if not digest:
+        return None
+    ext, mimetype = FORMATS[kind]
+    path = storage.abspath(storage.preview_path(digest, ext))
+    if not os.path.exists(path):
+        return None
+    response = _send_file(
+        path,
+        request.environ,
+        mimetype=mimetype,
+        etag=f'{digest}-{kind}',
+        conditional=True,
+        response_class=current_app.response_class
+    )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -0,0 +1,245 @@
+"""线上请求的按需性能剖析（cProfile + SQL 记录）
+
+触发方式（默认都不开启，未触发的请求只多一次请求头检查与一次随机数比较）：
+- 管理员在请求中加请求头 X-Profile: 1，响应头 X-Profile-Id 返回剖析记录的 id；
+- 按 PROFILE_SAMPLE_RATE 的比例随机抽样（0~1，0 表示不抽样）。
+
+被剖析的请求从 before_request 到响应发送完毕（流式响应的生成器也包括在内）运行 cProfile，
+并记录执行的每条 SQL 与耗时（只记语句，不记参数，最多 PROFILE_SQL_LIMIT 条）。
+结果保存在 PROFILE_DIR（相对 BASE_DIR）下，所有进程共用，最多保留 PROFILE_KEEP 个：
+- <id>.json：请求信息与 SQL 列表；
+- <id>.prof：cProfile 原始数据（pstats 格式，可用 snakeviz 等工具查看）。
+通过 GET /api/admin/profiles 查看列表，GET /api/admin/profiles/<id> 查看耗时最多的函数与 SQL。
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.auth import get_current_user
+
+HEADER = 'X-Profile'
+# 函数列表的排序方式
+SORT_KEYS = {'cumulative': 3, 'tottime': 2, 'calls': 1}
+_ID_RE = re.compile(r'^\d{17}-[0-9a-f]{8}$')
+
+
+class RequestProfile:
+    """一个被剖析请求的 cProfile 与 SQL 记录（保存在 flask.g 中）"""
+
+    def __init__(self, trigger, sql_limit):
+        # 以毫秒时间开头，按名称排序即按时间排序
+        self.id = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')[:17]}-{uuid.uuid4().hex[:8]}"
+        self.trigger = trigger
+        self.sql_limit = sql_limit
+        self.statements = []
+        self.statement_count = 0
+        self.attached = False
+        self.finished = False
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+
+    def record_statement(self, statement, seconds):
+        self.statement_count += 1
+        if len(self.statements) < self.sql_limit:
+            self.statements.append({'sql': statement, 'ms': round(seconds * 1000, 3)})
+
+
+def folder(app=None):
+    app = app or current_app
+    return os.path.join(app.config['BASE_DIR'], app.config.get('PROFILE_DIR', 'instance/profiles'))
+
+
+def _should_profile(app):
+    if request.headers.get(HEADER) == '1':
+        user = get_current_user()
+        # 非管理员的请求头直接忽略
+        if user and user.role == 'admin':
+            return 'header'
+    rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'request_profile' in g:
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('profile_started')
+    if started and has_request_context() and 'request_profile' in g:
+        g.request_profile.record_statement(statement, time.perf_counter() - started.pop())
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('profile_started'):
+        connection.info['profile_started'].pop()
+
+
+def _write_json(path, data):
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _prune(directory, keep):
+    """只保留最新的 keep 个剖析记录"""
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:max(len(ids) - keep, 0)]:
+        for ext in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(directory, f'{profile_id}.{ext}'))
+            except FileNotFoundError:
+                pass
+
+
+def _save(app, profile, info):
+    directory = folder(app)
+    os.makedirs(directory, exist_ok=True)
+    profile.profiler.dump_stats(os.path.join(directory, f'{profile.id}.prof'))
+    # json 最后写入：列表只显示已完整保存的记录
+    _write_json(os.path.join(directory, f'{profile.id}.json'), {
+        'id': profile.id,
+        'trigger': profile.trigger,
+        **info,
+        'durationMs': round((time.perf_counter() - profile.started) * 1000, 3),
+        'sqlCount': profile.statement_count,
+        'sqlMs': round(sum(item['ms'] for item in profile.statements), 3),
+        'sqlTruncated': profile.statement_count > len(profile.statements),
+        'sql': profile.statements,
+    })
+    _prune(directory, app.config.get('PROFILE_KEEP', 200))
+
+
+def _request_info(status):
+    user = g.get('current_user')
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'status': status,
+        'userId': user.id if user else None,
+    }
+
+
+def _finish(app, profile, info):
+    if profile.finished:
+        return
+    profile.finished = True
+    profile.profiler.disable()
+    try:
+        _save(app, profile, info)
+    except OSError:
+        app.logger.exception('Saving profile %s failed', profile.id)
+
+
+def init_app(app):
+    """注册请求钩子；在 metrics.init_app 之后调用"""
+    sql_limit = app.config.get('PROFILE_SQL_LIMIT', 1000)
+
+    @app.before_request
+    def start_profile():
+        trigger = _should_profile(app)
+        if trigger is None:
+            return
+        profile = RequestProfile(trigger, sql_limit)
+        try:
+            profile.profiler.enable()
+        except ValueError:
+            # 本线程已有其他剖析工具在运行
+            return
+        g.request_profile = profile
+
+    @app.after_request
+    def attach_profile(response):
+        profile = g.get('request_profile')
+        if profile is None:
+            return response
+        info = _request_info(response.status_code)
+        response.headers['X-Profile-Id'] = profile.id
+        # 响应发送完毕（含流式响应的生成器）后停止剖析并保存
+        response.call_on_close(lambda: _finish(app, profile, info))
+        profile.attached = True
+        return response
+
+    @app.teardown_request
+    def stop_profile(exception):
+        # 没有走到 after_request（例如 after_request 中出错）时也要停止剖析，否则会影响本线程之后的请求
+        profile = g.get('request_profile')
+        if profile is not None and not profile.attached:
+            _finish(app, profile, _request_info(500))
+
+
+def list_profiles(limit=100):
+    """最新的剖析记录（不含 SQL 列表）"""
+    directory = folder()
+    if not os.path.isdir(directory):
+        return []
+    result = []
+    for name in sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        data.pop('sql', None)
+        result.append(data)
+    return result
+
+
+def profile_path(profile_id, ext):
+    """剖析记录文件的路径；id 无效或不存在时返回 None"""
+    if not _ID_RE.match(profile_id or ''):
+        return None
+    path = os.path.join(folder(), f'{profile_id}.{ext}')
+    return path if os.path.exists(path) else None
+
+
+def load_profile(profile_id, sort='cumulative', limit=50):
+    """剖析记录详情：请求信息、SQL 列表与按 sort 排序的前 limit 个函数；不存在时返回 None"""
+    path = profile_path(profile_id, 'json')
+    if path is None:
+        return None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    functions = []
+    prof_path = profile_path(profile_id, 'prof')
+    if prof_path:
+        stats = pstats.Stats(prof_path).stats
+        index = SORT_KEYS[sort]
+        rows = sorted(stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+        for (filename, line, name), (primitive_calls, calls, total, cumulative, _) in rows:
+            functions.append({
+                'function': f'{name} ({filename}:{line})' if filename != '~' else name,
+                'calls': calls,
+                'primitiveCalls': primitive_calls,
+                'totalMs': round(total * 1000, 3),
+                'cumulativeMs': round(cumulative * 1000, 3),
+            })
+    data['functions'] = functions
+    return data
+
+
+def delete_profile(profile_id):
+    found = False
+    for ext in ('json', 'prof'):
+        path = profile_path(profile_id, ext)
+        if path:
+            os.remove(path)
+            found = True
+    return found
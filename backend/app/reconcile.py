@@ -0,0 +1,366 @@
+"""上传文件存储的对账：flask storage reconcile
+
+对比 uploads/task 目录与 task_documents 中的 student_draft_path / teacher_revision_path，
+找出并（加 --fix 时）修复：
+- orphanBlobs：没有任何任务书引用的内容寻址文件；
+- orphanLegacyFiles：没有任何任务书引用的旧格式文件（<uuid>_<原文件名>）；
+- staleTempFiles：写入中途失败留下的 .tmp 临时文件；
+- expiredUploadSessions：超过 TASK_UPLOAD_SESSION_TTL 没有新数据的分片上传会话；
+- countMismatches：stored_files.ref_count 与实际引用数不一致（或缺少记录）；
+- staleRecords：文件已不存在且没有引用的 stored_files 记录；
+- danglingRefs：任务书引用的文件已不存在（加 --fix-dangling 时清空该路径）。
+
+内存占用与文件数无关：
+- 目录按 <摘要前两位>/<三四位>/ 逐个叶子目录排序读取，三路数据（磁盘文件、stored_files、
+  按路径排序的引用）都是按摘要有序的流，归并对齐，每次只持有一批；
+- 数据库按 keyset 分页读取（路径列有 v0007 的索引），每批 batch_size 行。
+扫描与修复不在同一事务中，修复每个摘要时都在 stored_files 行锁下重新统计引用数，
+与同时进行的上传/删除互斥；修改时间在 min_age 秒之内的文件不处理。
+"""
+import heapq
+import itertools
+import os
+import re
+import time
+from flask import current_app
+from sqlalchemy import select, update, delete, insert, func, and_, or_
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import StoredFile, TaskDocument, BackgroundJob
+from app.upload_sessions import UploadSession
+from app import storage, response_cache, events, jobs
+
+REF_COLUMNS = ('student_draft_path', 'teacher_revision_path')
+# 报告中每类问题最多列出的样例数
+SAMPLE_LIMIT = 100
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+_HEX_DIR_RE = re.compile(r'^[0-9a-f]{2}$')
+
+
+class Report:
+    """对账结果：各类问题的数量、涉及的字节数，以及每类最多 SAMPLE_LIMIT 个样例"""
+    CATEGORIES = ('orphanBlobs', 'orphanLegacyFiles', 'staleTempFiles', 'expiredUploadSessions',
+                  'countMismatches', 'staleRecords', 'danglingRefs')
+
+    def __init__(self, fix):
+        self.fix = fix
+        self.counts = dict.fromkeys(self.CATEGORIES, 0)
+        self.samples = {category: [] for category in self.CATEGORIES}
+        self.scanned_files = 0
+        self.scanned_refs = 0
+        self.orphan_bytes = 0
+        self.repaired = 0
+        self.started = time.monotonic()
+
+    def add(self, category, item, size=0):
+        self.counts[category] += 1
+        self.orphan_bytes += size
+        if len(self.samples[category]) < SAMPLE_LIMIT:
+            self.samples[category].append(item)
+
+    def to_dict(self):
+        return {
+            'fix': self.fix,
+            'scannedFiles': self.scanned_files,
+            'scannedRefs': self.scanned_refs,
+            'counts': self.counts,
+            'orphanBytes': self.orphan_bytes,
+            'repaired': self.repaired,
+            'seconds': round(time.monotonic() - self.started, 2),
+            'samples': self.samples,
+        }
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _age(path, now):
+    try:
+        return now - os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _hex_dirs(path):
+    """path 下两位十六进制名称的子目录（最多 256 个），按名称排序"""
+    try:
+        with os.scandir(path) as entries:
+            return sorted(e.name for e in entries if _HEX_DIR_RE.match(e.name) and e.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+def iter_blobs(root):
+    """按摘要顺序列出内容寻址文件，返回 (摘要, 绝对路径)；每次只读取一个叶子目录"""
+    for first in _hex_dirs(root):
+        for second in _hex_dirs(os.path.join(root, first)):
+            folder = os.path.join(root, first, second)
+            with os.scandir(folder) as entries:
+                names = sorted(e.name for e in entries
+                               if _DIGEST_RE.match(e.name) and e.name[:2] == first and e.name[2:4] == second)
+            for name in names:
+                yield name, os.path.join(folder, name)
+
+
+def iter_stored_files(batch_size):
+    """按摘要顺序分批读取 stored_files，返回 (摘要, 引用计数)"""
+    last = ''
+    while True:
+        rows = db.session.execute(
+            select(StoredFile.digest, StoredFile.ref_count)
+            .where(StoredFile.digest > last).order_by(StoredFile.digest).limit(batch_size)
+        ).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1].digest
+
+
+def iter_refs(column_name, batch_size):
+    """按路径顺序分批读取一列中的引用，返回 (路径, 任务书 id, 列名)；以 (路径, id) 做 keyset 分页"""
+    column = getattr(TaskDocument, column_name)
+    last_path, last_id = '', 0
+    while True:
+        rows = db.session.execute(
+            select(column, TaskDocument.id)
+            .where(or_(column > last_path, and_(column == last_path, TaskDocument.id > last_id)))
+            .order_by(column, TaskDocument.id).limit(batch_size)
+        ).all()
+        for path, task_id in rows:
+            yield path, task_id, column_name
+        if len(rows) < batch_size:
+            return
+        last_path, last_id = rows[-1]
+
+
+def _outer_join(*streams):
+    """按摘要对齐多个已排序、键唯一的 (摘要, 值) 流，返回 (摘要, [各流的值或 None])"""
+    iterators = [iter(stream) for stream in streams]
+    heads = [next(it, None) for it in iterators]
+    while any(head is not None for head in heads):
+        digest = min(head[0] for head in heads if head is not None)
+        values = []
+        for i, head in enumerate(heads):
+            if head is not None and head[0] == digest:
+                values.append(head[1])
+                heads[i] = next(iterators[i], None)
+            else:
+                values.append(None)
+        yield digest, values
+
+
+def repair_blob(digest):
+    """在 stored_files 行锁下重新统计 digest 的实际引用数并修正记录；
+    没有引用时删除记录和文件。返回删除的字节数，并发上传正在登记同一内容时返回 None"""
+    prefix = storage.ref_prefix(digest)
+    path = storage.abspath(storage.blob_path(digest))
+    try:
+        with db.engine.begin() as conn:
+            row = conn.execute(
+                select(StoredFile.ref_count).where(StoredFile.digest == digest).with_for_update()
+            ).first()
+            actual = sum(
+                conn.execute(
+                    select(func.count()).select_from(TaskDocument)
+                    .where(getattr(TaskDocument, name).startswith(prefix, autoescape=True))
+                ).scalar()
+                for name in REF_COLUMNS
+            )
+            if row is None:
+                # 先登记记录：与同时上传相同内容的请求在主键上互斥
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                conn.execute(insert(StoredFile).values(digest=digest, size=size, ref_count=actual))
+            elif row.ref_count != actual:
+                conn.execute(update(StoredFile).where(StoredFile.digest == digest).values(ref_count=actual))
+            if actual:
+                return 0
+            conn.execute(delete(StoredFile).where(StoredFile.digest == digest))
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            storage._remove(path)
+            for ext in storage.PREVIEW_EXTENSIONS:
+                storage._remove(storage.abspath(storage.preview_path(digest, ext)))
+            return size
+    except IntegrityError:
+        return None
+
+
+def clear_dangling(refs):
+    """清空指向不存在文件的任务书路径；refs 为 (路径, 任务书 id, 列名)"""
+    for path, task_id, column_name in refs:
+        task_doc = db.session.get(TaskDocument, task_id)
+        if task_doc is None or getattr(task_doc, column_name) != path:
+            continue
+        setattr(task_doc, column_name, None)
+        storage.release(path)
+        events.task_changed(task_doc)
+    response_cache.invalidate('task')
+    db.session.commit()
+
+
+def _content_refs(refs, on_legacy):
+    """从按路径有序的引用中取出内容寻址的引用，返回 (摘要, 引用)；旧格式引用交给 on_legacy"""
+    for ref in refs:
+        if not ref[0]:
+            continue
+        digest = storage.parse_ref(ref[0])
+        if digest:
+            yield digest, ref
+        else:
+            on_legacy(ref)
+
+
+def _check_blobs(report, batch_size, min_age, fix, fix_dangling):
+    root = storage.abspath(storage.BLOB_ROOT)
+    now = time.time()
+    dangling = []
+
+    def add_dangling(ref):
+        report.add('danglingRefs', {'taskId': ref[1], 'column': ref[2], 'path': ref[0]})
+        dangling.append(ref)
+
+    def check_legacy_ref(ref):
+        # 旧格式引用：直接检查文件是否存在
+        report.scanned_refs += 1
+        if not storage.exists(ref[0]):
+            add_dangling(ref)
+
+    # 两列引用各自按路径（即按摘要）有序，归并后按摘要分组
+    streams = [_content_refs(iter_refs(name, batch_size), check_legacy_ref) for name in REF_COLUMNS]
+    merged = heapq.merge(*streams, key=lambda item: item[0])
+    refs = ((digest, [ref for _, ref in group])
+            for digest, group in itertools.groupby(merged, key=lambda item: item[0]))
+
+    for digest, (path, row, digest_refs) in _outer_join(iter_blobs(root), iter_stored_files(batch_size), refs):
+        count = len(digest_refs or ())
+        report.scanned_files += path is not None
+        report.scanned_refs += count
+        needs_repair = True
+        if path is not None and not count:
+            if _age(path, now) < min_age:
+                continue
+            report.add('orphanBlobs', storage.blob_path(digest), os.path.getsize(path))
+        elif path is None and not count:
+            report.add('staleRecords', digest)
+        elif row != count and (row is not None or path is not None):
+            report.add('countMismatches', {'digest': digest, 'refCount': row, 'actual': count})
+        else:
+            needs_repair = False
+        if path is None and count:
+            for ref in digest_refs:
+                add_dangling(ref)
+        if fix and needs_repair and repair_blob(digest) is not None:
+            report.repaired += 1
+        if fix_dangling and len(dangling) >= batch_size:
+            clear_dangling(dangling)
+            report.repaired += len(dangling)
+            dangling.clear()
+        elif not fix_dangling:
+            dangling.clear()
+
+    if fix_dangling and dangling:
+        clear_dangling(dangling)
+        report.repaired += len(dangling)
+
+
+def _iter_legacy_files(root):
+    """uploads/task 根目录下的旧格式文件（不排序，按目录顺序逐个返回）"""
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if not entry.name.startswith('.') and not _HEX_DIR_RE.match(entry.name) and entry.is_file():
+                    yield entry.name, entry.path
+    except FileNotFoundError:
+        return
+
+
+def _check_legacy_files(report, batch_size, min_age, fix):
+    root = storage.abspath(storage.BLOB_ROOT)
+    now = time.time()
+    for batch in _batches(_iter_legacy_files(root), batch_size):
+        refs = {os.path.join(storage.BLOB_ROOT, name): path for name, path in batch}
+        referenced = set()
+        for name in REF_COLUMNS:
+            column = getattr(TaskDocument, name)
+            referenced.update(db.session.scalars(select(column).where(column.in_(list(refs)))))
+        for ref, path in refs.items():
+            report.scanned_files += 1
+            if ref in referenced or _age(path, now) < min_age:
+                continue
+            report.add('orphanLegacyFiles', ref, os.path.getsize(path))
+            if fix:
+                storage._remove(path)
+                report.repaired += 1
+
+
+def _check_scratch(report, min_age, session_ttl, fix):
+    """.tmp 中的临时文件与过期的分片上传会话"""
+    now = time.time()
+    tmp_folder = storage.abspath(storage.TMP_FOLDER)
+    if os.path.isdir(tmp_folder):
+        with os.scandir(tmp_folder) as entries:
+            for entry in entries:
+                if entry.is_file() and _age(entry.path, now) >= min_age:
+                    report.add('staleTempFiles', entry.name, entry.stat().st_size)
+                    if fix:
+                        storage._remove(entry.path)
+                        report.repaired += 1
+
+    session_folder = storage.abspath(storage.SESSION_FOLDER)
+    if os.path.isdir(session_folder):
+        with os.scandir(session_folder) as entries:
+            for entry in entries:
+                upload_id, ext = os.path.splitext(entry.name)
+                if ext == '.json':
+                    session = UploadSession.load(session_folder, upload_id)
+                    if session is None or now - session.last_activity < session_ttl:
+                        continue
+                    report.add('expiredUploadSessions', upload_id, session.offset)
+                    if fix:
+                        session.discard()
+                        report.repaired += 1
+                elif ext == '.part' and not os.path.exists(os.path.join(session_folder, f'{upload_id}.json')) \
+                        and _age(entry.path, now) >= min_age:
+                    # 元数据已丢失的数据文件
+                    report.add('expiredUploadSessions', upload_id, entry.stat().st_size)
+                    if fix:
+                        storage._remove(entry.path)
+                        report.repaired += 1
+
+
+def reconcile(fix=False, fix_dangling=False, min_age=3600, batch_size=1000):
+    """执行一次对账并返回 Report；fix 为 False 时只报告，不做任何修改"""
+    report = Report(fix)
+    try:
+        _check_blobs(report, batch_size, min_age, fix, fix_dangling)
+        _check_legacy_files(report, batch_size, min_age, fix)
+        _check_scratch(report, min_age, current_app.config.get('TASK_UPLOAD_SESSION_TTL', 86400), fix)
+    finally:
+        db.session.rollback()
+    return report
+
+
+def schedule(delay=0):
+    """没有等待中的定期对账任务时加入一个（在当前事务中）"""
+    pending = db.session.execute(
+        select(BackgroundJob.id).where(BackgroundJob.kind == 'storage.reconcile',
+                                       BackgroundJob.status.in_(('pending', 'running')))
+    ).first()
+    if pending is None:
+        jobs.enqueue('storage.reconcile', delay=delay)
+
+
+@jobs.job('storage.reconcile')
+def reconcile_job():
+    """定期对账：修复孤立文件与引用计数（不清空悬空引用，只记录日志），完成后按 STORAGE_RECONCILE_INTERVAL 再次安排"""
+    report = reconcile(fix=True, min_age=current_app.config.get('STORAGE_RECONCILE_MIN_AGE', 3600))
+    summary = report.to_dict()
+    current_app.logger.info('Storage reconcile: counts=%s repaired=%s orphanBytes=%s',
+                            summary['counts'], summary['repaired'], summary['orphanBytes'])
+    interval = current_app.config.get('STORAGE_RECONCILE_INTERVAL', 0)
+    if interval:
+        jobs.enqueue('storage.reconcile', delay=interval)
+        db.session.commit()
@@ -0,0 +1,162 @@
+"""只读副本路由
+
+- 配置 DB_REPLICA_URLS 后，每个副本注册为 SQLALCHEMY_BINDS 中的 replica_<n>；
+- 用 @replica_reads 标记的只读接口，其 SELECT 发往一个健康的副本（同一请求固定同一个副本）；
+- 写操作（flush、INSERT/UPDATE/DELETE、SELECT ... FOR UPDATE）总是发往主库，写过之后本请求的读也回到主库；
+- 读己之写：写请求成功后下发 Cookie，DB_REPLICA_STICKY_SECONDS 秒内该浏览器的读请求仍走主库；
+- 副本延迟超过 DB_REPLICA_MAX_LAG 秒或探测失败时，回退主库。
+
+本地验证：DB_REPLICA_URLS=sqlite:///<副本文件路径>，副本文件为主库文件的拷贝（SQLite 视为无延迟）。
+"""
+import functools
+import random
+import threading
+import time
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.sql.dml import UpdateBase
+
+STICKY_COOKIE = 'read_primary_until'
+BIND_PREFIX = 'replica_'
+
+
+class ReplicaMonitor:
+    """副本延迟探测结果，按 DB_REPLICA_CHECK_INTERVAL 秒缓存，避免每个请求都查询复制状态"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+        self.max_lag = 5
+        self.check_interval = 5
+        self.counters = {'replica': 0, 'primaryLagging': 0, 'primarySticky': 0}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def lag(self, key, engine):
+        """返回副本延迟秒数；无法确定（复制中断、连接失败）时返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._checked.get(key)
+            if entry and now - entry[0] < self.check_interval:
+                return entry[1]
+        try:
+            lag = replica_lag(engine)
+        except Exception:
+            lag = None
+        with self._lock:
+            self._checked[key] = (now, lag)
+        return lag
+
+    def healthy(self, key, engine):
+        lag = self.lag(key, engine)
+        return lag is not None and lag <= self.max_lag
+
+    def status(self, engines):
+        return {
+            'maxLag': self.max_lag,
+            'replicas': {key: self.lag(key, engine) for key, engine in engines.items()},
+            'routed': dict(self.counters),
+        }
+
+
+monitor = ReplicaMonitor()
+
+
+def replica_lag(engine):
+    """MySQL 读取 Seconds_Behind_Source；SQLite 没有复制，视为无延迟"""
+    if engine.dialect.name != 'mysql':
+        return 0
+    with engine.connect() as conn:
+        try:
+            row = conn.execute(text('SHOW REPLICA STATUS')).mappings().first()
+        except Exception:
+            # MySQL 8.0.22 之前的语法
+            conn.rollback()
+            row = conn.execute(text('SHOW SLAVE STATUS')).mappings().first()
+    if row is None:
+        # 未配置复制（例如本地用两个独立实例测试）
+        return 0
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return None if lag is None else int(lag)
+
+
+def replica_engines(engines):
+    return {key: engine for key, engine in engines.items()
+            if isinstance(key, str) and key.startswith(BIND_PREFIX)}
+
+
+def is_write(clause):
+    return isinstance(clause, UpdateBase) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """在 Flask-SQLAlchemy 按 bind_key 选择引擎的基础上，为只读请求选择副本"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and (self._flushing or is_write(clause)):
+            self.info['wrote'] = True
+        elif bind is None and not self.info.get('wrote'):
+            replica = self._request_replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _request_replica(self):
+        """当前请求使用的副本；不适用副本时返回 None（结果在请求内缓存）"""
+        if not has_request_context() or not g.get('replica_reads'):
+            return None
+        if 'replica_engine' not in g:
+            g.replica_engine = choose_replica(self._db.engines)
+        return g.replica_engine
+
+
+def choose_replica(engines):
+    try:
+        sticky_until = float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        sticky_until = 0
+    if sticky_until > time.time():
+        monitor.count('primarySticky')
+        return None
+
+    replicas = replica_engines(engines)
+    if not replicas:
+        return None
+    healthy = [engine for key, engine in replicas.items() if monitor.healthy(key, engine)]
+    if not healthy:
+        monitor.count('primaryLagging')
+        return None
+    monitor.count('replica')
+    return random.choice(healthy)
+
+
+def replica_reads(view):
+    """标记只读接口：其中的查询可以发往副本"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+    """把 DB_REPLICA_URLS 注册为 SQLALCHEMY_BINDS；需在 db.init_app 之前调用"""
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for index, url in enumerate(app.config.get('DB_REPLICA_URLS') or []):
+        binds[f'{BIND_PREFIX}{index}'] = url
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    monitor.max_lag = app.config.get('DB_REPLICA_MAX_LAG', monitor.max_lag)
+    monitor.check_interval = app.config.get('DB_REPLICA_CHECK_INTERVAL', monitor.check_interval)
+    sticky_seconds = app.config.get('DB_REPLICA_STICKY_SECONDS', 10)
+
+    @app.after_request
+    def mark_sticky(response):
+        # 写请求成功后，短时间内该用户的读请求走主库，保证能读到自己刚写入的数据
+        if binds and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(STICKY_COOKIE, str(time.time() + sticky_seconds),
+                                max_age=sticky_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,230 @@
+"""列表接口的响应缓存
+
+缓存键 = (命名空间的代次, 接口, 角色, 用户 id, 查询参数)，两级存储：
+- 进程内 TTL + LRU（TTLCache）；
+- 可选的共享层 Redis（RESPONSE_CACHE_REDIS_URL），多个 gunicorn 进程共用。
+
+失效方式为“换代”：写接口调用 invalidate('task') 等，事务提交后该命名空间的代次变化，
+旧的缓存键不再被使用，随 LRU/TTL 自然淘汰。代次保存在 Redis 中；未配置 Redis 时
+保存在 RESPONSE_CACHE_DIR 下的小文件中，同一台机器上的所有进程都能立即看到。
+响应由只读副本生成时，缓存时间不超过 DB_REPLICA_MAX_LAG，避免把副本的旧数据缓存到新代次下。
+"""
+import functools
+import os
+import pickle
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, request, current_app, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.auth import get_current_user
+from app.ttl_cache import TTLCache
+
+try:
+    import redis
+except ImportError:  # 可选依赖，仅在配置了 RESPONSE_CACHE_REDIS_URL 时需要
+    redis = None
+
+NAMESPACES = ('task', 'guidance', 'paper')
+# 认证参数与用户 id 重复，不参与缓存键
+IGNORED_ARGS = ('userId',)
+# 与响应体一起缓存的校验相关响应头
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def new_token():
+    """代次令牌：<换代时间毫秒>.<随机串>，时间部分用作列表接口的 Last-Modified"""
+    return f'{int(time.time() * 1000)}.{uuid.uuid4().hex}'
+
+
+def token_time(token):
+    """令牌对应的换代时间（UTC）；从未换代过时为 None"""
+    millis = token.split('.', 1)[0]
+    if not millis.isdigit() or millis == '0':
+        return None
+    return datetime.fromtimestamp(int(millis) / 1000, timezone.utc).replace(tzinfo=None)
+
+
+class FileGenerations:
+    """每个命名空间一个文件，内容为代次令牌；换代即原子地替换文件"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def _path(self, namespace):
+        return os.path.join(self.folder, namespace)
+
+    def get(self, namespaces):
+        tokens = []
+        for namespace in namespaces:
+            try:
+                with open(self._path(namespace)) as f:
+                    tokens.append(f.read())
+            except FileNotFoundError:
+                tokens.append('0')
+        return tokens
+
+    def bump(self, namespaces):
+        os.makedirs(self.folder, exist_ok=True)
+        for namespace in namespaces:
+            tmp = f'{self._path(namespace)}.{uuid.uuid4().hex}'
+            with open(tmp, 'w') as f:
+                f.write(new_token())
+            os.replace(tmp, self._path(namespace))
+
+
+class RedisGenerations:
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, namespaces):
+        values = self.client.mget([f'{self.prefix}gen:{namespace}' for namespace in namespaces])
+        return [value.decode() if value else '0' for value in values]
+
+    def bump(self, namespaces):
+        pipe = self.client.pipeline()
+        for namespace in namespaces:
+            pipe.set(f'{self.prefix}gen:{namespace}', new_token())
+        pipe.execute()
+
+
+class ResponseCache:
+    def __init__(self):
+        self.local = TTLCache(maxsize=512, ttl=300)
+        self.shared = None
+        self.generations = None
+        self.prefix = 'resp:'
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self._lock:
+            self.counters = {'localHits': 0, 'sharedHits': 0, 'misses': 0, 'invalidations': 0}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def lookup(self, key):
+        entry = self.local.get(key)
+        if entry is not None:
+            self.count('localHits')
+            return entry
+        if self.shared is not None:
+            data = self.shared.get(self.prefix + key)
+            if data is not None:
+                entry = pickle.loads(data)
+                self.local.put(key, entry)
+                self.count('sharedHits')
+                return entry
+        self.count('misses')
+        return None
+
+    def store(self, key, entry, ttl=None):
+        self.local.put(key, entry, ttl)
+        if self.shared is not None:
+            self.shared.set(self.prefix + key, pickle.dumps(entry), ex=int(ttl or self.local.ttl) or 1)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters['localHits'] + counters['sharedHits'] + counters['misses']
+        counters['hitRatio'] = round((lookups - counters['misses']) / lookups, 4) if lookups else 0.0
+        counters['localEntries'] = len(self.local)
+        counters['shared'] = self.shared is not None
+        return counters
+
+
+cache = ResponseCache()
+
+
+def init_app(app):
+    cache.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+    cache.local = TTLCache(maxsize=app.config.get('RESPONSE_CACHE_SIZE', 512),
+                           ttl=app.config.get('RESPONSE_CACHE_TTL', 300))
+    cache.reset_counters()
+    redis_url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+    if redis_url:
+        if redis is None:
+            raise RuntimeError('RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed')
+        cache.shared = redis.Redis.from_url(redis_url)
+        cache.generations = RedisGenerations(cache.shared, cache.prefix)
+    else:
+        cache.shared = None
+        folder = app.config.get('RESPONSE_CACHE_DIR', 'instance/response_cache')
+        cache.generations = FileGenerations(os.path.join(app.config['BASE_DIR'], folder))
+
+
+def invalidate(*namespaces):
+    """在当前事务中登记失效；提交后才换代，回滚则什么也不做"""
+    db.session.info.setdefault('response_cache_invalidate', set()).update(namespaces)
+
+
+def generation(namespace):
+    """命名空间当前的代次令牌（同一请求内只读取一次）"""
+    generations = g.setdefault('cache_generations', {})
+    if namespace not in generations:
+        generations[namespace] = cache.generations.get([namespace])[0]
+    return generations[namespace]
+
+
+def request_signature(user):
+    """接口 + 角色 + 用户 id + 查询参数，用于缓存键与 ETag"""
+    args = sorted((k, v) for k, v in request.args.items(multi=True) if k not in IGNORED_ARGS)
+    query = '&'.join(f'{k}={v}' for k, v in args)
+    if user is None:
+        return f'{request.endpoint}:anonymous::{query}'
+    return f'{request.endpoint}:{user.role}:{user.id}:{query}'
+
+
+def cache_key(namespace, user):
+    return f'{namespace}:{generation(namespace)}:{request_signature(user)}'
+
+
+def cached_response(namespace):
+    """缓存 GET 接口的 200 响应体；未登录的请求不缓存"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user = get_current_user()
+            if not cache.enabled or user is None:
+                return view(*args, **kwargs)
+
+            key = cache_key(namespace, user)
+            entry = cache.lookup(key)
+            if entry is not None:
+                body, mimetype, headers = entry
+                response = Response(body, mimetype=mimetype, headers=headers)
+                # 命中缓存时同样按 ETag/Last-Modified 回答 304
+                return response.make_conditional(request.environ)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                ttl = None
+                if g.get('replica_engine') is not None:
+                    ttl = current_app.config.get('DB_REPLICA_MAX_LAG', 5)
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name in CACHED_HEADERS]
+                cache.store(key, (response.get_data(), response.mimetype, headers), ttl)
+            return response
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    namespaces = session.info.pop('response_cache_invalidate', None)
+    if namespaces and cache.generations is not None:
+        cache.generations.bump(sorted(namespaces))
+        cache.count('invalidations', len(namespaces))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('response_cache_invalidate', None)
@@ -0,0 +1,321 @@
+"""花名册批量导入：用户与课题
+
+花名册为 CSV（UTF-8 或 Excel 默认保存的 GBK 编码）或 XLSX（需要 openpyxl），第一行为表头，每行一个用户：
+- username（学号/工号）、name（姓名）、role（student/teacher/admin，也可写 学生/教师/教科办）必填；
+- 可选 department（院系）；学生行可选 project（课题名称）与 teacher（指导教师工号），为还没有课题的学生建立课题。
+列名不区分大小写，也可以用中文（学号、工号、姓名、角色、院系、课题、指导教师）。
+
+文件流式读取，每 ROSTER_BATCH_SIZE 行一个事务（内存中只保留已读到的用户名，用于发现重复行）：
+- 本批用户名一次 IN 查询，已存在的用户跳过（不修改）；新用户一次 executemany 插入；
+- 学生与指导教师的 id、已有课题各一次 IN 查询解析，课题一次 executemany 插入；
+  指导教师出现在后面批次中的课题暂存起来，读完文件后再解析一次。
+某一行有错误（缺少字段、角色无效、指导教师不存在等）时记录行号与原因，不影响其他行。
+"""
+import codecs
+import csv
+import io
+import os
+import time
+import zipfile
+from flask import current_app
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import User, Project
+from app import response_cache
+
+try:
+    import openpyxl
+except ImportError:  # 可选依赖，仅导入 .xlsx 时需要
+    openpyxl = None
+
+# 字段 -> 可用的列名（小写）
+HEADERS = {
+    'username': ('username', '学号', '工号', '学号/工号', '账号'),
+    'name': ('name', '姓名'),
+    'role': ('role', '角色'),
+    'department': ('department', '院系', '学院', '部门'),
+    'project': ('project', 'title', '课题', '课题名称'),
+    'teacher': ('teacher', 'teacher_username', '指导教师', '指导教师工号', '教师工号'),
+}
+REQUIRED = ('username', 'name', 'role')
+ROLES = {
+    'student': 'student', '学生': 'student',
+    'teacher': 'teacher', '教师': 'teacher', '老师': 'teacher',
+    'admin': 'admin', '教科办': 'admin', '管理员': 'admin',
+}
+EXTENSIONS = ('.csv', '.xlsx')
+# 报告中最多列出的错误行数（总数见 errorCount）
+ERROR_LIMIT = 1000
+
+
+class RosterError(ValueError):
+    """文件本身无法导入（格式不支持、缺少必填列等）"""
+
+
+class Report:
+    """导入结果：各类计数、出错的行与吞吐量"""
+
+    def __init__(self):
+        self.rows = 0
+        self.users_created = 0
+        self.users_existing = 0
+        self.projects_created = 0
+        self.projects_existing = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < ERROR_LIMIT:
+            self.errors.append({'row': line, 'error': message})
+
+    @property
+    def seconds(self):
+        return time.monotonic() - self.started
+
+    def to_dict(self):
+        seconds = self.seconds
+        return {
+            'rows': self.rows,
+            'usersCreated': self.users_created,
+            'usersExisting': self.users_existing,
+            'projectsCreated': self.projects_created,
+            'projectsExisting': self.projects_existing,
+            'errorCount': self.error_count,
+            'errors': sorted(self.errors, key=lambda item: item['row']),
+            'seconds': round(seconds, 3),
+            'rowsPerSecond': round(self.rows / seconds) if seconds > 0 else None,
+        }
+
+
+def _cell(value):
+    # Excel 中的学号/工号常被存为数字
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _csv_encoding(stream):
+    """根据文件开头判断编码：能按 UTF-8 解码则为 UTF-8（去掉 BOM），否则按 GB18030（兼容 GBK）"""
+    sample = stream.read(64 * 1024)
+    stream.seek(0)
+    try:
+        # 样本末尾可能截断多字节字符，按增量方式解码
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+
+def _decode_errors(rows):
+    try:
+        yield from rows
+    except UnicodeDecodeError:
+        raise RosterError('无法识别 CSV 文件的编码，请另存为 UTF-8 编码后导入')
+
+
+def read_rows(stream, filename):
+    """逐行读取花名册（可 seek 的二进制文件对象），返回行的迭代器，每行为单元格字符串列表"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.csv':
+        text = io.TextIOWrapper(stream, encoding=_csv_encoding(stream), newline='')
+        return _decode_errors([_cell(value) for value in row] for row in csv.reader(text))
+    if ext == '.xlsx':
+        if openpyxl is None:
+            raise RosterError('导入 .xlsx 需要安装 openpyxl，或另存为 CSV 后导入')
+        try:
+            # 只读模式按行解析工作表，不把整个文件载入内存
+            workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            raise RosterError(f'无法读取 .xlsx 文件: {e}')
+        return ([_cell(value) for value in row] for row in workbook.active.iter_rows(values_only=True))
+    raise RosterError(f"不支持的文件类型，仅支持 {'/'.join(EXTENSIONS)}")
+
+
+def _columns(header):
+    """表头 -> {字段: 列序号}"""
+    names = {alias: field for field, aliases in HEADERS.items() for alias in aliases}
+    columns = {}
+    for index, title in enumerate(header):
+        field = names.get(title.lower())
+        if field and field not in columns:
+            columns[field] = index
+    missing = [field for field in REQUIRED if field not in columns]
+    if missing:
+        raise RosterError(f"缺少必填列: {', '.join(missing)}")
+    return columns
+
+
+def _parse(line, row, columns, report):
+    """行 -> 字段字典；有错误时记录并返回 None"""
+    record = {field: row[index] if index < len(row) else '' for field, index in columns.items()}
+    for field in REQUIRED:
+        if not record[field]:
+            report.error(line, f'缺少 {field}')
+            return None
+    role = ROLES.get(record['role'].lower())
+    if role is None:
+        report.error(line, f"角色无效: {record['role']}")
+        return None
+    record['role'] = role
+    if len(record['username']) > 64 or len(record['name']) > 64 or len(record.get('department') or '') > 64:
+        report.error(line, '学号/工号、姓名或院系超过 64 个字符')
+        return None
+    if record.get('project') and role != 'student':
+        report.error(line, '只有学生行可以填写课题')
+        return None
+    if len(record.get('project') or '') > 200:
+        report.error(line, '课题名称超过 200 个字符')
+        return None
+    return record
+
+
+def _lookup_users(usernames):
+    """{用户名: (id, 角色)}，一次 IN 查询"""
+    if not usernames:
+        return {}
+    rows = db.session.execute(
+        select(User.username, User.id, User.role).where(User.username.in_(usernames))
+    )
+    return {username: (user_id, role) for username, user_id, role in rows}
+
+
+def _insert_users(batch, report):
+    """插入本批的新用户；返回 {用户名: (id, 角色)}（含已存在的用户），角色不符的行从 batch 中去掉"""
+    existing = _lookup_users({record['username'] for _, record in batch})
+    new_rows = []
+    kept = []
+    for line, record in batch:
+        found = existing.get(record['username'])
+        if found is None:
+            new_rows.append({'username': record['username'], 'name': record['name'], 'role': record['role'],
+                             'department': record.get('department') or None})
+        elif found[1] != record['role']:
+            report.error(line, f"用户 {record['username']} 已存在且角色为 {found[1]}")
+            continue
+        else:
+            report.users_existing += 1
+        kept.append((line, record))
+    batch[:] = kept
+    if new_rows:
+        db.session.execute(insert(User), new_rows)
+        report.users_created += len(new_rows)
+        existing.update(_lookup_users({row['username'] for row in new_rows}))
+    return existing
+
+
+def _insert_projects(pending, report, final=False):
+    """为学生建立课题。pending 为 (行号, 学生 id, 课题, 指导教师工号)；
+    返回指导教师尚不存在、需要稍后再解析的项（final 为 True 时记为错误）"""
+    if not pending:
+        return []
+    teachers = _lookup_users({teacher for _, _, _, teacher in pending if teacher})
+    has_project = set(db.session.scalars(
+        select(Project.student_id).where(Project.student_id.in_({student_id for _, student_id, _, _ in pending}))
+    ))
+    rows = []
+    deferred = []
+    for line, student_id, title, teacher in pending:
+        teacher_id = None
+        if teacher:
+            found = teachers.get(teacher)
+            if found is None:
+                if final:
+                    report.error(line, f'指导教师不存在: {teacher}')
+                else:
+                    deferred.append((line, student_id, title, teacher))
+                continue
+            if found[1] != 'teacher':
+                report.error(line, f'{teacher} 不是教师')
+                continue
+            teacher_id = found[0]
+        if student_id in has_project:
+            report.projects_existing += 1
+            continue
+        # 同一批中同一学生只建立一个课题
+        has_project.add(student_id)
+        rows.append({'title': title, 'student_id': student_id, 'teacher_id': teacher_id})
+    if rows:
+        db.session.execute(insert(Project), rows)
+        report.projects_created += len(rows)
+    return deferred
+
+
+def _import_batch(batch, report, deferred):
+    users = _insert_users(batch, report)
+    pending = [
+        (line, users[record['username']][0], record['project'], record.get('teacher') or None)
+        for line, record in batch if record.get('project')
+    ]
+    deferred.extend(_insert_projects(pending, report))
+
+
+def _commit_batch(batch, report, deferred):
+    """在一个事务中导入一批；并发导入撞上唯一约束时回滚并重试一次（重试时已存在的用户被跳过）"""
+    for attempt in range(2):
+        saved = list(batch), dict(vars(report), errors=list(report.errors)), len(deferred)
+        created = report.projects_created
+        try:
+            _import_batch(batch, report, deferred)
+            if report.projects_created > created:
+                # 学生有了课题后任务书等接口的结果随之变化
+                response_cache.invalidate('task')
+            db.session.commit()
+            return
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+            batch[:], counters, size = saved
+            vars(report).update(counters)
+            del deferred[size:]
+
+
+def import_roster(rows, batch_size=None, progress=None):
+    """导入花名册行（第一行为表头），返回 Report；progress(report) 在每批提交后调用"""
+    batch_size = batch_size or current_app.config.get('ROSTER_BATCH_SIZE', 1000)
+    report = Report()
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise RosterError('文件为空')
+    columns = _columns(header)
+
+    seen = set()
+    batch = []
+    deferred = []
+    # 表头为第 1 行
+    for line, row in enumerate(rows, start=2):
+        if not any(row):
+            continue
+        report.rows += 1
+        record = _parse(line, row, columns, report)
+        if record is None:
+            continue
+        if record['username'] in seen:
+            report.error(line, f"用户名重复: {record['username']}")
+            continue
+        seen.add(record['username'])
+        batch.append((line, record))
+        if len(batch) >= batch_size:
+            _commit_batch(batch, report, deferred)
+            batch = []
+            if progress:
+                progress(report)
+    if batch:
+        _commit_batch(batch, report, deferred)
+
+    # 指导教师出现在学生之后的批次中
+    for start in range(0, len(deferred), batch_size):
+        created = report.projects_created
+        _insert_projects(deferred[start:start + batch_size], report, final=True)
+        if report.projects_created > created:
+            response_cache.invalidate('task')
+        db.session.commit()
+    if progress:
+        progress(report)
+    return report
@@ -0,0 +1,328 @@
+"""指导记录与论文的全文检索（本地倒排索引，SQLite/MySQL 通用）
+
+索引：
+- 分词：NFKC 规范化并转小写后，英文/数字按连续字母数字取词，中文取相邻两字（二元组），
+  每段中文的最后一个字另记一个单字词，单字查询因此也能命中；
+- search_postings 表保存 (文档类型, 词, 文档 id, 加权词频)，主键 (类型, 词, id) 即倒排表的索引，
+  单字查询的前缀匹配也是一次范围扫描；
+- 写接口调用 index(obj) / remove(doc_type, ids)，提交事务前重建这些文档的索引，
+  与业务修改同时提交或同时回滚；已有数据用 flask search reindex 分批重建。
+
+查询：所有查询词都必须出现（AND），按 BM25 的 idf 与词频饱和度打分（不做长度归一化）：
+- 可见文档很少的角色（学生、教师）先取出可见文档 id，只读取这些文档的倒排记录；
+- 其他情况按文档频率从低到高求交集：最稀有的词给出候选集，后续词在候选集较小时
+  按 id 分批读取、较大时读取整个倒排表后求交；候选集超过 SEARCH_MAX_CANDIDATES 时截断；
+- 排序后按顺序分批检查可见性，凑满一页即停止。
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from flask import current_app
+from sqlalchemy import event, select, delete, insert, func, and_
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import GuidanceRecord, Paper, SearchPosting
+
+# 文档类型 -> (模型, ((字段, 权重), ...))
+DOC_TYPES = {
+    'guidance': (GuidanceRecord, (('content', 1), ('teacher_comment', 1))),
+    'paper': (Paper, (('title', 3), ('abstract', 1), ('review_comment', 1))),
+}
+MAX_TERM_LENGTH = 32
+# 查询最多使用的词数
+MAX_QUERY_TERMS = 16
+# 按 id 分批查询时每批的数量
+ID_BATCH = 500
+# BM25 词频饱和参数
+K1 = 1.2
+
+_TOKEN_RE = re.compile(r'[0-9a-z]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+def normalize(text):
+    """与分词相同的规范化：NFKC 后转小写"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def _runs(text):
+    return (match.group() for match in _TOKEN_RE.finditer(normalize(text)))
+
+
+def tokenize(text):
+    """文本 -> 词项序列（含重复）"""
+    for run in _runs(text):
+        if run.isascii():
+            yield run[:MAX_TERM_LENGTH]
+            continue
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+        yield run[-1]
+
+
+def query_terms(text):
+    """查询 -> 去重后的查询词；单个汉字作为前缀匹配（命中以该字开头的二元组与单字词）"""
+    terms = []
+    for run in _runs(text):
+        if run.isascii() or len(run) == 1:
+            candidates = [run[:MAX_TERM_LENGTH]]
+        else:
+            candidates = [run[i:i + 2] for i in range(len(run) - 1)]
+        for term in candidates:
+            if term not in terms:
+                terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _term_condition(term):
+    if len(term) == 1 and not term.isascii():
+        return and_(SearchPosting.term >= term, SearchPosting.term < chr(ord(term) + 1))
+    return SearchPosting.term == term
+
+
+def postings_for(doc_type, obj):
+    """文档 -> {词: 加权词频}"""
+    counts = Counter()
+    for field, weight in DOC_TYPES[doc_type][1]:
+        for term in tokenize(getattr(obj, field)):
+            counts[term] += weight
+    return counts
+
+
+def doc_type_of(obj):
+    for doc_type, (model, _) in DOC_TYPES.items():
+        if isinstance(obj, model):
+            return doc_type
+    raise TypeError(f'{type(obj).__name__} is not searchable')
+
+
+# ---- 增量维护 ----
+
+def index(obj):
+    """登记新增或修改的文档；提交事务前重建其索引"""
+    db.session.info.setdefault('search_index', {})[id(obj)] = obj
+
+
+def remove(doc_type, ids):
+    """登记删除的文档（批量删除不经过 ORM 对象时使用）"""
+    db.session.info.setdefault('search_remove', set()).update((doc_type, doc_id) for doc_id in ids)
+
+
+def _delete_postings(session, doc_type, ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_BATCH):
+        session.execute(delete(SearchPosting).where(
+            SearchPosting.doc_type == doc_type, SearchPosting.doc_id.in_(ids[start:start + ID_BATCH])
+        ))
+
+
+def _write_postings(session, docs):
+    """docs 为 (类型, 对象) 列表：删除旧索引后一次 executemany 写入新索引"""
+    rows = []
+    by_type = {}
+    for doc_type, obj in docs:
+        by_type.setdefault(doc_type, []).append(obj.id)
+        rows.extend({'term': term, 'doc_type': doc_type, 'doc_id': obj.id, 'tf': tf}
+                    for term, tf in postings_for(doc_type, obj).items())
+    for doc_type, ids in by_type.items():
+        _delete_postings(session, doc_type, ids)
+    if rows:
+        session.execute(insert(SearchPosting), rows)
+
+
+@event.listens_for(Session, 'before_commit')
+def _sync_index(session):
+    pending = session.info.pop('search_index', None)
+    removed = session.info.pop('search_remove', None)
+    if not pending and not removed:
+        return
+    # 新增的文档需要先 flush 才有 id
+    session.flush()
+    docs = []
+    for obj in (pending or {}).values():
+        doc_type = doc_type_of(obj)
+        if obj in session.deleted or obj.id is None:
+            removed = (removed or set()) | {(doc_type, obj.id)}
+        else:
+            docs.append((doc_type, obj))
+    by_type = {}
+    for doc_type, doc_id in removed or ():
+        if doc_id is not None:
+            by_type.setdefault(doc_type, set()).add(doc_id)
+    for doc_type, ids in by_type.items():
+        _delete_postings(session, doc_type, ids)
+    _write_postings(session, docs)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('search_index', None)
+    session.info.pop('search_remove', None)
+
+
+def rebuild(batch_size=500):
+    """清空并分批重建全部索引（每批一个事务），返回建立索引的文档数"""
+    total = 0
+    for doc_type, (model, _) in DOC_TYPES.items():
+        db.session.execute(delete(SearchPosting).where(SearchPosting.doc_type == doc_type))
+        db.session.commit()
+        last_id = 0
+        while True:
+            batch = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not batch:
+                break
+            _write_postings(db.session, [(doc_type, obj) for obj in batch])
+            last_id = batch[-1].id
+            total += len(batch)
+            db.session.commit()
+            # 释放已处理的对象，内存占用与总文档数无关
+            db.session.expunge_all()
+    return total
+
+
+# ---- 查询 ----
+
+def _document_frequencies(terms, doc_types, cap):
+    """{(词, 类型): 文档频率}，最多数到 cap（更常见的词只需知道它很常见，不必数完整个倒排表）；
+    前缀词为各词之和（偏大，只用于排序与打分）"""
+    frequencies = {}
+    for term in terms:
+        for doc_type in doc_types:
+            capped = select(SearchPosting.doc_id).where(
+                _term_condition(term), SearchPosting.doc_type == doc_type).limit(cap).subquery()
+            frequencies[(term, doc_type)] = db.session.execute(select(func.count()).select_from(capped)).scalar()
+    return frequencies
+
+
+def _read_postings(term, doc_type, ids=None, limit=None):
+    """{文档 id: 词频}；ids 不为空时只读取这些文档"""
+    base = select(SearchPosting.doc_id, SearchPosting.tf).where(
+        _term_condition(term), SearchPosting.doc_type == doc_type)
+    result = Counter()
+    if ids is None:
+        query = base.limit(limit) if limit else base
+        for doc_id, tf in db.session.execute(query):
+            result[doc_id] += tf
+        return result
+    ids = list(ids)
+    for start in range(0, len(ids), ID_BATCH):
+        for doc_id, tf in db.session.execute(base.where(SearchPosting.doc_id.in_(ids[start:start + ID_BATCH]))):
+            result[doc_id] += tf
+    return result
+
+
+def _candidates(terms, doc_type, frequencies, visible_ids, max_candidates):
+    """所有词都出现的文档 -> {id: {词: 词频}}，以及是否因候选过多被截断"""
+    ordered = sorted(terms, key=lambda term: frequencies[(term, doc_type)])
+    truncated = False
+    matches = None
+    for term in ordered:
+        if visible_ids is not None:
+            postings = _read_postings(term, doc_type, visible_ids if matches is None else matches.keys())
+        elif matches is None:
+            postings = _read_postings(term, doc_type, limit=max_candidates)
+            truncated = len(postings) >= max_candidates
+        elif frequencies[(term, doc_type)] <= 4 * len(matches) or len(matches) > 10 * ID_BATCH:
+            postings = _read_postings(term, doc_type)
+        else:
+            postings = _read_postings(term, doc_type, matches.keys())
+
+        if matches is None:
+            matches = {doc_id: {term: tf} for doc_id, tf in postings.items()}
+        else:
+            matches = {doc_id: {**found, term: postings[doc_id]}
+                       for doc_id, found in matches.items() if doc_id in postings}
+        if not matches:
+            break
+    return matches or {}, truncated
+
+
+def search(text, scopes, offset=0, limit=20):
+    """检索并返回 (命中列表, 下一页的 offset 或 None, 是否截断)
+
+    scopes 为 {文档类型: (可见文档 id 查询, 是否先枚举可见文档)}，
+    可见文档 id 查询为只选择模型 id 的 Query，按角色过滤；命中为 (类型, id, 得分)。
+    """
+    terms = query_terms(text)
+    if not terms:
+        return [], None, False
+    max_candidates = current_app.config.get('SEARCH_MAX_CANDIDATES', 20000)
+    frequencies = _document_frequencies(terms, list(scopes), max_candidates)
+
+    scored = []
+    truncated = False
+    for doc_type, (visible, enumerate_visible) in scopes.items():
+        if any(frequencies[(term, doc_type)] == 0 for term in terms):
+            continue
+        model = DOC_TYPES[doc_type][0]
+        visible_ids = {doc_id for doc_id, in visible} if enumerate_visible else None
+        if visible_ids is not None and not visible_ids:
+            continue
+        matches, cut = _candidates(terms, doc_type, frequencies, visible_ids, max_candidates)
+        truncated = truncated or cut
+        total = db.session.execute(select(func.count(model.id))).scalar() or 1
+        idf = {term: math.log(1 + (total - frequencies[(term, doc_type)] + 0.5) / (frequencies[(term, doc_type)] + 0.5))
+               for term in terms}
+        for doc_id, found in matches.items():
+            score = sum(idf[term] * tf * (K1 + 1) / (tf + K1) for term, tf in found.items())
+            scored.append((score, doc_type, doc_id, enumerate_visible))
+
+    scored.sort(key=lambda hit: (-hit[0], hit[1], -hit[2]))
+
+    # 按排序顺序检查可见性（已枚举可见文档的类型无需再查），凑满一页即停止
+    hits = []
+    position = offset
+    while position < len(scored) and len(hits) <= limit:
+        chunk = scored[position:position + ID_BATCH]
+        unchecked = {}
+        for _, doc_type, doc_id, checked in chunk:
+            if not checked:
+                unchecked.setdefault(doc_type, []).append(doc_id)
+        allowed = set()
+        for doc_type, ids in unchecked.items():
+            model = DOC_TYPES[doc_type][0]
+            allowed.update((doc_type, doc_id) for doc_id, in scopes[doc_type][0].filter(model.id.in_(ids)))
+        for score, doc_type, doc_id, checked in chunk:
+            position += 1
+            if checked or (doc_type, doc_id) in allowed:
+                hits.append((doc_type, doc_id, score))
+                if len(hits) > limit:
+                    break
+    next_offset = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        # 下一页从多取的那一条开始
+        next_offset = position - 1
+    return hits, next_offset, truncated
+
+
+def _normalize_with_offsets(text):
+    """规范化后的文本，以及其中每个字符在原文中的位置
+
+    规范化可能改变长度（如 ㍿ -> 株式会社、全角组合字符合并），查询词在规范化文本中的位置
+    需经此换算后才能截取原文。基本字符与其后的组合字符一起规范化。
+    """
+    parts = []
+    offsets = []
+    i = 0
+    while i < len(text):
+        j = i + 1
+        while j < len(text) and unicodedata.combining(text[j]):
+            j += 1
+        part = normalize(text[i:j])
+        parts.append(part)
+        offsets.extend([i] * len(part))
+        i = j
+    return ''.join(parts), offsets
+
+
+def snippet(text, terms, width=80):
+    """截取第一个查询词附近的一段文本"""
+    if not text:
+        return ''
+    normalized, offsets = _normalize_with_offsets(text)
+    found = [i for i in (normalized.find(term) for term in terms) if i >= 0]
+    start = offsets[min(found)] if found else 0
+    start = max(start - width // 4, 0)
+    piece = text[start:start + width]
+    return ('…' if start > 0 else '') + piece + ('…' if start + width < len(text) else '')
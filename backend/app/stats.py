@@ -0,0 +1,265 @@
+"""统计计数：任务书、指导记录、论文按状态与指导教师的数量
+
+- stat_counters 表每个 (指标, 指导教师, 取值) 一行；全部、按教师、按院系的统计都由这张表汇总，
+  仪表盘一次查询即可得到，不再读取明细；
+- flush 前根据 ORM 对象的新增、修改（属性历史中的旧值）与删除计算增量，提交事务前写入，
+  与业务修改同时提交或同时回滚；不经过 ORM 对象的批量删除需在删除前调用 removed(model, ids)；
+- 指导教师由课题（论文为学生的课题）确定，院系取教师的 users.department，查询时再汇总，
+  教师调整院系无需更新计数；
+- 增量基于读取时的旧值，修改计数相关列的接口需先调用 db_utils.begin_write() 并加行锁读取记录，
+  并发修改同一行时依次执行，不会重复加减；
+- 课题更换指导教师、论文的作者后来才有课题，或直接修改数据库之后，运行 flask stats rebuild 重新计算。
+"""
+from collections import Counter
+from sqlalchemy import event, select, update, insert, delete, inspect
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import GuidanceRecord, Paper, TaskDocument, Project, User, StatCounter
+
+# 没有指导教师（或没有课题）的记录
+UNASSIGNED = 0
+# 取值为空时的 bucket
+NONE = 'none'
+# 按 id 分批查询时每批的数量
+ID_BATCH = 500
+
+
+def _flag(value):
+    return '1' if value == 1 else '0'
+
+
+def _review_state(values):
+    """与前端审核列表的显示一致：已通过 / 待审核（含退回后重新提交）/ 已退回 / 未提交"""
+    if values['admin_status'] == 'approved':
+        return 'approved'
+    if values['teacher_submitted'] == 1:
+        return 'pending'
+    if values['admin_status'] == 'returned':
+        return 'returned'
+    return 'draft'
+
+
+def _task_buckets(values):
+    return [
+        ('task.review', _review_state(values)),
+        ('task.adminStatus', values['admin_status'] or NONE),
+        ('task.studentSubmitted', _flag(values['student_submitted'])),
+        ('task.teacherSubmitted', _flag(values['teacher_submitted'])),
+    ]
+
+
+def _guidance_buckets(values):
+    # status 的列默认值为 0（草稿）
+    return [('guidance.status', str(values['status'] or 0))]
+
+
+def _paper_buckets(values):
+    return [('paper.reviewStatus', values['review_status'] or NONE)]
+
+
+# 模型 -> (确定指导教师的列, 计数用到的列, 取值 -> [(指标, 取值)])
+TRACKED = {
+    TaskDocument: ('project_id', ('admin_status', 'student_submitted', 'teacher_submitted'), _task_buckets),
+    GuidanceRecord: ('project_id', ('status',), _guidance_buckets),
+    Paper: ('student_id', ('review_status',), _paper_buckets),
+}
+
+# 修改这些列时加载旧值（属性已过期时 SQLAlchemy 默认不保留旧值），用于减去原来的计数
+for _model, (_link, _columns, _) in TRACKED.items():
+    for _column in (_link, *_columns):
+        event.listen(getattr(_model, _column), 'set', lambda target, value, oldvalue, initiator: None,
+                     active_history=True)
+
+
+def _teachers(session, link, keys):
+    """{课题 id 或学生 id: 指导教师 id}；学生有多个课题时取最早的课题"""
+    keys = list({key for key in keys if key is not None})
+    column = Project.id if link == 'project_id' else Project.student_id
+    result = {}
+    for start in range(0, len(keys), ID_BATCH):
+        rows = session.execute(
+            select(column, Project.teacher_id).where(column.in_(keys[start:start + ID_BATCH])).order_by(Project.id)
+        )
+        for key, teacher_id in rows:
+            result.setdefault(key, teacher_id or UNASSIGNED)
+    return result
+
+
+def _add(session, model, changes):
+    """changes 为 (增减, 关联列的值, {列: 值})，解析指导教师后累加到本事务的增量中"""
+    if not changes:
+        return
+    link, _, buckets = TRACKED[model]
+    teachers = _teachers(session, link, [key for _, key, _ in changes])
+    deltas = session.info.setdefault('stat_deltas', Counter())
+    for sign, key, values in changes:
+        teacher_id = teachers.get(key, UNASSIGNED)
+        for metric, bucket in buckets(values):
+            deltas[(metric, teacher_id, bucket[:32])] += sign
+
+
+def _old_values(obj, names):
+    state = inspect(obj)
+    values = {}
+    for name in names:
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if history.deleted else getattr(obj, name)
+    return values
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect(session, flush_context, instances):
+    changes = {}
+    for obj in session.new:
+        if type(obj) in TRACKED:
+            link, columns, _ = TRACKED[type(obj)]
+            changes.setdefault(type(obj), []).append((1, getattr(obj, link), {c: getattr(obj, c) for c in columns}))
+    for obj in session.dirty:
+        if type(obj) not in TRACKED:
+            continue
+        link, columns, _ = TRACKED[type(obj)]
+        state = inspect(obj)
+        if not any(state.attrs[name].history.has_changes() for name in (link, *columns)):
+            continue
+        old = _old_values(obj, (link, *columns))
+        changes.setdefault(type(obj), []).extend([
+            (-1, old.pop(link), old),
+            (1, getattr(obj, link), {c: getattr(obj, c) for c in columns}),
+        ])
+    for obj in session.deleted:
+        if type(obj) in TRACKED:
+            link, columns, _ = TRACKED[type(obj)]
+            old = _old_values(obj, (link, *columns))
+            changes.setdefault(type(obj), []).append((-1, old.pop(link), old))
+    for model, model_changes in changes.items():
+        _add(session, model, model_changes)
+
+
+def removed(model, ids):
+    """批量删除（query.delete）之前调用：在当前事务中减去这些记录的计数（调用前先 begin_write()）"""
+    link, columns, _ = TRACKED[model]
+    ids = list(ids)
+    changes = []
+    for start in range(0, len(ids), ID_BATCH):
+        # 加锁后再读取：同时删除同一批记录的请求只有先执行的一个减去计数
+        rows = db.session.execute(
+            select(getattr(model, link), *[getattr(model, c) for c in columns])
+            .where(model.id.in_(ids[start:start + ID_BATCH])).order_by(model.id).with_for_update()
+        )
+        changes.extend((-1, row[0], dict(zip(columns, row[1:]))) for row in rows)
+    _add(db.session, model, changes)
+
+
+def _upsert_statement(dialect):
+    """插入计数行，已存在时累加（一条语句，没有先查后插的并发问题）；不支持的数据库返回 None"""
+    key = ['metric', 'teacher_id', 'bucket']
+    if dialect == 'mysql':
+        statement = mysql_insert(StatCounter)
+        return statement.on_duplicate_key_update(value=StatCounter.value + statement.inserted.value)
+    if dialect == 'sqlite':
+        statement = sqlite_insert(StatCounter)
+        return statement.on_conflict_do_update(index_elements=key,
+                                               set_={'value': StatCounter.value + statement.excluded.value})
+    return None
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply(session):
+    # 提交前的最后一次 flush 也会产生增量
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    deltas = session.info.pop('stat_deltas', None)
+    if not deltas:
+        return
+    # 按主键顺序写入，并发事务以相同顺序加行锁，避免死锁
+    rows = [{'metric': metric, 'teacher_id': teacher_id, 'bucket': bucket, 'value': delta}
+            for (metric, teacher_id, bucket), delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    statement = _upsert_statement(db.engine.dialect.name)
+    if statement is not None:
+        session.execute(statement, rows)
+        return
+    for row in rows:
+        key = (StatCounter.metric == row['metric'], StatCounter.teacher_id == row['teacher_id'],
+               StatCounter.bucket == row['bucket'])
+        if not session.execute(update(StatCounter).where(*key).values(value=StatCounter.value + row['value'])).rowcount:
+            session.execute(insert(StatCounter).values(**row))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('stat_deltas', None)
+
+
+def rebuild(batch_size=1000):
+    """按明细重新计算全部计数（在一个事务中替换），返回统计的记录数
+
+    计算期间其他请求的增量会被覆盖，应在写入较少时运行。
+    """
+    counts = Counter()
+    total = 0
+    for model, (link, columns, buckets) in TRACKED.items():
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(model.id, getattr(model, link), *[getattr(model, c) for c in columns])
+                .where(model.id > last_id).order_by(model.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            total += len(rows)
+            teachers = _teachers(db.session, link, [row[1] for row in rows])
+            for row in rows:
+                teacher_id = teachers.get(row[1], UNASSIGNED)
+                for metric, bucket in buckets(dict(zip(columns, row[2:]))):
+                    counts[(metric, teacher_id, bucket[:32])] += 1
+    db.session.info.pop('stat_deltas', None)
+    db.session.execute(delete(StatCounter))
+    if counts:
+        db.session.execute(insert(StatCounter), [
+            {'metric': metric, 'teacher_id': teacher_id, 'bucket': bucket, 'value': value}
+            for (metric, teacher_id, bucket), value in counts.items()
+        ])
+    db.session.commit()
+    return total
+
+
+def _put(counts, metric, bucket, value):
+    """'task.adminStatus' -> counts['task']['adminStatus'][bucket]"""
+    kind, name = metric.split('.', 1)
+    target = counts.setdefault(kind, {}).setdefault(name, {})
+    target[bucket] = target.get(bucket, 0) + value
+
+
+def summary(teacher_id=None):
+    """汇总计数（一次查询）：全部、按指导教师、按院系；teacher_id 不为空时只统计该教师"""
+    query = select(
+        StatCounter.metric, StatCounter.teacher_id, StatCounter.bucket, StatCounter.value,
+        User.name, User.department
+    ).outerjoin(User, User.id == StatCounter.teacher_id).where(StatCounter.value != 0)
+    if teacher_id is not None:
+        query = query.where(StatCounter.teacher_id == teacher_id)
+
+    totals = {}
+    teachers = {}
+    departments = {}
+    for metric, row_teacher_id, bucket, value, name, department in db.session.execute(query):
+        _put(totals, metric, bucket, value)
+        teacher = teachers.setdefault(row_teacher_id, {
+            'teacherId': row_teacher_id or None,
+            'teacherName': name if row_teacher_id else '未分配',
+            'department': department,
+            'counts': {},
+        })
+        _put(teacher['counts'], metric, bucket, value)
+        group = departments.setdefault(department, {'department': department, 'counts': {}})
+        _put(group['counts'], metric, bucket, value)
+    return {
+        'totals': totals,
+        'teachers': sorted(teachers.values(), key=lambda t: (t['teacherId'] is None, t['teacherId'] or 0)),
+        'departments': sorted(departments.values(), key=lambda d: (d['department'] is None, d['department'] or '')),
+    }
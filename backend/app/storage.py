@@ -0,0 +1,272 @@
+"""内容寻址的上传文件存储
+
+文件按内容的 SHA-256 摘要命名，分两级目录存放：
+    uploads/task/ab/cd/<digest>
+数据库中保存的引用路径为：
+    uploads/task/ab/cd/<digest>_<原文件名>
+与旧格式 "<uuid>_<原文件名>" 一致，前端和下载接口仍按第一个下划线之后取原文件名。
+
+相同内容只保存一份，stored_files 表记录每个文件的引用计数：
+- put_stream()/put_file() 在当前事务中增加引用；
+- release() 在当前事务中减少引用，并在同一事务中加入后台任务（app/jobs.py），
+  提交后由 worker 删除计数归零的文件；删除失败时按退避策略重试。
+旧格式的路径（没有摘要）仍可读取，release() 时同样由后台任务直接删除。
+"""
+import hashlib
+import os
+import re
+import uuid
+from urllib.parse import quote
+from flask import current_app, has_app_context, request
+from werkzeug.utils import send_file as _send_file
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import StoredFile
+from app import jobs
+
+# 内容寻址文件的根目录（相对 Config.BASE_DIR）
+BLOB_ROOT = 'uploads/task'
+# 写入过程中的临时文件目录，与根目录同一文件系统，保证 os.replace 为原子操作
+TMP_FOLDER = os.path.join(BLOB_ROOT, '.tmp')
+# 分片上传会话（未完成的文件）目录
+SESSION_FOLDER = os.path.join(BLOB_ROOT, '.sessions')
+# 预览（首页图片、文本摘要，见 app/previews.py），按摘要存放
+PREVIEW_FOLDER = os.path.join(BLOB_ROOT, '.previews')
+PREVIEW_EXTENSIONS = ('png', 'html', 'json')
+# 数据库路径列的长度上限（task_documents.*_path 为 String(255)）
+MAX_REF_LENGTH = 255
+COPY_BUFFER_SIZE = 64 * 1024
+
+_REF_NAME_RE = re.compile(r'^(?P<digest>[0-9a-f]{64})_(?P<name>.+)$')
+
+
+def abspath(path):
+    """把相对路径解析为基于项目 backend 目录的绝对路径"""
+    if os.path.isabs(path):
+        return path
+    base_dir = current_app.config['BASE_DIR'] if has_app_context() else os.getcwd()
+    return os.path.join(base_dir, path)
+
+
+def blob_path(digest):
+    """摘要对应的文件（相对路径）"""
+    return os.path.join(BLOB_ROOT, digest[:2], digest[2:4], digest)
+
+
+def parse_ref(ref):
+    """解析引用路径，返回摘要；旧格式路径返回 None"""
+    match = _REF_NAME_RE.match(os.path.basename(ref or ''))
+    return match.group('digest') if match else None
+
+
+def original_name(ref):
+    """从引用路径中取出原始文件名（去掉第一个下划线之前的摘要或 UUID 前缀）"""
+    filename = os.path.basename(ref)
+    if '_' in filename:
+        filename = filename.split('_', 1)[1]
+    return filename
+
+
+def resolve(ref):
+    """引用路径 -> 磁盘上实际文件的绝对路径"""
+    digest = parse_ref(ref)
+    return abspath(blob_path(digest) if digest else ref)
+
+
+def exists(ref):
+    return bool(ref) and os.path.exists(resolve(ref))
+
+
+def send_file(ref, as_attachment=True):
+    """以下载响应发送存储中的文件
+
+    - ETag：内容寻址文件直接使用摘要作为强 ETag，旧格式文件使用 mtime/大小；
+      配合 Cache-Control: no-cache，浏览器重复预览时只需一次 304 校验；
+    - 直接发送时支持 Range 请求，文件体经 wsgi.file_wrapper 交给服务器
+      （gunicorn 等会使用 sendfile 零拷贝）；
+    - 配置 DOWNLOAD_ACCEL_REDIRECT_PREFIX 时返回 X-Accel-Redirect 交给 nginx 发送，
+      配置 USE_X_SENDFILE 时返回 X-Sendfile；此时 Range 由前端代理处理。
+    """
+    path = resolve(ref)
+    accel_prefix = current_app.config.get('DOWNLOAD_ACCEL_REDIRECT_PREFIX')
+    offload = bool(accel_prefix) or current_app.config.get('USE_X_SENDFILE', False)
+
+    response = _send_file(
+        path,
+        request.environ,
+        download_name=original_name(ref),
+        as_attachment=as_attachment,
+        etag=parse_ref(ref) or True,
+        conditional=not offload,
+        use_x_sendfile=offload,
+        response_class=current_app.response_class
+    )
+
+    if offload:
+        # 只处理 If-None-Match / If-Modified-Since，Range 交给代理
+        response = response.make_conditional(request.environ)
+        sendfile_path = response.headers.pop('X-Sendfile', None)
+        if accel_prefix and sendfile_path and response.status_code != 304:
+            relative = os.path.relpath(path, current_app.config['BASE_DIR']).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(relative)}"
+        elif sendfile_path and response.status_code != 304:
+            response.headers['X-Sendfile'] = sendfile_path
+
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def preview_path(digest, ext):
+    """摘要对应的预览文件（相对路径）"""
+    return os.path.join(PREVIEW_FOLDER, digest[:2], digest[2:4], f'{digest}.{ext}')
+
+
+def ref_prefix(digest):
+    """摘要对应的所有引用路径共同的前缀（文件名之前的部分）"""
+    return os.path.join(BLOB_ROOT, digest[:2], digest[2:4], f'{digest}_')
+
+
+def make_ref(digest, filename):
+    """生成保存到数据库的引用路径，过长时截断文件名主体并保留扩展名"""
+    prefix = ref_prefix(digest)
+    room = MAX_REF_LENGTH - len(prefix)
+    if len(filename) > room:
+        stem, ext = os.path.splitext(filename)
+        filename = stem[:max(room - len(ext), 1)] + ext
+    return prefix + filename
+
+
+def put_stream(stream, filename):
+    """保存可 seek 的文件流（如 Werkzeug 的 FileStorage.stream），返回引用路径
+
+    先只读计算摘要；内容已存在时不再写盘。
+    """
+    sha = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+        sha.update(chunk)
+        size += len(chunk)
+    digest = sha.hexdigest()
+
+    _add_ref(digest, size)
+    if not os.path.exists(abspath(blob_path(digest))):
+        stream.seek(0)
+        tmp_path = _tmp_path()
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+                f.write(chunk)
+        _install(tmp_path, digest)
+    return make_ref(digest, filename)
+
+
+def put_file(path, filename):
+    """把磁盘上已有的文件（如分片上传完成的文件）移入存储，返回引用路径
+
+    内容已存在时直接删除该文件，否则原子地重命名为摘要文件名，不复制数据。
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    _add_ref(digest, os.path.getsize(path))
+    if os.path.exists(abspath(blob_path(digest))):
+        os.remove(path)
+    else:
+        _install(path, digest)
+    return make_ref(digest, filename)
+
+
+def release(ref):
+    """在当前事务中释放一个引用；事务提交后由后台任务删除不再被引用的文件"""
+    if not ref:
+        return
+    digest = parse_ref(ref)
+    if digest is None:
+        # 旧格式路径：没有引用计数，直接删除
+        jobs.enqueue('storage.remove', {'path': ref})
+        return
+    db.session.execute(
+        update(StoredFile)
+        .where(StoredFile.digest == digest, StoredFile.ref_count > 0)
+        .values(ref_count=StoredFile.ref_count - 1)
+    )
+    jobs.enqueue('storage.collect_garbage', {'digest': digest})
+
+
+def _add_ref(digest, size):
+    """在当前事务中为摘要增加一个引用（不存在则新建记录）
+
+    用一条 upsert 语句完成：同时上传相同的新内容时，先查后插会让后一个请求撞上主键冲突。
+    """
+    values = {'digest': digest, 'size': size, 'ref_count': 1}
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        statement = mysql_insert(StoredFile).values(**values)
+        db.session.execute(statement.on_duplicate_key_update(ref_count=StoredFile.ref_count + 1))
+        return
+    if dialect == 'sqlite':
+        statement = sqlite_insert(StoredFile).values(**values)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['digest'], set_={'ref_count': StoredFile.ref_count + 1}))
+        return
+    # 其他数据库：插入失败（对方刚插入）时在保存点内回滚后改为加一
+    increment = update(StoredFile).where(StoredFile.digest == digest).values(ref_count=StoredFile.ref_count + 1)
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(StoredFile).values(**values))
+    except IntegrityError:
+        db.session.execute(increment)
+
+
+def _tmp_path():
+    folder = abspath(TMP_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, uuid.uuid4().hex)
+
+
+def _install(path, digest):
+    target = abspath(blob_path(digest))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@jobs.job('storage.remove')
+def remove_legacy(path):
+    """删除旧格式（没有引用计数）的文件"""
+    _remove(abspath(path))
+
+
+@jobs.job('storage.collect_garbage')
+def collect_garbage(digest):
+    """引用计数为 0 时删除记录和文件
+
+    在独立事务中加行锁重新确认计数，与同时上传相同内容的请求互斥：
+    对方若先增加了引用则保留文件；若本方先删除，对方会重新写入文件。
+    """
+    with db.engine.begin() as conn:
+        count = conn.execute(
+            select(StoredFile.ref_count).where(StoredFile.digest == digest).with_for_update()
+        ).scalar()
+        if count is None or count > 0:
+            return False
+        conn.execute(delete(StoredFile).where(StoredFile.digest == digest))
+        _remove(abspath(blob_path(digest)))
+        for ext in PREVIEW_EXTENSIONS:
+            _remove(abspath(preview_path(digest, ext)))
+    return True
+
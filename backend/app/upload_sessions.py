@@ -0,0 +1,164 @@
+"""分片上传会话
+
+每个会话在磁盘上对应两个文件：
+- <upload_id>.json 记录所属用户、课题、文件类型、原始文件名和总大小；
+- <upload_id>.part 为已接收的数据，分片直接追加写入，不在内存中缓冲整个文件。
+
+当前偏移量即 .part 文件的大小，连接中断后客户端查询偏移量即可从断点续传。
+追加分片时对 .part 文件加排他锁（flock，多个 gunicorn 进程之间也有效），偏移量的检查与写入在锁内完成；
+同一会话已有分片正在写入时，新的请求立即返回冲突，而不是交错写入。
+"""
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境没有 flock，退化为进程内的锁（开发服务器为单进程）
+    fcntl = None
+
+# 读取请求体时每次写入磁盘的块大小
+COPY_BUFFER_SIZE = 64 * 1024
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class OffsetMismatch(Exception):
+    """客户端给出的偏移量与服务端已接收的字节数不一致"""
+
+    def __init__(self, offset):
+        super().__init__(f'Expected offset {offset}')
+        self.offset = offset
+
+
+class UploadTooLarge(Exception):
+    """分片写入后会超过初始化时声明的文件大小"""
+
+
+class UploadBusy(Exception):
+    """同一会话的另一个分片正在写入"""
+
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _exclusive(f):
+    """对已打开的文件加排他锁（不等待）；已被占用时抛出 UploadBusy"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy()
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(f.name, threading.Lock())
+    if not lock.acquire(blocking=False):
+        raise UploadBusy()
+    try:
+        yield
+    finally:
+        lock.release()
+        with _local_locks_guard:
+            _local_locks.pop(f.name, None)
+
+
+class UploadSession:
+    def __init__(self, folder, upload_id, meta):
+        self.folder = folder
+        self.upload_id = upload_id
+        self.meta = meta
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.folder, f'{self.upload_id}.json')
+
+    @property
+    def part_path(self):
+        return os.path.join(self.folder, f'{self.upload_id}.part')
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.part_path)
+        except OSError:
+            return 0
+
+    @property
+    def last_activity(self):
+        """最后一次写入数据的时间（时间戳）"""
+        try:
+            return os.path.getmtime(self.part_path)
+        except OSError:
+            return os.path.getmtime(self.meta_path)
+
+    @property
+    def complete(self):
+        return self.offset == self.meta['fileSize']
+
+    @classmethod
+    def create(cls, folder, **meta):
+        """新建会话并写入元数据与空的数据文件"""
+        os.makedirs(folder, exist_ok=True)
+        session = cls(folder, uuid.uuid4().hex, meta)
+        with open(session.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        open(session.part_path, 'wb').close()
+        return session
+
+    @classmethod
+    def load(cls, folder, upload_id):
+        """按 id 读取会话；id 非法或会话不存在时返回 None"""
+        if not _UPLOAD_ID_RE.match(upload_id or ''):
+            return None
+        try:
+            with open(os.path.join(folder, f'{upload_id}.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(folder, upload_id, meta)
+
+    def append(self, stream, offset):
+        """从 offset 处把 stream 的数据边读边写入磁盘，返回新的偏移量"""
+        limit = self.meta['fileSize']
+        with open(self.part_path, 'r+b') as f, _exclusive(f):
+            # 在锁内读取偏移量，检查与写入之间不会有其他请求写入
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise OffsetMismatch(current)
+            f.seek(current)
+            while True:
+                chunk = stream.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                if current + len(chunk) > limit:
+                    f.truncate(current)
+                    raise UploadTooLarge()
+                f.write(chunk)
+                current += len(chunk)
+        return current
+
+    def to_dict(self):
+        return {
+            'uploadId': self.upload_id,
+            'fileName': self.meta['fileName'],
+            'fileSize': self.meta['fileSize'],
+            'fileType': self.meta['fileType'],
+            'offset': self.offset
+        }
+
+    def discard(self):
+        """删除会话的元数据与数据文件"""
+        for path in (self.part_path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
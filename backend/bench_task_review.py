@@ -0,0 +1,101 @@
+"""
+基准测试：逐条审核 (/api/task/review) 与批量审核 (/api/task/review/batch) 的单条耗时对比
+
+在临时 SQLite 数据库上构造 N 条已提交的任务书，分别用两种接口全部审核一遍，
+输出总耗时、单条耗时、SQL 语句数。
+
+用法：
+    python bench_task_review.py [条数，默认 500]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import event, insert
+from app import create_app, migrations
+from app.extensions import db
+from app.models import Project, TaskDocument, User
+from config import Config
+
+
+def seed(count):
+    """写入 1 个管理员、1 个教师以及 count 组 学生/课题/已提交的任务书，返回任务书 id 列表"""
+    db.session.add_all([
+        User(id=1, username='admin', name='教科办', role='admin'),
+        User(id=2, username='T1001', name='David', role='teacher'),
+    ])
+    db.session.flush()
+    db.session.execute(insert(User), [
+        {'id': 100 + i, 'username': f'S{i:06d}', 'name': f'学生{i}', 'role': 'student'}
+        for i in range(count)
+    ])
+    db.session.execute(insert(Project), [
+        {'id': i + 1, 'title': f'课题{i}', 'student_id': 100 + i, 'teacher_id': 2}
+        for i in range(count)
+    ])
+    db.session.execute(insert(TaskDocument), [
+        {'id': i + 1, 'project_id': i + 1, 'student_submitted': 1, 'teacher_submitted': 1,
+         'student_draft_path': 'draft.pdf', 'teacher_revision_path': 'revision.pdf'}
+        for i in range(count)
+    ])
+    db.session.commit()
+    return list(range(1, count + 1))
+
+
+def reset(task_ids):
+    TaskDocument.query.filter(TaskDocument.id.in_(task_ids)).update(
+        {'admin_status': None, 'student_submitted': 1, 'teacher_submitted': 1},
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+def run(label, client, requests, count, statements):
+    statements[0] = 0
+    start = time.perf_counter()
+    for method, url, body in requests:
+        response = client.open(url, method=method, json=body, headers={'X-User-Id': '1'})
+        assert response.status_code == 200, response.get_data(as_text=True)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<8} 请求数 {len(requests):>5}  总耗时 {elapsed * 1000:9.1f} ms  '
+          f'单条 {elapsed / count * 1000:7.3f} ms  SQL 语句 {statements[0]:>6}')
+    return elapsed
+
+
+def bench(count):
+    workdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        BASE_DIR = workdir
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    statements = [0]
+
+    with app.app_context():
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrations.upgrade()
+        task_ids = seed(count)
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_statement(*args):
+            statements[0] += 1
+
+        single = [('POST', '/api/task/review', {'taskId': task_id, 'action': 'approve'})
+                  for task_id in task_ids]
+        batch = [('POST', '/api/task/review/batch', {
+            'items': [{'taskId': task_id, 'action': 'approve'} for task_id in task_ids]
+        })]
+
+        print(f'审核 {count} 条任务书：')
+        single_time = run('逐条', client, single, count, statements)
+        reset(task_ids)
+        batch_time = run('批量', client, batch, count, statements)
+        print(f'批量接口单条耗时约为逐条的 {batch_time / single_time:.1%}')
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
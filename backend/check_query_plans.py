@@ -0,0 +1,94 @@
+"""
+查询计划检查脚本：对接口中的高频查询执行 EXPLAIN，
+任何一条退化为全表扫描（没有可用索引）时以非 0 状态退出。
+
+用法：
+    python check_query_plans.py                # 使用内存 SQLite，执行全部迁移后检查
+    python check_query_plans.py <数据库URI>     # 检查指定数据库（如 MySQL）的实际表结构
+"""
+import re
+import sys
+from app import create_app, migrations
+from app.extensions import db
+from app.models import GuidanceRecord, Paper, Project, TaskDocument
+from config import Config
+
+# SQLite: "SCAN 表名" 且没有使用任何索引即为全表扫描
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)(?! USING (COVERING )?INDEX| USING INTEGER PRIMARY KEY)')
+
+
+def hot_queries():
+    """与接口中写法一致的高频查询（名称, Query）"""
+    user_id = 1
+    return [
+        ('projects by student', Project.query.filter_by(student_id=user_id)),
+        ('projects by teacher', Project.query.filter_by(teacher_id=user_id)),
+        ('task document by project', TaskDocument.query.filter_by(project_id=user_id)),
+        ('task review list', TaskDocument.query.filter(TaskDocument.in_review_list())),
+        ('guidance records of student', GuidanceRecord.query.join(Project).filter(
+            Project.student_id == user_id
+        ).order_by(GuidanceRecord.record_date, GuidanceRecord.id)),
+        ('guidance records of teacher', GuidanceRecord.query.join(Project).filter(
+            Project.teacher_id == user_id
+        ).order_by(GuidanceRecord.record_date, GuidanceRecord.id)),
+        ('submitted guidance records', GuidanceRecord.query.join(Project).filter(
+            GuidanceRecord.status == 1
+        ).order_by(GuidanceRecord.record_date, GuidanceRecord.id)),
+        ('papers of student', Paper.query.filter(Paper.student_id == user_id).order_by(Paper.id)),
+    ]
+
+
+def explain(query):
+    """返回 [(表名, 计划描述, 是否全表扫描)]"""
+    dialect = db.engine.dialect.name
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+
+    with db.engine.connect() as conn:
+        if dialect == 'sqlite':
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).mappings().all()
+            result = []
+            for row in rows:
+                match = SQLITE_FULL_SCAN.match(row['detail'])
+                table = match.group(1) if match else ''
+                result.append((table, row['detail'], bool(match)))
+            return result
+
+        if dialect == 'mysql':
+            rows = conn.exec_driver_sql('EXPLAIN ' + sql).mappings().all()
+            # 小表上优化器可能仍选择 ALL，只有在没有任何候选索引时才判定为缺少索引
+            return [
+                (row['table'], f"type={row['type']} key={row['key']} possible_keys={row['possible_keys']}",
+                 row['type'] == 'ALL' and not row['possible_keys'])
+                for row in rows
+            ]
+
+    raise SystemExit(f'Unsupported database dialect: {dialect}')
+
+
+def check_query_plans(database_uri=None):
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri or 'sqlite://'
+
+    app = create_app(CheckConfig)
+    failures = 0
+    with app.app_context():
+        if database_uri is None:
+            migrations.upgrade()
+
+        for name, query in hot_queries():
+            plan = explain(query)
+            full_scan = any(scan for _, _, scan in plan)
+            failures += full_scan
+            print(f"[{'FAIL' if full_scan else ' OK '}] {name}")
+            for table, detail, scan in plan:
+                print(f"         {'!' if scan else ' '} {detail}")
+
+    if failures:
+        print(f'{failures} 条查询退化为全表扫描')
+    else:
+        print('所有高频查询均使用了索引')
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_query_plans(sys.argv[1] if len(sys.argv) > 1 else None) else 0)
@@ -0,0 +1,38 @@
+"""gunicorn 配置：gunicorn -c gunicorn.conf.py wsgi:app
+
+预派生 (pre-fork) 多进程 + 每进程多线程 (gthread)：
+- 进程数默认 CPU 核数 * 2 + 1，可用环境变量 GUNICORN_WORKERS 覆盖；
+- 每个进程 GUNICORN_THREADS 个线程，适合以数据库/文件 I/O 为主的接口；
+- 任务书事件流（SSE，/api/task/events）由 gunicorn.events.conf.py 的 gevent 进程单独提供，
+  nginx 不会把它转发到这里；直接访问本端口时每个进程最多打开 EVENTS_MAX_STREAMS 个（默认 2，
+  小于线程数），避免长连接占满线程；
+- 平滑重载：kill -HUP <master pid>，旧进程处理完手上的请求再退出；
+- 静态文件由 nginx 直接提供（deploy/nginx.conf），不占用这里的进程；
+- 后台任务（文件清理等）不在这里执行，另行运行 flask --app wsgi jobs worker。
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8080')
+
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# 与 nginx 之间保持长连接
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# 大文件上传/下载可能较慢，超时后 master 会重启卡死的进程
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# 重载或停止时等待进行中的请求完成的时间
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# 处理一定数量的请求后轮换进程，避免内存缓慢增长；加随机抖动避免同时重启
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# 不预加载应用：每个进程各自创建数据库连接池，fork 后不会共享连接
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
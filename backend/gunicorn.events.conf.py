@@ -0,0 +1,40 @@
+"""任务书事件流（SSE，/api/task/events）专用的 gunicorn 配置：
+
+    gunicorn -c gunicorn.events.conf.py wsgi:app
+
+SSE 连接一直保持打开，在 gthread 进程中每个连接占用一个线程（gunicorn.conf.py），
+因此事件流由这里的 gevent 进程单独提供，nginx 把 /api/task/events 转发到这个端口（deploy/nginx.conf）：
+- 每个连接是一个协程，空闲时只占少量内存，不占用普通接口的线程；
+- 连接数按在线用户估算：每个打开页面的用户一个连接，EVENTS_WORKERS * EVENTS_MAX_STREAMS
+  应大于同时在线人数的峰值（默认 2 个进程 * 每进程 1000 个连接）；超过上限的连接返回 503，
+  页面 30 秒后重新订阅；
+- worker_connections 略大于 EVENTS_MAX_STREAMS，留出返回 503 的余量；
+- 事件流只在建立连接时查询数据库，每个进程另有一个轮询 task_events 的后台协程，
+  连接池用默认大小即可；
+- 后台任务不在这里执行（JOBS_WORKER_THREADS=0）。
+"""
+import os
+
+bind = os.environ.get('EVENTS_BIND', '127.0.0.1:8081')
+
+workers = int(os.environ.get('EVENTS_WORKERS', 2))
+worker_class = 'gevent'
+max_streams = int(os.environ.get('EVENTS_MAX_STREAMS', 1000))
+worker_connections = max_streams + 100
+
+# 传给应用的配置（config.py 在 worker 中读取这些环境变量）
+raw_env = [f'EVENTS_MAX_STREAMS={max_streams}', 'JOBS_WORKER_THREADS=0']
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# 心跳每 15 秒发送一次，连接最长 EVENTS_STREAM_TIMEOUT（300 秒）后由服务端结束
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# 长连接进程不按请求数轮换
+max_requests = 0
+
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
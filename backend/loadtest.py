@@ -0,0 +1,103 @@
+"""
+压测脚本：并发请求主要接口，输出每个接口的吞吐量 (requests/s) 与延迟分位数 (p50/p99)
+
+用法（先启动服务，例如 gunicorn -c gunicorn.conf.py wsgi:app）：
+    python loadtest.py --base-url http://127.0.0.1:8080 --concurrency 32 --duration 30
+
+每个并发线程使用一条 HTTP/1.1 长连接，轮流请求各个接口。
+"""
+import argparse
+import http.client
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+# (接口, 请求头中的用户 id)：学生 1、教师 2、教务处 3，与 init_test_data() 的测试数据一致
+DEFAULT_ENDPOINTS = [
+    ('/api/guidance/records', 3),
+    ('/api/guidance/records', 1),
+    ('/api/guidance/info', 2),
+    ('/api/paper/list', 3),
+    ('/api/task/info', 1),
+    ('/api/task/list', 3),
+    ('/api/task/list?limit=50', 3),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(base, endpoints, deadline, offset, results, lock):
+    """在截止时间前循环请求，记录每次请求的 (接口, 耗时秒, 是否成功)"""
+    conn_class = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+    conn = conn_class(base.netloc, timeout=30)
+    local = []
+    i = offset
+    while time.perf_counter() < deadline:
+        path, user_id = endpoints[i % len(endpoints)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', base.path.rstrip('/') + path, headers={'X-User-Id': str(user_id)})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = conn_class(base.netloc, timeout=30)
+        local.append((f'{path} [user {user_id}]', time.perf_counter() - start, ok))
+    conn.close()
+    with lock:
+        results.extend(local)
+
+
+def run(base_url, concurrency, duration, endpoints=DEFAULT_ENDPOINTS):
+    base = urlsplit(base_url)
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(base, endpoints, deadline, n, results, lock))
+        for n in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(int)
+    for name, latency, ok in results:
+        by_endpoint[name].append(latency)
+        if not ok:
+            errors[name] += 1
+
+    print(f'并发 {concurrency}，持续 {elapsed:.1f} s，共 {len(results)} 个请求，'
+          f'总吞吐 {len(results) / elapsed:.1f} req/s')
+    print(f"{'接口':<40} {'请求数':>7} {'req/s':>8} {'p50(ms)':>9} {'p99(ms)':>9} {'错误':>6}")
+    for name in sorted(by_endpoint):
+        latencies = sorted(by_endpoint[name])
+        print(f'{name:<40} {len(latencies):>7} {len(latencies) / elapsed:>8.1f} '
+              f'{percentile(latencies, 0.50) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f} '
+              f'{errors[name]:>6}')
+    all_latencies = sorted(latency for _, latency, _ in results)
+    print(f"{'全部':<40} {len(all_latencies):>7} {len(all_latencies) / elapsed:>8.1f} "
+          f'{percentile(all_latencies, 0.50) * 1000:>9.1f} {percentile(all_latencies, 0.99) * 1000:>9.1f} '
+          f'{sum(errors.values()):>6}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='主要接口压测')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8080')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+    run(args.base_url, args.concurrency, args.duration)
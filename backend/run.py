@@ -1,5 +1,8 @@
 from app import create_app
 
+# 首次运行或更新代码后，先执行数据库迁移（应用启动时不再自动建表）：
+#   flask --app run db upgrade
+#   flask --app run db seed      # 可选：写入演示用测试数据
 app = create_app()
 
 if __name__ == '__main__':
@@ -0,0 +1,57 @@
+"""当前用户：查询参数 userId 只在标记过的 GET 接口中有效；用户缓存在提交后失效"""
+import threading
+from app import auth
+from app.extensions import db
+from app.models import User
+
+
+def admin_id(app):
+    with app.app_context():
+        return User.query.filter_by(role='admin').first().id
+
+
+def test_query_user_ignored_on_regular_endpoints(app, client):
+    user_id = admin_id(app)
+    # 只读接口与写接口都不接受查询参数中的身份
+    assert client.get('/api/task/list', query_string={'userId': user_id}).status_code == 401
+    assert client.get('/api/admin/pool', query_string={'userId': user_id}).status_code == 403
+    response = client.post('/api/task/review', query_string={'userId': user_id},
+                           json={'taskId': 1, 'action': 'approve'})
+    assert response.status_code == 401
+    assert client.get('/api/task/list', headers={'X-User-Id': str(user_id)}).status_code == 200
+
+
+def test_query_user_accepted_on_link_endpoints(app, client):
+    user_id = admin_id(app)
+    # 打包下载是浏览器直接打开的链接
+    response = client.get('/api/task/archive', query_string={'userId': user_id, 'type': 'x'})
+    assert response.status_code == 400
+    assert client.get('/api/task/archive', query_string={'type': 'x'}).status_code == 401
+
+
+def test_cached_user_evicted_after_commit(app):
+    user_id = admin_id(app)
+    with app.app_context():
+        auth.user_cache.clear()
+        user = db.session.get(User, user_id)
+        user.role = 'teacher'
+        db.session.flush()
+
+        # flush 与提交之间，其他线程读到的仍是已提交的旧行并写入缓存
+        def load():
+            with app.app_context():
+                assert auth.load_user(user_id).role == 'admin'
+        thread = threading.Thread(target=load)
+        thread.start()
+        thread.join()
+        assert auth.user_cache.get(user_id).role == 'admin'
+
+        db.session.commit()
+        assert auth.user_cache.get(user_id) is None
+        assert auth.load_user(user_id).role == 'teacher'
+
+        # 回滚的修改不使缓存失效
+        user.role = 'student'
+        db.session.flush()
+        db.session.rollback()
+        assert auth.user_cache.get(user_id).role == 'teacher'
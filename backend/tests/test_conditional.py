@@ -0,0 +1,26 @@
+"""列表接口的条件请求：ETag 由命名空间的代次决定，未变化时不查询数据库"""
+from app.models import User
+from tests.test_list_queries import seed
+
+
+def test_list_etag_follows_generation(app, client, count_statements):
+    with app.app_context():
+        headers = {'X-User-Id': str(User.query.filter_by(role='admin').first().id)}
+        seed(5, 0)
+    url = '/api/guidance/records?limit=2'
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    # 未变化：304，不做 COUNT/MAX 聚合，也不查询明细
+    with count_statements() as counter:
+        response = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert counter.count == 0
+
+    # 写接口提交后换代，旧的 ETag 失效
+    assert client.post('/api/guidance/records', headers=headers,
+                       json={'projectId': 1, 'content': '新记录'}).status_code == 201
+    response = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,45 @@
+"""连接池：按 DB_* 配置创建，统计取连接等待、超时与溢出连接"""
+import pytest
+from sqlalchemy import create_engine, exc
+from app import db_pool
+from app.models import User
+
+
+def test_pool_stats_endpoint(app, client):
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+        student_id = User.query.filter_by(role='student').first().id
+
+    assert client.get('/api/admin/pool', headers={'X-User-Id': str(student_id)}).status_code == 403
+    stats = client.get('/api/admin/pool', headers={'X-User-Id': str(admin_id)}).get_json()
+    assert stats['pool'] == 'InstrumentedQueuePool'
+    assert stats['size'] == app.config['DB_POOL_SIZE']
+    assert stats['checkouts'] > 0
+
+    stats = client.post('/api/admin/pool/reset', headers={'X-User-Id': str(admin_id)}).get_json()
+    # 重置后只剩本次请求自身的取连接
+    assert stats['checkouts'] <= 1 and stats['timeouts'] == 0
+
+
+def test_timeouts_and_overflow_are_counted(tmp_path):
+    config = {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'pool.db'),
+              'DB_POOL_SIZE': 1, 'DB_MAX_OVERFLOW': 1, 'DB_POOL_TIMEOUT': 0.1}
+    engine = create_engine(config['SQLALCHEMY_DATABASE_URI'], **db_pool.engine_options(config))
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = db_pool.stats(engine)
+    assert (stats['checkouts'], stats['timeouts'], stats['overflowConnects']) == (2, 1, 1)
+    assert stats['peakCheckedOut'] == 2
+    first.close()
+    second.close()
+    engine.dispose()
+
+
+def test_engine_options():
+    # 内存 SQLite 只能使用单连接池
+    assert db_pool.engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}) == {}
+    options = db_pool.engine_options({'SQLALCHEMY_DATABASE_URI': 'mysql+pymysql://u:p@db/app',
+                                      'DB_STATEMENT_TIMEOUT_MS': 5000})
+    assert options['poolclass'] is db_pool.InstrumentedQueuePool
+    assert options['connect_args']['init_command'] == 'SET SESSION max_execution_time = 5000'
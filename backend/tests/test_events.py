@@ -0,0 +1,62 @@
+"""任务书事件流：连接数上限与晚提交事件的推送"""
+from app import events
+from app.extensions import db
+from app.models import User, TaskEvent
+
+
+def test_streams_capped_per_process(app, client):
+    app.config['EVENTS_MAX_STREAMS'] = 1
+    with app.app_context():
+        headers = {'X-User-Id': str(User.query.filter_by(role='admin').first().id)}
+
+    first = client.get('/api/task/events', headers=headers)
+    assert first.status_code == 200
+    assert events.slots.count == 1
+
+    # 名额已满：不占用线程，提示客户端稍后重试
+    busy = client.get('/api/task/events', headers=headers)
+    assert busy.status_code == 503
+    assert busy.headers['Retry-After'] == str(events.BUSY_RETRY_SECONDS)
+    assert busy.get_data(as_text=True).startswith('retry: ')
+    assert events.slots.count == 1
+
+    # 连接结束后归还名额
+    first.close()
+    assert events.slots.count == 0
+    second = client.get('/api/task/events', headers=headers)
+    assert second.status_code == 200
+    second.close()
+    assert events.slots.count == 0
+
+
+def add_event(event_id, task_id):
+    db.session.add(TaskEvent(id=event_id, task_id=task_id, project_id=1, payload=f'{{"id": {task_id}}}'))
+    db.session.commit()
+    events.broker.wake()
+
+
+def test_events_committed_out_of_id_order(app, client):
+    with app.app_context():
+        headers = {'X-User-Id': str(User.query.filter_by(role='admin').first().id)}
+        events.broker.start(app)
+        position, base = events.broker.position()
+
+        # id 较大的事务先提交：较小的 id 记为空缺，watermark 停在它之前
+        add_event(base + 2, 2)
+        found, position, watermark = events.broker.wait(position, 5)
+        assert [e.id for e in found] == [base + 2]
+        assert watermark == base
+
+        # 较小的 id 后提交，仍然推送，watermark 越过两者
+        add_event(base + 1, 1)
+        found, position, watermark = events.broker.wait(position, 5)
+        assert [e.id for e in found] == [base + 1]
+        assert watermark == base + 2
+
+    # 断线重连：从 Last-Event-ID 之后按 id 顺序补发两个事件
+    response = client.get('/api/task/events', headers={**headers, 'Last-Event-ID': str(base)})
+    chunks = (chunk.decode() for chunk in response.response)
+    assert next(chunks).startswith('retry: ')
+    assert next(chunks) == f'id: {base + 1}\nevent: task\ndata: {{"id": 1}}\n\n'
+    assert next(chunks) == f'id: {base + 2}\nevent: task\ndata: {{"id": 2}}\n\n'
+    response.close()
@@ -0,0 +1,101 @@
+"""导出：分批查询、边查询边发送；CSV 中可能被 Excel 当作公式的单元格加前缀；中途失败时文件末尾写明不完整"""
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import OperationalError
+from app import export
+from app.extensions import db
+from app.models import User, GuidanceRecord
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+def seed(app, contents):
+    with app.app_context():
+        db.session.add_all(GuidanceRecord(project_id=1, content=content, status=1) for content in contents)
+        db.session.commit()
+        return User.query.filter_by(role='admin').first().id
+
+
+def test_csv_formula_cells_are_escaped(app, client):
+    admin_id = seed(app, ['=HYPERLINK("http://x")', '+1', '-2', '@SUM(A1)', '正常内容'])
+    response = client.get('/api/guidance/export?format=csv&fields=id,content', headers={'X-User-Id': str(admin_id)})
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="guidance-')
+    rows = list(csv.reader(io.StringIO(response.get_data().decode('utf-8-sig'))))
+    assert rows[0] == ['ID', '指导内容']
+    assert [row[1] for row in rows[1:]] == ["'=HYPERLINK(\"http://x\")", "'+1", "'-2", "'@SUM(A1)", '正常内容']
+    # 数字列不加前缀
+    assert all(row[0].isdigit() for row in rows[1:])
+
+
+def test_export_is_streamed_in_chunks(app, client, monkeypatch):
+    admin_id = seed(app, [f'记录{i:03d}' for i in range(60)])
+    app.config['EXPORT_BATCH_SIZE'] = 7
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 256)
+
+    response = client.get('/api/guidance/export?format=csv', headers={'X-User-Id': str(admin_id)}, buffered=False)
+    assert response.is_streamed
+    chunks = list(response.response)
+    response.close()
+    assert len(chunks) > 1
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8-sig'))))
+    assert [row[4] for row in rows[1:]] == [f'记录{i:03d}' for i in range(60)]
+
+    response = client.get('/api/guidance/export?format=xlsx&fields=id,content', headers={'X-User-Id': str(admin_id)})
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    rows = sheet.findall(f'{SHEET_NS}sheetData/{SHEET_NS}row')
+    assert len(rows) == 61
+    # id 为数值单元格，内容为内联字符串
+    first = rows[1].findall(f'{SHEET_NS}c')
+    assert first[0].get('t') is None and first[1].get('t') == 'inlineStr'
+
+
+def test_zip_chunks_lists_missing_files(tmp_path):
+    present = tmp_path / 'a.pdf'
+    present.write_bytes(b'%PDF-1.4 test')
+    body = b''.join(export.zip_chunks([('a.pdf', str(present)), ('b.pdf', str(tmp_path / 'missing.pdf'))],
+                                      missing_note='缺少的文件.txt'))
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert archive.read('a.pdf') == b'%PDF-1.4 test'
+        assert archive.read('缺少的文件.txt').decode() == 'b.pdf\n'
+
+
+def test_export_query_uses_export_timeout(app):
+    app.config['EXPORT_STATEMENT_TIMEOUT_MS'] = 600000
+    with app.test_request_context():
+        query = export.export_query(GuidanceRecord.query, GuidanceRecord, ['id'], [GuidanceRecord.id])
+        assert str(query.statement.compile(dialect=mysql.dialect())).startswith(
+            'SELECT /*+ MAX_EXECUTION_TIME(600000) */')
+        assert 'MAX_EXECUTION_TIME' not in str(query.statement.compile(dialect=sqlite.dialect()))
+
+
+def test_aborted_export_ends_with_marker(app, client, monkeypatch):
+    admin_id = seed(app, [f'记录{i}' for i in range(5)])
+    to_dict = GuidanceRecord.to_dict
+    calls = []
+
+    def failing_to_dict(self, fields=None):
+        calls.append(self.id)
+        if len(calls) % 5 == 3:
+            # 模拟流式查询中途被数据库中止（如 max_execution_time 超时）
+            raise OperationalError('SELECT ...', {}, Exception('Query execution was interrupted'))
+        return to_dict(self, fields)
+
+    monkeypatch.setattr(GuidanceRecord, 'to_dict', failing_to_dict)
+    headers = {'X-User-Id': str(admin_id)}
+    response = client.get('/api/guidance/export?format=csv&fields=id,content', headers=headers)
+    rows = list(csv.reader(io.StringIO(response.get_data().decode('utf-8-sig'))))
+    assert len(rows) == 4 and rows[-1] == [export.EXPORT_ABORTED, '']
+
+    calls.clear()
+    response = client.get('/api/guidance/export?format=xlsx&fields=id,content', headers=headers)
+    # 文件本身仍是完整的 XLSX，最后一行为中断说明
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    rows = sheet.findall(f'{SHEET_NS}sheetData/{SHEET_NS}row')
+    assert len(rows) == 4
+    assert ''.join(rows[-1].itertext()) == export.EXPORT_ABORTED
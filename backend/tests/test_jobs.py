@@ -0,0 +1,92 @@
+"""后台任务：失败重试、死信、租约过期与续租"""
+import threading
+import time
+from datetime import datetime, timedelta
+from app import jobs
+from app.extensions import db
+from app.models import BackgroundJob
+
+runs = []
+
+
+@jobs.job('test.slow')
+def slow_job(seconds):
+    runs.append(seconds)
+    time.sleep(seconds)
+
+
+@jobs.job('test.fail')
+def failing_job():
+    runs.append('fail')
+    raise RuntimeError('boom')
+
+
+def add_job(app, **values):
+    with app.app_context():
+        job = BackgroundJob(kind='test.slow', payload='{"seconds": 0}', **values)
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def load(app, job_id):
+    with app.app_context():
+        return db.session.get(BackgroundJob, job_id)
+
+
+def test_expired_lease_respects_max_attempts(app):
+    past = datetime.utcnow() - timedelta(seconds=10)
+    exhausted = add_job(app, status='running', attempts=3, max_attempts=3, locked_until=past)
+    retried = add_job(app, status='running', attempts=1, max_attempts=3, locked_until=past)
+
+    with app.app_context():
+        claimed = jobs.claim(app)
+    # worker 中途退出、次数已用完的任务不再执行，转为死信
+    assert claimed.id == retried and claimed.attempts == 2
+    job = load(app, exhausted)
+    assert (job.status, job.attempts, job.last_error) == ('dead', 3, jobs.LEASE_EXPIRED)
+    with app.app_context():
+        assert jobs.claim(app) is None
+
+
+def test_lease_renewed_while_handler_runs(app):
+    app.config['JOBS_LEASE_SECONDS'] = 0.6
+    runs.clear()
+    with app.app_context():
+        jobs.enqueue('test.slow', {'seconds': 1.5})
+        db.session.commit()
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(jobs.run_one(app)))
+    worker.start()
+    time.sleep(1)
+    # 已超过最初的租约，但处理函数仍在运行：租约已续，其他 worker 抢不到
+    with app.app_context():
+        assert jobs.claim(app) is None
+    worker.join()
+
+    assert results == [True] and runs == [1.5]
+    with app.app_context():
+        assert BackgroundJob.query.count() == 0
+
+
+def test_failing_job_becomes_dead_after_max_attempts(app):
+    app.config['JOBS_BACKOFF_BASE'] = 0
+    runs.clear()
+    with app.app_context():
+        job = jobs.enqueue('test.fail', max_attempts=3)
+        db.session.commit()
+        job_id = job.id
+
+    assert [jobs.run_one(app) for _ in range(3)] == [False, False, False]
+    # 次数用完后不再被抢占
+    assert jobs.run_one(app) is None
+    assert runs == ['fail'] * 3
+    job = load(app, job_id)
+    assert (job.status, job.attempts, job.last_error) == ('dead', 3, 'RuntimeError: boom')
+
+    with app.app_context():
+        assert jobs.retry(job_id)
+        db.session.commit()
+    assert jobs.run_one(app) is False
+    assert load(app, job_id).attempts == 1
@@ -0,0 +1,44 @@
+"""列表接口的查询数不随行数增长（课题的学生、教师需预加载，不能逐行懒加载）"""
+from app.extensions import db
+from app.models import User, Project, GuidanceRecord, TaskDocument
+
+ROWS = 10
+
+
+def seed(count, start):
+    teacher = User.query.filter_by(role='teacher').first()
+    for i in range(start, start + count):
+        student = User(username=f's{i}', name=f'学生{i}', role='student')
+        # 每行使用不同的课题与学生，懒加载时查询数会随行数增长
+        project = Project(title=f'课题{i}', student=student, teacher=teacher)
+        db.session.add_all([
+            student, project,
+            GuidanceRecord(project=project, content=f'记录{i}', status=1),
+            TaskDocument(project=project, teacher_submitted=1),
+        ])
+    db.session.commit()
+
+
+def statements_for(client, count_statements, url, admin_id):
+    client.get(url, headers={'X-User-Id': str(admin_id)})  # 预热当前用户缓存
+    with count_statements() as counter:
+        response = client.get(url, headers={'X-User-Id': str(admin_id)})
+    assert response.status_code == 200
+    # 不带 limit/cursor 时返回完整列表
+    return counter.count, len(response.get_json())
+
+
+def test_statement_count_is_constant(app, client, count_statements):
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+        seed(ROWS, 0)
+    before = {url: statements_for(client, count_statements, url, admin_id)
+              for url in ('/api/guidance/records', '/api/task/list')}
+    with app.app_context():
+        seed(ROWS, ROWS)
+    after = {url: statements_for(client, count_statements, url, admin_id)
+             for url in ('/api/guidance/records', '/api/task/list')}
+
+    for url in before:
+        assert after[url][1] == 2 * before[url][1], url
+        assert after[url][0] == before[url][0], url
@@ -0,0 +1,47 @@
+"""接口统计：请求数、SQL 语句数与流式响应的字节数；抓取需要管理员或 METRICS_TOKEN"""
+from app import metrics
+from app.models import User
+
+
+def sample(text, name, **labels):
+    prefix = name + '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+    values = [line.split(' ')[-1] for line in text.splitlines() if line.startswith(prefix + ' ')]
+    assert len(values) == 1, prefix
+    return float(values[0])
+
+
+def test_request_metrics(app, client):
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+        student_id = User.query.filter_by(role='student').first().id
+    headers = {'X-User-Id': str(admin_id)}
+    metrics.reset()
+
+    def get(url, method='GET'):
+        response = client.open(url, method=method, headers=headers)
+        # 响应关闭（发送完毕）时记录
+        response.close()
+        return response
+
+    for _ in range(2):
+        assert get('/api/guidance/records').status_code == 200
+    export = get('/api/guidance/export?format=csv')
+    # 前端页面的路由只接受 GET，其他方法没有匹配的路由
+    assert get('/api/missing', 'DELETE').status_code == 405
+
+    text = metrics.render()
+    route = {'endpoint': 'guidance.get_records', 'method': 'GET'}
+    assert sample(text, 'http_requests_total', **route, status='200') == 2
+    assert sample(text, 'http_request_db_statements_count', **route) == 2
+    assert sample(text, 'http_request_db_statements_sum', **route) > 0
+    # 流式导出的大小在发送完毕后统计
+    assert sample(text, 'http_response_size_bytes_sum', endpoint='guidance.export_records', method='GET') \
+        == len(export.data)
+    assert sample(text, 'http_requests_total', endpoint=metrics.UNMATCHED, method='DELETE', status='405') == 1
+
+    assert client.get('/api/admin/metrics', headers={'X-User-Id': str(student_id)}).status_code == 403
+    app.config['METRICS_TOKEN'] = 'secret'
+    response = client.get('/api/admin/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert client.get('/api/admin/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
@@ -0,0 +1,64 @@
+"""0002：旧结构的任务书表迁移到 project_id"""
+import contextlib
+import io
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app import migrations
+from app.migrations import IrreversibleMigration, MigrationError
+from app.migrations.versions import v0002_task_documents_project_id as v0002
+
+
+def test_unresolved_rows_fail_the_migration(app, tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'legacy.db'))
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE task_documents (id INTEGER PRIMARY KEY, student_id INT, teacher_id INT)'))
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        migrations.upgrade('0001', engine=engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, name, role) VALUES "
+                              "(1, 's1', 'S1', 'student'), (2, 's2', 'S2', 'student'), (3, 't', 'T', 'teacher')"))
+            conn.execute(text("INSERT INTO projects (id, title, student_id, teacher_id) VALUES (10, 'p', 1, 3)"))
+            conn.execute(text('INSERT INTO task_documents (id, student_id, teacher_id) VALUES (1, 1, 3), (2, 2, 3)'))
+
+        with pytest.raises(MigrationError, match='rows 2 have no matching project'):
+            migrations.upgrade(engine=engine)
+        assert '0002' not in migrations.applied_revisions(engine)
+
+        # 补上课题后重新执行，只回填剩下的记录
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO projects (id, title, student_id, teacher_id) VALUES (11, 'q', 2, 3)"))
+        migrations.upgrade(engine=engine)
+        assert '0002' in migrations.applied_revisions(engine)
+        with engine.connect() as conn:
+            rows = conn.execute(text('SELECT id, project_id FROM task_documents ORDER BY id')).all()
+        assert [tuple(row) for row in rows] == [(1, 10), (2, 11)]
+
+
+def test_sqlite_legacy_table_is_rebuilt(app, tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'legacy.db'))
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE task_documents (id INTEGER PRIMARY KEY, student_id INT NOT NULL, '
+                          'teacher_id INT NOT NULL, file_path VARCHAR(255))'))
+        conn.execute(text('CREATE INDEX idx_task_documents_file ON task_documents (file_path)'))
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        migrations.upgrade('0001', engine=engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, name, role) VALUES "
+                              "(1, 's', 'S', 'student'), (3, 't', 'T', 'teacher')"))
+            conn.execute(text("INSERT INTO projects (id, title, student_id, teacher_id) VALUES (10, 'p', 1, 3), (11, 'q', 1, 3)"))
+            conn.execute(text("INSERT INTO task_documents (id, student_id, teacher_id, file_path) VALUES (1, 1, 3, 'a.pdf')"))
+        migrations.upgrade(engine=engine)
+
+        columns = {col['name']: col['nullable'] for col in inspect(engine).get_columns('task_documents')}
+        assert columns['project_id'] is False
+        assert columns['student_id'] is True and columns['teacher_id'] is True
+        assert 'idx_task_documents_file' in {index['name'] for index in inspect(engine).get_indexes('task_documents')}
+        with engine.begin() as conn:
+            # 新增记录不再写旧列
+            conn.execute(text("INSERT INTO task_documents (id, project_id, file_path) VALUES (2, 11, 'b.pdf')"))
+            rows = conn.execute(text('SELECT id, project_id, student_id, file_path FROM task_documents ORDER BY id')).all()
+        assert [tuple(row) for row in rows] == [(1, 10, 1, 'a.pdf'), (2, 11, None, 'b.pdf')]
+
+        # 旧结构迁移后不能回滚
+        with pytest.raises(IrreversibleMigration):
+            v0002.downgrade(engine)
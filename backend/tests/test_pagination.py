@@ -0,0 +1,38 @@
+"""游标分页：逐页翻完与一次取完的结果一致（排序键含 NULL 时也不重复、不遗漏）"""
+from datetime import datetime
+from sqlalchemy import update
+from app.extensions import db
+from app.models import User, Project, GuidanceRecord
+
+
+def test_cursor_round_trip_with_null_dates(app, client):
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+        teacher = User.query.filter_by(role='teacher').first()
+        student = User(username='paging', name='分页', role='student')
+        project = Project(title='分页课题', student=student, teacher=teacher)
+        records = [GuidanceRecord(project=project, content=f'记录{i}', status=1,
+                                  record_date=datetime(2024, 1, 1 + i % 3)) for i in range(7)]
+        db.session.add_all([student, project, *records])
+        db.session.commit()
+        # 一部分记录没有日期，升序时排在最前
+        null_ids = [records[1].id, records[4].id, records[5].id]
+        db.session.execute(update(GuidanceRecord).where(GuidanceRecord.id.in_(null_ids)).values(record_date=None))
+        db.session.commit()
+    headers = {'X-User-Id': str(admin_id)}
+
+    expected = [item['id'] for item in client.get('/api/guidance/records', headers=headers).get_json()]
+    assert len(expected) >= 7
+    assert set(expected[:3]) == set(null_ids)
+
+    ids, cursor, pages = [], None, 0
+    while True:
+        url = '/api/guidance/records?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url, headers=headers).get_json()
+        ids.extend(item['id'] for item in page['items'])
+        cursor = page['nextCursor']
+        pages += 1
+        if cursor is None:
+            break
+        assert pages < 20
+    assert ids == expected
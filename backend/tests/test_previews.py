@@ -0,0 +1,51 @@
+"""任务书预览：.docx 不依赖外部工具生成转义后的文本摘要，按摘要的 ETag 回答 304"""
+import io
+import zipfile
+from app import previews, storage
+from app.extensions import db
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+
+def make_docx(paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+    data.seek(0)
+    return data
+
+
+def test_docx_text_preview(app):
+    with app.app_context():
+        ref = storage.put_stream(make_docx(['课题背景', '使用 &lt;script&gt; 标签', '']), '任务书.docx')
+        db.session.commit()
+        digest = storage.parse_ref(ref)
+        assert previews.manifest(digest) is None
+
+        previews.generate(digest, storage.original_name(ref))
+        result = previews.manifest(digest)
+        assert (result['html'], result['truncated']) == (True, False)
+        with open(storage.abspath(storage.preview_path(digest, 'html')), encoding='utf-8') as f:
+            # 文件中的文字按段落输出并转义，空段落跳过
+            assert f.read() == '<p>课题背景</p>\n<p>使用 &lt;script&gt; 标签</p>'
+
+    with app.test_request_context(headers={'If-None-Match': f'"{digest}-html"'}):
+        assert previews.send_preview(ref, 'html').status_code == 304
+    with app.test_request_context():
+        response = previews.send_preview(ref, 'html')
+        assert response.status_code == 200
+        assert response.headers['X-Content-Type-Options'] == 'nosniff'
+        response.close()
+
+
+def test_long_text_is_truncated(app):
+    app.config['PREVIEW_TEXT_LIMIT'] = 10
+    with app.app_context():
+        ref = storage.put_stream(make_docx(['一二三四五六', '七八九十十一十二']), 'long.docx')
+        db.session.commit()
+        digest = storage.parse_ref(ref)
+        previews.generate(digest, 'long.docx')
+        assert previews.manifest(digest)['truncated'] is True
+        with open(storage.abspath(storage.preview_path(digest, 'html')), encoding='utf-8') as f:
+            assert f.read() == '<p>一二三四五六</p>\n<p>七八九十</p>'
@@ -0,0 +1,35 @@
+"""请求剖析：管理员按请求头触发，保存 cProfile 与 SQL 记录，只保留最新的 PROFILE_KEEP 个"""
+from app.models import User
+
+
+def test_profile_by_header(app, client):
+    with app.app_context():
+        admin = {'X-User-Id': str(User.query.filter_by(role='admin').first().id)}
+        student = {'X-User-Id': str(User.query.filter_by(role='student').first().id)}
+    app.config['PROFILE_KEEP'] = 2
+
+    # 非管理员的请求头被忽略
+    response = client.get('/api/guidance/records', headers={**student, 'X-Profile': '1'})
+    response.close()
+    assert 'X-Profile-Id' not in response.headers
+
+    ids = []
+    for _ in range(3):
+        response = client.get('/api/guidance/records', headers={**admin, 'X-Profile': '1'})
+        # 响应发送完毕后保存
+        response.close()
+        ids.append(response.headers['X-Profile-Id'])
+
+    listed = client.get('/api/admin/profiles', headers=admin).get_json()
+    assert [item['id'] for item in listed] == ids[:0:-1]
+    assert listed[0]['endpoint'] == 'guidance.get_records' and listed[0]['trigger'] == 'header'
+
+    detail = client.get(f'/api/admin/profiles/{ids[-1]}?sort=tottime&limit=5', headers=admin).get_json()
+    assert detail['sqlCount'] == len(detail['sql']) > 0
+    assert all(item['sql'].lstrip().upper().startswith('SELECT') for item in detail['sql'])
+    assert 0 < len(detail['functions']) <= 5
+
+    assert client.get(f'/api/admin/profiles/{ids[0]}', headers=admin).status_code == 404
+    assert client.get('/api/admin/profiles/../../etc', headers=admin).status_code == 404
+    assert client.delete(f'/api/admin/profiles/{ids[-1]}', headers=admin).status_code == 200
+    assert [item['id'] for item in client.get('/api/admin/profiles', headers=admin).get_json()] == [ids[1]]
@@ -0,0 +1,19 @@
+"""高频查询使用迁移建立的索引，缺少索引时 check_query_plans 能发现全表扫描"""
+import check_query_plans
+from app.extensions import db
+
+
+def full_scans(queries):
+    return [name for name, query in queries if any(scan for _, _, scan in check_query_plans.explain(query))]
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        assert full_scans(check_query_plans.hot_queries()) == []
+
+
+def test_missing_index_is_reported(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP INDEX ix_papers_student_id')
+        assert full_scans(check_query_plans.hot_queries()) == ['papers of student']
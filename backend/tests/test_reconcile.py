@@ -0,0 +1,54 @@
+"""存储对账：只报告时不做修改；--fix 删除孤立文件、修正引用计数，--fix-dangling 清空悬空引用"""
+import io
+import os
+from app import reconcile, storage, jobs
+from app.extensions import db
+from app.models import User, Project, TaskDocument, StoredFile
+
+
+def add_task(student_name, path):
+    teacher = User.query.filter_by(role='teacher').first()
+    student = User(username=student_name, name=student_name, role='student')
+    task_doc = TaskDocument(project=Project(title=student_name, student=student, teacher=teacher),
+                            student_draft_path=path)
+    db.session.add_all([student, task_doc])
+    return task_doc
+
+
+def test_reconcile_reports_then_fixes(app):
+    with app.app_context():
+        kept = storage.put_stream(io.BytesIO(b'referenced'), 'kept.pdf')
+        orphan = storage.put_stream(io.BytesIO(b'orphan'), 'orphan.pdf')
+        gone = storage.put_stream(io.BytesIO(b'deleted from disk'), 'gone.pdf')
+        add_task('r1', kept)
+        add_task('r2', gone)
+        db.session.commit()
+        dangling_id = TaskDocument.query.filter_by(student_draft_path=gone).one().id
+        os.remove(storage.resolve(gone))
+        legacy = os.path.join(storage.abspath(storage.BLOB_ROOT), '0123abcd_old.pdf')
+        with open(legacy, 'wb') as f:
+            f.write(b'legacy')
+        with open(os.path.join(storage.abspath(storage.TMP_FOLDER), 'left.tmp'), 'wb') as f:
+            f.write(b'partial')
+
+        report = reconcile.reconcile(min_age=0).to_dict()
+        counts = report['counts']
+        assert counts['orphanBlobs'] == 1 and counts['orphanLegacyFiles'] == 1 and counts['staleTempFiles'] == 1
+        assert counts['danglingRefs'] == 1
+        assert report['samples']['danglingRefs'] == [{'taskId': dangling_id, 'column': 'student_draft_path',
+                                                      'path': gone}]
+        # 只报告时不做任何修改
+        assert storage.exists(orphan) and os.path.exists(legacy)
+
+        report = reconcile.reconcile(fix=True, fix_dangling=True, min_age=0).to_dict()
+        assert report['repaired'] >= 4
+        assert not storage.exists(orphan) and not os.path.exists(legacy)
+        assert db.session.get(StoredFile, storage.parse_ref(orphan)) is None
+        assert db.session.get(TaskDocument, dangling_id).student_draft_path is None
+        assert storage.exists(kept)
+        assert db.session.get(StoredFile, storage.parse_ref(kept)).ref_count == 1
+
+        # 清空悬空引用时释放的记录由后台任务回收，之后再次对账没有问题
+        assert jobs.run_pending(app) == (1, 0)
+        report = reconcile.reconcile(min_age=0).to_dict()
+        assert not any(report['counts'].values())
@@ -0,0 +1,54 @@
+"""只读副本路由：只读接口读副本，写请求之后该浏览器短时间内读主库"""
+import contextlib
+import io
+import shutil
+import pytest
+from app import create_app, migrations, init_test_data, replicas
+from app.extensions import db
+from app.models import User
+from config import Config
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+
+    class ReplicaConfig(Config):
+        TESTING = True
+        BASE_DIR = str(tmp_path)
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(primary)
+        DB_REPLICA_URLS = ['sqlite:///' + str(replica)]
+        RESPONSE_CACHE_ENABLED = False
+        JOBS_WORKER_THREADS = 0
+
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrations.upgrade()
+        init_test_data()
+        db.engine.dispose()
+    # 副本为此刻主库的拷贝，之后的写入只在主库
+    shutil.copy(primary, replica)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_reads_go_to_replica_until_the_user_writes(replica_app):
+    with replica_app.app_context():
+        student_id = User.query.filter_by(role='student').first().id
+    headers = {'X-User-Id': str(student_id)}
+    writer, other = replica_app.test_client(), replica_app.test_client()
+
+    response = writer.post('/api/guidance/records', json={'content': '只在主库'}, headers=headers)
+    assert response.status_code == 201
+    assert replicas.STICKY_COOKIE in response.headers.get('Set-Cookie', '')
+
+    # 刚写入的浏览器带着 Cookie 读主库，能读到自己的写入
+    contents = [item['content'] for item in writer.get('/api/guidance/records', headers=headers).get_json()]
+    assert '只在主库' in contents
+    # 其他浏览器读副本
+    contents = [item['content'] for item in other.get('/api/guidance/records', headers=headers).get_json()]
+    assert '只在主库' not in contents
@@ -0,0 +1,39 @@
+"""响应缓存：重复请求命中缓存不查询数据库，写入提交后换代使缓存的列表失效"""
+from app import response_cache
+from app.extensions import db
+from app.models import User
+
+
+def test_generation_bump_invalidates_cached_list(app, client, count_statements, monkeypatch):
+    monkeypatch.setattr(response_cache.cache, 'enabled', True)
+    response_cache.cache.reset_counters()
+    with app.app_context():
+        student_id = User.query.filter_by(role='student').first().id
+    headers = {'X-User-Id': str(student_id)}
+
+    first = client.get('/api/guidance/records', headers=headers)
+    with count_statements() as counter:
+        second = client.get('/api/guidance/records', headers=headers)
+    assert second.get_json() == first.get_json()
+    assert counter.count == 0
+    assert response_cache.cache.stats()['localHits'] == 1
+
+    with app.app_context():
+        before = response_cache.cache.generations.get(['guidance'])[0]
+    assert client.post('/api/guidance/records', json={'content': '新记录'}, headers=headers).status_code == 201
+    with app.app_context():
+        assert response_cache.cache.generations.get(['guidance'])[0] != before
+
+    contents = [item['content'] for item in client.get('/api/guidance/records', headers=headers).get_json()]
+    assert '新记录' in contents
+
+
+def test_rolled_back_write_keeps_generation(app):
+    with app.app_context():
+        before = response_cache.cache.generations.get(['task'])[0]
+        User.query.first().name = '回滚'
+        db.session.flush()
+        response_cache.invalidate('task')
+        db.session.rollback()
+        db.session.commit()
+        assert response_cache.cache.generations.get(['task'])[0] == before
@@ -0,0 +1,49 @@
+"""花名册导入：错误行不影响其他行，指导教师在后面的批次中也能解析，并发插入冲突时重试本批"""
+import io
+from sqlalchemy import insert
+from app import roster
+from app.extensions import db
+from app.models import User, Project
+
+ROSTER = '''学号,姓名,角色,课题,指导教师
+S2001,学生甲,学生,课题甲,T2001
+S2002,学生乙,学生,课题乙,T2001
+S2003,,学生,,
+S2001,重复,学生,,
+T2001,教师甲,教师,,
+'''
+
+
+def test_import_csv(app):
+    with app.app_context():
+        rows = roster.read_rows(io.BytesIO(ROSTER.encode('gbk')), 'roster.csv')
+        report = roster.import_roster(rows, batch_size=2).to_dict()
+        assert (report['rows'], report['usersCreated'], report['projectsCreated']) == (5, 3, 2)
+        assert [error['row'] for error in report['errors']] == [4, 5]
+        teacher = User.query.filter_by(username='T2001').one()
+        student = User.query.filter_by(username='S2002').one()
+        assert Project.query.filter_by(student_id=student.id).one().teacher_id == teacher.id
+
+
+def test_batch_retried_after_concurrent_insert(app, monkeypatch):
+    lookup = roster._lookup_users
+    calls = []
+
+    def racing_lookup(usernames):
+        found = lookup(usernames)
+        if not calls:
+            # 查询之后、插入之前，另一个导入提交了同一个用户
+            with db.engine.begin() as conn:
+                conn.execute(insert(User), [{'username': 'S2001', 'name': '学生甲', 'role': 'student'}])
+        calls.append(set(usernames))
+        return found
+
+    monkeypatch.setattr(roster, '_lookup_users', racing_lookup)
+    with app.app_context():
+        rows = roster.read_rows(io.BytesIO(ROSTER.encode('utf-8')), 'roster.csv')
+        report = roster.import_roster(rows).to_dict()
+        # 插入冲突后本批重新查询用户；重试时已存在的用户被跳过，计数不重复
+        assert calls[1] == calls[0]
+        assert (report['usersCreated'], report['usersExisting'], report['projectsCreated']) == (2, 1, 2)
+        assert report['errorCount'] == 2
+        assert User.query.filter_by(username='S2001').count() == 1
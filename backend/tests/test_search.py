@@ -0,0 +1,62 @@
+"""全文检索：所有词都须出现，按词频与字段权重排序；摘要截取命中位置附近的原文"""
+from app import search
+from app.extensions import db
+from app.models import User, Paper, GuidanceRecord
+
+
+def add(app, *objects):
+    with app.app_context():
+        for obj in objects:
+            db.session.add(obj)
+            search.index(obj)
+        db.session.commit()
+        return [obj.id for obj in objects]
+
+
+def test_ranking_and_paging(app, client):
+    with app.app_context():
+        student_id = User.query.filter_by(role='student').first().id
+        admin_id = User.query.filter_by(role='admin').first().id
+    once, often, other = add(
+        app,
+        GuidanceRecord(project_id=1, content='讨论了数据库设计', status=1),
+        GuidanceRecord(project_id=1, content='数据库设计：数据库表结构、数据库索引', status=1),
+        GuidanceRecord(project_id=1, content='讨论了界面设计', status=1),
+    )
+    # 标题的权重是正文的三倍
+    titled, in_abstract = add(app, Paper(title='数据库系统设计', abstract='毕业论文', student_id=student_id),
+                              Paper(title='毕业论文', abstract='数据库系统设计', student_id=student_id))
+    headers = {'X-User-Id': str(admin_id)}
+
+    def hits(url):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return [(item['type'], item['id']) for item in response.get_json()['items']]
+
+    assert hits('/api/search?q=数据库 设计&type=guidance') == [('guidance', often), ('guidance', once)]
+    assert hits('/api/search?q=数据库 设计&type=paper') == [('paper', titled), ('paper', in_abstract)]
+    everything = hits('/api/search?q=数据库 设计')
+    assert len(everything) == 4 and ('guidance', other) not in everything
+
+    # 分页：第二页从第一页多取的那一条开始
+    page = client.get('/api/search?q=数据库 设计&limit=3', headers=headers).get_json()
+    assert hits(f'/api/search?q=数据库 设计&limit=3&cursor={page["nextCursor"]}') == everything[3:]
+    assert [(item['type'], item['id']) for item in page['items']] == everything[:3]
+
+    # 删除记录时同时移除其索引
+    with app.app_context():
+        db.session.delete(db.session.get(GuidanceRecord, once))
+        search.remove('guidance', [once])
+        db.session.commit()
+    assert hits('/api/search?q=数据库&type=guidance') == [('guidance', often)]
+
+
+def test_snippet_uses_original_offsets():
+    # ㍿ 规范化后为四个字，命中位置需换算回原文
+    text = '㍿' * 30 + '关键词在这里'
+    piece = search.snippet(text, search.query_terms('关键'), width=20)
+    assert '关键词' in piece and piece.startswith('…')
+
+    text = 'Ｆｉｒｓｔ 段落。' + '填充' * 40 + 'Café 报告'
+    assert 'Café 报告' in search.snippet(text, search.query_terms('CAFÉ'), width=20)
+    assert search.snippet('没有命中的文本', ['xyz'], width=4) == '没有命中…'
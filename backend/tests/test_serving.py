@@ -0,0 +1,39 @@
+"""生产部署：gunicorn 配置从环境变量读取，生产环境 API 进程不提供前端页面"""
+import os
+import runpy
+from app import create_app
+from config import Config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_config(name, monkeypatch, **env):
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return runpy.run_path(os.path.join(BACKEND_DIR, name))
+
+
+def test_gunicorn_config_from_environment(monkeypatch):
+    conf = load_config('gunicorn.conf.py', monkeypatch, GUNICORN_WORKERS='3', GUNICORN_THREADS='8',
+                       GUNICORN_BIND='0.0.0.0:9000')
+    assert conf['worker_class'] == 'gthread'
+    assert (conf['workers'], conf['threads'], conf['bind']) == (3, 8, '0.0.0.0:9000')
+    assert conf['preload_app'] is False
+
+    events = load_config('gunicorn.events.conf.py', monkeypatch, EVENTS_MAX_STREAMS='500')
+    assert events['worker_class'] == 'gevent'
+    # 留出返回 503 的余量；后台任务不在事件流进程中执行
+    assert events['worker_connections'] > 500
+    assert set(events['raw_env']) == {'EVENTS_MAX_STREAMS=500', 'JOBS_WORKER_THREADS=0'}
+
+
+def test_frontend_routes_only_in_development(app, tmp_path):
+    assert app.test_client().get('/').status_code == 200
+
+    class NoFrontendConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        SERVE_FRONTEND = False
+        JOBS_WORKER_THREADS = 0
+
+    assert create_app(NoFrontendConfig).test_client().get('/').status_code == 404
@@ -0,0 +1,42 @@
+"""并发修改同一记录时统计计数保持正确"""
+import threading
+import time
+from app import stats
+from app.api import task as task_api
+from tests.test_task_review import setup_tasks
+
+
+def test_concurrent_reviews_keep_counters_consistent(app, monkeypatch):
+    headers, (task_id,) = setup_tasks(app, 1)
+    with app.app_context():
+        # 课题与任务书在同一次 flush 中新建时还查不到指导教师，先按明细重新计算
+        stats.rebuild()
+    original = task_api.apply_review
+
+    def slow_review(task_doc, action):
+        # 拉长读取与提交之间的间隔，没有行锁时各请求都会基于同一个旧状态计算增量
+        error = original(task_doc, action)
+        time.sleep(0.2)
+        return error
+
+    monkeypatch.setattr(task_api, 'apply_review', slow_review)
+    statuses = []
+
+    def review(action):
+        response = app.test_client().post('/api/task/review', headers=headers,
+                                          json={'taskId': task_id, 'action': action})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=review, args=(action,)) for action in ('approve', 'approve', 'return')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 200 in statuses and set(statuses) <= {200, 400}
+
+    with app.app_context():
+        counted = stats.summary()
+        stats.rebuild()
+        assert counted == stats.summary()
+        review = counted['totals']['task']['review']
+        assert sum(review.values()) == 1
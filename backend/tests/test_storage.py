@@ -0,0 +1,32 @@
+"""内容寻址存储的引用计数"""
+import io
+from sqlalchemy import select
+from app import storage
+from app.extensions import db
+from app.models import StoredFile
+
+
+def ref_count(digest):
+    return db.session.execute(select(StoredFile.ref_count).where(StoredFile.digest == digest)).scalar()
+
+
+def test_same_content_shares_one_record(app):
+    with app.app_context():
+        first = storage.put_stream(io.BytesIO(b'same content'), 'a.pdf')
+        db.session.commit()
+        second = storage.put_stream(io.BytesIO(b'same content'), 'b.pdf')
+        db.session.commit()
+        digest = storage.parse_ref(first)
+        assert storage.parse_ref(second) == digest
+        assert ref_count(digest) == 2
+
+
+def test_add_ref_after_concurrent_insert(app):
+    """另一个事务已插入了同一摘要的记录：不会主键冲突，而是引用加一"""
+    digest = 'ab' * 32
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(StoredFile.__table__.insert().values(digest=digest, size=3, ref_count=1))
+        storage._add_ref(digest, 3)
+        db.session.commit()
+        assert ref_count(digest) == 2
@@ -0,0 +1,41 @@
+"""任务书批量审核"""
+from app.extensions import db
+from app.models import User, Project, TaskDocument
+
+
+def setup_tasks(app, count):
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        teacher = User.query.filter_by(role='teacher').first()
+        ids = []
+        for i in range(count):
+            student = User(username=f'r{i}', name=f'学生{i}', role='student')
+            project = Project(title=f'课题{i}', student=student, teacher=teacher)
+            task = TaskDocument(project=project, teacher_submitted=1)
+            db.session.add_all([student, project, task])
+            db.session.flush()
+            ids.append(task.id)
+        db.session.commit()
+        return {'X-User-Id': str(admin.id)}, ids
+
+
+def test_batch_review_validates_task_ids(app, client):
+    headers, (first, second) = setup_tasks(app, 2)
+    response = client.post('/api/task/review/batch', headers=headers, json={'items': [
+        {'taskId': [first], 'action': 'approve'},
+        {'taskId': str(first), 'action': 'approve'},
+        {'taskId': first, 'action': 'return'},
+        {'taskId': 1.5, 'action': 'approve'},
+        {'taskId': second, 'action': 'return'},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [(r['ok'], r.get('error')) for r in results] == [
+        (False, 'Invalid taskId'),
+        (True, None),
+        (False, 'Duplicate taskId'),
+        (False, 'Invalid taskId'),
+        (True, None),
+    ]
+    assert results[1]['task']['adminStatus'] == 'approved'
+    assert results[4]['task']['adminStatus'] == 'returned'
@@ -0,0 +1,52 @@
+"""分片上传会话：偏移量检查与写入在排他锁内完成"""
+import io
+import threading
+import pytest
+from app.upload_sessions import UploadSession, OffsetMismatch, UploadBusy, _exclusive
+
+
+class SlowStream:
+    """读取第一块后等待，模拟仍在接收请求体的分片"""
+
+    def __init__(self, data, started, release):
+        self.data = io.BytesIO(data)
+        self.started = started
+        self.release = release
+
+    def read(self, size):
+        chunk = self.data.read(size)
+        if chunk:
+            self.started.set()
+            self.release.wait(5)
+        return chunk
+
+
+def test_concurrent_append_at_same_offset(tmp_path):
+    session = UploadSession.create(str(tmp_path), fileName='a.pdf', fileSize=8, fileType='student_draft')
+    started, release = threading.Event(), threading.Event()
+    results = []
+    writer = threading.Thread(target=lambda: results.append(
+        session.append(SlowStream(b'aaaa', started, release), 0)))
+    writer.start()
+    assert started.wait(5)
+
+    # 第一个分片尚未写完：相同偏移量的第二个请求被拒绝，不会交错写入
+    with pytest.raises(UploadBusy):
+        session.append(io.BytesIO(b'bbbb'), 0)
+    release.set()
+    writer.join(5)
+
+    assert results == [4]
+    with pytest.raises(OffsetMismatch):
+        session.append(io.BytesIO(b'bbbb'), 0)
+    assert session.append(io.BytesIO(b'bbbb'), 4) == 8
+    with open(session.part_path, 'rb') as f:
+        assert f.read() == b'aaaabbbb'
+
+
+def test_lock_is_released(tmp_path):
+    path = tmp_path / 'x.part'
+    path.write_bytes(b'')
+    for _ in range(2):
+        with open(path, 'r+b') as f, _exclusive(f):
+            pass
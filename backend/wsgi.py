@@ -0,0 +1,8 @@
+"""生产环境入口：gunicorn -c gunicorn.conf.py wsgi:app
+
+任务书事件流（SSE）另起一组 gevent 进程：gunicorn -c gunicorn.events.conf.py wsgi:app
+"""
+from app import create_app
+from config import ProductionConfig
+
+app = create_app(ProductionConfig)
@@ -8,6 +8,67 @@ let currentUser = {
 let currentProject = null;
 let allRecords = []; // 保存所有原始记录，用于筛选
 
+// 列表接口每页条数（后端游标分页，首屏只取一页）
+const LIST_PAGE_SIZE = 50;
+
+// 条件请求缓存：用户 + URL -> { etag, body }，最多保留 CONDITIONAL_CACHE_SIZE 条
+const CONDITIONAL_CACHE_SIZE = 200;
+const conditionalCache = new Map();
+
+/**
+ * GET 请求带上次响应的 ETag（If-None-Match），服务端返回 304 时直接使用缓存的响应体，
+ * 数据未变化时省去传输与服务端序列化。返回值与 fetch 相同（304 会转成 200 的 Response）。
+ */
+async function fetchConditional(url) {
+    const userId = currentUser.id || 1;
+    const key = `${userId} ${url}`;
+    const cached = conditionalCache.get(key);
+    const headers = { 'X-User-Id': userId };
+    if (cached) headers['If-None-Match'] = cached.etag;
+
+    const res = await fetch(url, { headers });
+    if (res.status === 304 && cached) {
+        return new Response(cached.body, {
+            status: 200,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+    const etag = res.headers.get('ETag');
+    if (res.ok && etag) {
+        conditionalCache.delete(key);
+        conditionalCache.set(key, { etag, body: await res.clone().text() });
+        if (conditionalCache.size > CONDITIONAL_CACHE_SIZE) {
+            conditionalCache.delete(conditionalCache.keys().next().value);
+        }
+    }
+    return res;
+}
+
+/**
+ * 按游标逐页拉取列表接口：每拿到一页就回调 onPage(已累计的全部条目)，
+ * 首屏无需等待整表返回。出错时抛出带 status 的 Error。
+ */
+async function fetchAllPages(url, onPage) {
+    let items = [];
+    let cursor = null;
+    do {
+        const sep = url.includes('?') ? '&' : '?';
+        let pageUrl = `${url}${sep}limit=${LIST_PAGE_SIZE}`;
+        if (cursor) pageUrl += `&cursor=${encodeURIComponent(cursor)}`;
+        const res = await fetchConditional(pageUrl);
+        if (!res.ok) {
+            const error = new Error(`HTTP ${res.status}`);
+            error.status = res.status;
+            throw error;
+        }
+        const page = await res.json();
+        items = items.concat(page.items);
+        cursor = page.nextCursor;
+        onPage(items);
+    } while (cursor);
+    return items;
+}
+
 document.addEventListener(
     'DOMContentLoaded', function() {
       // 初始化导航
@@ -90,9 +151,7 @@ async function loadGuidanceModule() {
         } else {
             // 其他角色从后端获取
             try {
-                const infoRes = await fetch('/api/guidance/info', {
-                    headers: { 'X-User-Id': currentUser.id || 1 }
-                });
+                const infoRes = await fetchConditional('/api/guidance/info');
                 if (infoRes.ok) {
                     infoData = await infoRes.json();
                     currentProject = infoData;
@@ -133,18 +192,11 @@ async function loadGuidanceModule() {
 
         // 2. 获取指导记录列表
         try {
-            const recordsRes = await fetch('/api/guidance/records', {
-                headers: { 'X-User-Id': currentUser.id || 1 }
-            });
-            if (recordsRes.ok) {
-                const records = await recordsRes.json();
+            // 逐页加载：首页到达即渲染，后续页追加
+            await fetchAllPages('/api/guidance/records', records => {
                 allRecords = records; // 保存所有原始记录
                 renderRecordsTable(records);
-            } else {
-                // 如果获取失败，显示空列表
-                allRecords = [];
-                renderRecordsTable([]);
-            }
+            });
         } catch (e) {
             console.error('获取指导记录失败:', e);
             allRecords = [];
@@ -629,6 +681,54 @@ function archiveMaterials() { alert('归档功能模拟'); }
 
 let currentTaskInfo = null;
 let currentTaskId = null;
+let taskReviewItems = []; // 教务处审核列表当前显示的条目
+let taskEventSource = null;
+
+/**
+ * 订阅任务书状态事件（SSE）：其他用户上传、提交、审核、删除后，服务端推送该任务书的状态，
+ * 在页面上就地更新，无需轮询或重新拉取列表。断线后浏览器会自动重连并补发错过的事件。
+ */
+function connectTaskEvents() {
+    if (taskEventSource || !window.EventSource || !currentUser.id) return;
+    // EventSource 不能设置请求头，用户 id 通过查询参数传递
+    const source = new EventSource(`/api/task/events?userId=${currentUser.id}`);
+    source.addEventListener('task', event => applyTaskEvent(JSON.parse(event.data)));
+    source.onerror = () => {
+        // 服务端连接数已满（503）等非 200 响应时浏览器不再自动重连，稍后重新订阅
+        if (source.readyState !== EventSource.CLOSED) return;
+        if (taskEventSource === source) taskEventSource = null;
+        setTimeout(connectTaskEvents, 30000);
+    };
+    taskEventSource = source;
+}
+
+function applyTaskEvent(task) {
+    if (currentTaskInfo && currentTaskInfo.projectId === task.projectId) {
+        currentTaskInfo = { ...currentTaskInfo, ...task };
+        currentTaskId = currentTaskInfo.id;
+        renderTaskModule();
+    }
+    if (currentUser.role === 'admin') {
+        upsertTaskReviewItem(task);
+    }
+}
+
+// 按任务书的最新状态更新审核列表中的一行
+function upsertTaskReviewItem(task) {
+    const index = taskReviewItems.findIndex(t => t.id === task.id);
+    const inList = task.teacherSubmitted === 1 || task.adminStatus === 'approved' || task.adminStatus === 'returned';
+    if (index >= 0) {
+        if (inList) {
+            taskReviewItems[index] = { ...taskReviewItems[index], ...task };
+        } else {
+            taskReviewItems.splice(index, 1);
+        }
+        renderTaskReviewList(taskReviewItems);
+    } else if (inList) {
+        // 新进入列表的任务书需要学生/教师姓名，重新拉取（条件请求，未变化的页面返回 304）
+        loadTaskReviewList();
+    }
+}
 
 // 初始化上传区域的点击事件
 function initTaskUploadAreas() {
@@ -654,12 +754,11 @@ function initTaskUploadAreas() {
 async function loadTaskModule() {
     // 初始化上传区域的点击事件
     initTaskUploadAreas();
+    connectTaskEvents();
     
     try {
         // 获取任务书信息
-        const res = await fetch('/api/task/info', {
-            headers: { 'X-User-Id': currentUser.id || 1 }
-        });
+        const res = await fetchConditional('/api/task/info');
         
         if (res.ok) {
             currentTaskInfo = await res.json();
@@ -1116,6 +1215,63 @@ function updateTeacherRevisionArea() {
 }
 
 // 学生上传初稿
+// 分片上传失败后的最大重试次数
+const UPLOAD_MAX_RETRIES = 5;
+
+/**
+ * 分片上传任务书文件：init -> 逐片 PUT -> finalize。
+ * 网络中断时查询服务端已接收的偏移量，从断点继续上传。
+ * 返回最后一个请求的 Response（成功时为 finalize 的响应，失败时为出错的响应）。
+ */
+async function uploadTaskFileChunked(file, fileType) {
+    const headers = { 'X-User-Id': currentUser.id || 1 };
+    const initRes = await fetch('/api/task/upload/init', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            fileName: file.name,
+            fileSize: file.size,
+            fileType: fileType,
+            projectId: currentTaskInfo && currentTaskInfo.projectId
+        })
+    });
+    if (!initRes.ok) return initRes;
+
+    const session = await initRes.json();
+    const uploadUrl = `/api/task/upload/${session.uploadId}`;
+    let offset = session.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + session.chunkSize);
+        try {
+            const res = await fetch(`${uploadUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { ...headers, 'Content-Type': 'application/octet-stream' },
+                body: chunk
+            });
+            if (res.ok) {
+                offset = (await res.json()).offset;
+                retries = 0;
+                continue;
+            }
+            if (res.status !== 409) return res;
+            // 偏移量不一致：以服务端记录为准继续；上一个分片仍在写入时（偏移量未变）稍后再试
+            const expected = (await res.json()).offset;
+            if (expected === offset) await new Promise(resolve => setTimeout(resolve, 1000));
+            offset = expected;
+        } catch (error) {
+            if (++retries > UPLOAD_MAX_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const statusRes = await fetch(uploadUrl, { headers });
+            if (!statusRes.ok) return statusRes;
+            offset = (await statusRes.json()).offset;
+        }
+    }
+
+    return fetch(`${uploadUrl}/finalize`, { method: 'POST', headers });
+}
+
 async function uploadStudentDraft() {
     const fileInput = document.getElementById('task-upload-input');
     if (!fileInput || !fileInput.files[0]) {
@@ -1123,19 +1279,8 @@ async function uploadStudentDraft() {
         return;
     }
     
-    const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
-    formData.append('fileType', 'student_draft');
-    if (currentTaskInfo && currentTaskInfo.projectId) {
-        formData.append('projectId', currentTaskInfo.projectId);
-    }
-    
     try {
-        const res = await fetch('/api/task/upload', {
-            method: 'POST',
-            headers: { 'X-User-Id': currentUser.id || 1 },
-            body: formData
-        });
+        const res = await uploadTaskFileChunked(fileInput.files[0], 'student_draft');
         
         if (res.ok) {
             const data = await res.json();
@@ -1246,19 +1391,8 @@ async function uploadTeacherRevision() {
         return;
     }
     
-    const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
-    formData.append('fileType', 'teacher_revision');
-    if (currentTaskInfo && currentTaskInfo.projectId) {
-        formData.append('projectId', currentTaskInfo.projectId);
-    }
-    
     try {
-        const res = await fetch('/api/task/upload', {
-            method: 'POST',
-            headers: { 'X-User-Id': currentUser.id || 1 },
-            body: formData
-        });
+        const res = await uploadTaskFileChunked(fileInput.files[0], 'teacher_revision');
         
         if (res.ok) {
             const data = await res.json();
@@ -1405,6 +1539,16 @@ async function downloadTaskFile(fileType) {
     }
 }
 
+/**
+ * 在新窗口中直接打开任务书文件，而不是先整体下载成 Blob：
+ * 浏览器可利用 ETag 缓存，PDF 阅读器可按 Range 分段加载。
+ * 新窗口无法携带自定义请求头，用户 id 通过查询参数传递。
+ */
+function openTaskFileInline(taskId, fileType) {
+    const userId = encodeURIComponent(currentUser.id || 1);
+    window.open(`/api/task/download/${taskId}?type=${fileType}&inline=1&userId=${userId}`, '_blank');
+}
+
 // 查看文件（预览）
 async function viewTaskFile(fileType) {
     if (!currentTaskId) {
@@ -1412,23 +1556,7 @@ async function viewTaskFile(fileType) {
         return;
     }
     
-    try {
-        const res = await fetch(`/api/task/download/${currentTaskId}?type=${fileType}`, {
-            headers: { 'X-User-Id': currentUser.id || 1 }
-        });
-        
-        if (res.ok) {
-            const blob = await res.blob();
-            const url = window.URL.createObjectURL(blob);
-            window.open(url, '_blank');
-        } else {
-            const error = await res.json();
-            alert('查看失败: ' + (error.error || '未知错误'));
-        }
-    } catch (error) {
-        console.error('查看失败:', error);
-        alert('查看失败: ' + error.message);
-    }
+    openTaskFileInline(currentTaskId, fileType);
 }
 
 // 打印文件
@@ -1448,18 +1576,14 @@ async function printTaskFile(fileType) {
 // 教务处：加载审核列表
 async function loadTaskReviewList() {
     try {
-        const res = await fetch('/api/task/list', {
-            headers: { 'X-User-Id': currentUser.id || 1 }
+        // 逐页加载：首页到达即渲染，后续页追加
+        await fetchAllPages('/api/task/list', items => {
+            taskReviewItems = items;
+            renderTaskReviewList(items);
         });
-        
-        if (res.ok) {
-            const tasks = await res.json();
-            renderTaskReviewList(tasks);
-        } else {
-            renderTaskReviewList([]);
-        }
     } catch (error) {
         console.error('加载审核列表失败:', error);
+        taskReviewItems = [];
         renderTaskReviewList([]);
     }
 }
@@ -1504,28 +1628,44 @@ function renderTaskReviewList(tasks) {
     });
 }
 
-// 查看任务书详情
+// 查看任务书详情：先显示服务端生成的预览（几十 KB），需要时再打开原文件
 async function viewTaskDetail(taskId) {
-    // 使用fetch下载文件，然后在新窗口打开
+    const fileType = 'teacher_revision';
+    const userId = encodeURIComponent(currentUser.id || 1);
+    const modal = document.getElementById('task-preview-modal');
+    const image = document.getElementById('task-preview-image');
+    const text = document.getElementById('task-preview-text');
+
+    document.getElementById('task-preview-open').onclick = () => openTaskFileInline(taskId, fileType);
+    image.style.display = 'none';
+    image.onload = () => { image.style.display = 'block'; };
+    // <img> 无法携带自定义请求头，用户 id 通过查询参数传递
+    image.src = `/api/task/preview/${taskId}/image?type=${fileType}&userId=${userId}`;
+    text.textContent = '正在加载预览...';
+    modal.style.display = 'block';
+
     try {
-        const res = await fetch(`/api/task/download/${taskId}?type=teacher_revision`, {
+        const res = await fetch(`/api/task/preview/${taskId}/html?type=${fileType}`, {
             headers: { 'X-User-Id': currentUser.id || 1 }
         });
-        
         if (res.ok) {
-            const blob = await res.blob();
-            const url = window.URL.createObjectURL(blob);
-            window.open(url, '_blank');
+            // 文本摘要由服务端转义后按段落生成
+            text.innerHTML = await res.text();
         } else {
-            const error = await res.json();
-            alert('查看失败: ' + (error.error || '未知错误'));
+            const data = await res.json().catch(() => ({}));
+            text.textContent = data.pending ? '预览生成中，请稍后再试或直接打开原文件' : '暂无预览，请打开原文件查看';
         }
     } catch (error) {
-        console.error('查看失败:', error);
-        alert('查看失败: ' + error.message);
+        console.error('加载预览失败:', error);
+        text.textContent = '加载预览失败，请打开原文件查看';
     }
 }
 
+function closeTaskPreview() {
+    document.getElementById('task-preview-modal').style.display = 'none';
+    document.getElementById('task-preview-image').removeAttribute('src');
+}
+
 // 删除任务书记录（教务处用）
 async function deleteTaskRecord(taskId) {
     if (!confirm('确认删除该任务书记录吗？删除后业务将重新开始。')) return;
@@ -1545,7 +1685,7 @@ async function deleteTaskRecord(taskId) {
         if (res.ok) {
             const data = await res.json();
             alert('删除成功，业务已重新开始');
-            loadTaskReviewList();
+            upsertTaskReviewItem(data);
             // 如果当前用户也在查看任务书模块，刷新显示
             if (currentUser.role !== 'admin') {
                 // 重新加载任务书信息
@@ -1582,7 +1722,7 @@ async function approveTask(taskId) {
         
         if (res.ok) {
             alert('审核通过');
-            loadTaskReviewList();
+            upsertTaskReviewItem(await res.json());
             // 如果当前用户也在查看任务书模块，刷新显示
             if (currentUser.role !== 'admin') {
                 loadTaskModule();
@@ -1616,7 +1756,7 @@ async function returnTask(taskId) {
         
         if (res.ok) {
             alert('已退回，学生和教师可以重新提交');
-            loadTaskReviewList();
+            upsertTaskReviewItem(await res.json());
             // 如果当前用户也在查看任务书模块，刷新显示
             if (currentUser.role !== 'admin') {
                 loadTaskModule();
@@ -1629,4 +1769,68 @@ async function returnTask(taskId) {
         console.error('退回失败:', error);
         alert('退回失败: ' + error.message);
     }
-}
\ No newline at end of file
+}
+
+// 审核列表全选/取消全选
+function toggleAllTaskReviews(source) {
+    document.querySelectorAll('#task-review-table tbody input[type="checkbox"]').forEach(cb => {
+        cb.checked = source.checked;
+    });
+}
+
+// 教务处：打包下载任务书（勾选的任务书，未勾选时为全部已通过的任务书）
+function downloadTaskArchive() {
+    if (!currentUser.id) return;
+    const taskIds = Array.from(document.querySelectorAll('#task-review-table tbody input[type="checkbox"]:checked'))
+        .map(cb => cb.value);
+    const params = new URLSearchParams({ type: 'teacher_revision', userId: currentUser.id });
+    if (taskIds.length > 0) {
+        params.set('ids', taskIds.join(','));
+    } else if (!confirm('未勾选任务书，是否打包下载全部已通过的任务书？')) {
+        return;
+    }
+    // 由浏览器直接下载，压缩包边生成边保存，不经过页面内存
+    window.location.href = `/api/task/archive?${params}`;
+}
+
+// 批量审核：一次请求提交所有勾选的任务书
+async function batchReviewTasks(action) {
+    const taskIds = Array.from(document.querySelectorAll('#task-review-table tbody input[type="checkbox"]:checked'))
+        .map(cb => parseInt(cb.value, 10));
+    if (taskIds.length === 0) {
+        alert('请先勾选需要审核的任务书');
+        return;
+    }
+    const actionText = action === 'approve' ? '通过' : '退回';
+    if (!confirm(`确认${actionText}选中的 ${taskIds.length} 份任务书吗？`)) return;
+
+    try {
+        const res = await fetch('/api/task/review/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-User-Id': currentUser.id || 1
+            },
+            body: JSON.stringify({
+                items: taskIds.map(taskId => ({ taskId: taskId, action: action }))
+            })
+        });
+
+        if (res.ok) {
+            const data = await res.json();
+            let message = `已${actionText} ${data.succeeded} 份`;
+            if (data.failed > 0) {
+                const reasons = data.results.filter(r => !r.ok).map(r => `#${r.taskId}: ${r.error}`);
+                message += `，失败 ${data.failed} 份：\n` + reasons.join('\n');
+            }
+            alert(message);
+            data.results.filter(r => r.ok).forEach(r => upsertTaskReviewItem(r.task));
+        } else {
+            const error = await res.json();
+            alert('操作失败: ' + (error.error || '未知错误'));
+        }
+    } catch (error) {
+        console.error('批量审核失败:', error);
+        alert('批量审核失败: ' + error.message);
+    }
+}